@@ -1,6 +1,7 @@
 from django.contrib import admin
 from libs.admin import ApproveRejectMixin, BaseAdmin
-from ..models import Account, Transaction, JournalEntry, GeneralLedger, FinancialStatement, FinancialEntry
+from ..models import (Account, Transaction, JournalEntry, GeneralLedger, FinancialStatement, FinancialEntry,
+                      PeriodClose)
 
 @admin.register(Account)
 class AccountAdmin(BaseAdmin):
@@ -24,10 +25,16 @@ class GeneralLedgerAdmin(BaseAdmin):
 
 @admin.register(FinancialStatement)
 class FinancialStatementAdmin(BaseAdmin):
-    list_display = ['name', 'description']
-    list_filter = []
+    list_display = ['name', 'description', 'statement_type', 'start_date', 'end_date']
+    list_filter = ['statement_type']
 
 @admin.register(FinancialEntry)
 class FinancialEntryAdmin(BaseAdmin):
-    list_display = ['financial_statement', 'account', 'amount']
+    list_display = ['financial_statement', 'section', 'line', 'account', 'amount']
     list_filter = ['financial_statement']
+
+
+@admin.register(PeriodClose)
+class PeriodCloseAdmin(BaseAdmin):
+    list_display = ['period', 'archived_entries', 'created_at']
+    list_filter = []
@@ -2,7 +2,8 @@ from django.utils.translation import gettext_lazy as _
 from django_filters import rest_framework as filters
 from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from ..models import Transaction, JournalEntry
+from sales.models import DailySalesFact
+from ..models import Transaction, JournalEntry, ArchivedJournalEntry
 
 class TransactionFilter(filters.FilterSet):
     end_date = filters.DateFilter(field_name="transaction_date", lookup_expr='lte', method='default_end_date')
@@ -19,11 +20,16 @@ class TransactionFilter(filters.FilterSet):
             transaction_id=OuterRef('pk'),
             journal__icontains="Cash and Cash Equivalents"
         )
+        archived_payment_entries = ArchivedJournalEntry.objects.filter(
+            transaction_id=OuterRef('pk'),
+            journal__icontains="Cash and Cash Equivalents"
+        )
+        has_payment = Exists(payment_entries) | Exists(archived_payment_entries)
         
         if value == 'paid':
-            return queryset.annotate(has_payment=Exists(payment_entries)).filter(has_payment=True)
+            return queryset.filter(has_payment)
         elif value == 'unpaid':
-            return queryset.annotate(has_payment=Exists(payment_entries)).filter(has_payment=False)
+            return queryset.exclude(has_payment)
         return queryset
 
     def filter_aggregated_by(self, queryset, name, value):
@@ -40,3 +46,34 @@ class TransactionFilter(filters.FilterSet):
     class Meta:
         model = Transaction
         fields = []
+
+
+class SalesFactFilter(filters.FilterSet):
+    """
+    TransactionFilter counterpart for sales statistics answered from DailySalesFact.
+    """
+    end_date = filters.DateFilter(field_name="date", lookup_expr='lte')
+    payment_status = filters.CharFilter(method='filter_payment_status', help_text=_('Choice: `paid` or `unpaid` or `all`'))
+    aggregated_by = filters.CharFilter(method='filter_aggregated_by', required=False, help_text=_('Choice: `daily` or `monthly`'))
+
+    def filter_payment_status(self, queryset, name, value):
+        if value == 'paid':
+            return queryset.filter(is_paid=True)
+        elif value == 'unpaid':
+            return queryset.filter(is_paid=False)
+        return queryset
+
+    def filter_aggregated_by(self, queryset, name, value):
+        today = timezone.now().date()
+        if value == 'monthly':
+            start_date = today - timezone.timedelta(days=365)
+        elif value == 'daily':
+            start_date = today - timezone.timedelta(days=30)
+        else:
+            return queryset
+
+        return queryset.filter(date__gte=start_date)
+
+    class Meta:
+        model = DailySalesFact
+        fields = []
@@ -53,4 +53,37 @@ OTHER_ACCOUNT = "Other"  # Small discrepancies between the account amount and th
 JOURNAL_DEBIT_MAP = (
     (SALE, AR_ACCOUNT),
     (PURCHASE, AP_ACCOUNT),
-)
\ No newline at end of file
+)
+# Financial statement constants
+INCOME_STATEMENT = 'income_statement'
+BALANCE_SHEET = 'balance_sheet'
+
+# Default statement lines as (section, line, account names, sign). The sign is 1 for
+# lines shown as debit minus credit (assets, expenses) and -1 for credit minus debit.
+# Override with the FINANCIAL_STATEMENT_LINES setting.
+FINANCIAL_STATEMENT_LINES = {
+    INCOME_STATEMENT: (
+        ('revenue', "Revenue", (SALES_ACCOUNT,), -1),
+        ('revenue', "Other Income", (ROUNDING_ACCOUNT, OTHER_ACCOUNT), -1),
+        ('expense', "Cost of Goods Sold", (COGS_ACCOUNT,), 1),
+        ('expense', "Operating Expenses", (OPERATING_EXP_ACCOUNT,), 1),
+        ('expense', "Interest Expense", (INTEREST_EXP_ACCOUNT,), 1),
+        ('expense', "Tax Expense", (TAX_EXP_ACCOUNT,), 1),
+    ),
+    BALANCE_SHEET: (
+        ('asset', "Cash and Cash Equivalents", (CASH_ACCOUNT,), 1),
+        ('asset', "Accounts Receivable", (AR_ACCOUNT,), 1),
+        ('asset', "Inventory", (INVENTORY_ACCOUNT,), 1),
+        ('asset', "Other Current Assets", (PREPAID_EXP_ACCOUNT, ST_INVESTMENT_ACCOUNT), 1),
+        ('asset', "Non-Current Assets", (TANGIBLE_ASSET_ACCOUNT, INTANGIBLE_ASSET, LT_INVESTMENT_ACCOUNT), 1),
+        ('liability', "Accounts Payable", (AP_ACCOUNT,), -1),
+        ('liability', "Accrued and Tax Liabilities", (ACCRUED_LIAB_ACCOUNT, TAX_LIAB_ACCOUNT), -1),
+        ('liability', "Debt", (ST_DEBT_ACCOUNT, LT_DEBT_ACCOUNT), -1),
+        ('equity', "Paid-In Capital", (COMMON_STOCK_ACCOUNT, ADD_PAID_IN_CAPITAL_ACCOUNT), -1),
+        ('equity', "Retained Earnings", (RETAINED_EARNING_ACCOUNT,), -1),
+    ),
+}
+# Balance sheet line holding the cumulative result of the income statement accounts.
+CURRENT_EARNINGS_LINE = "Current Earnings"
+# Balance sheet section for accounts no line maps, so the statement still adds up.
+UNCLASSIFIED_SECTION = 'unclassified'
@@ -0,0 +1,224 @@
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.transaction import atomic
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .constant import *
+from .transaction import get_account_ids
+from ..models import (AccountBalanceSnapshot, AccountPeriodBalance, ArchivedJournalEntry, JournalEntry,
+                      PeriodClose)
+
+
+def get_month_end(month):
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def get_next_month(month):
+    return get_month_end(month) + timedelta(days=1)
+
+
+def get_snapshot_balances(period_close):
+    """
+    Returns the snapshot of a closed month as a dict of account id to [debit, credit].
+    """
+    balances = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    if period_close:
+        for account_id, debit, credit in AccountBalanceSnapshot.objects.filter(
+                period_close=period_close).values_list('account_id', 'debit', 'credit'):
+            balances[account_id] = [debit, credit]
+    return balances
+
+
+def add_period_balances(balances, start_month, end_month):
+    """
+    Adds the monthly balances from start_month (all earlier months when None) up to,
+    not including, end_month to a dict of account id to [debit, credit].
+    """
+    rows = AccountPeriodBalance.objects.filter(period__lt=end_month)
+    if start_month:
+        rows = rows.filter(period__gte=start_month)
+    for row in rows.values('account_id').annotate(debit=Sum('debit'), credit=Sum('credit')).order_by():
+        balances[row['account_id']][0] += row['debit']
+        balances[row['account_id']][1] += row['credit']
+    return balances
+
+
+def archive_journal_entries(end_date, batch_size=5000):
+    """
+    Moves the journal entries of transactions dated up to end_date to
+    ArchivedJournalEntry, keeping their ids, in batches of `batch_size`.
+
+    Returns:
+    - The number of entries moved.
+    """
+    entries = JournalEntry.all_objects.filter(transaction__transaction_date__lte=end_date).order_by('id')
+    moved = 0
+    while True:
+        rows = list(entries.values(
+            'id', 'id32', 'transaction_id', 'journal', 'amount', 'debit_credit', 'created_at', 'deleted_at',
+            'transaction__transaction_date')[:batch_size])
+        if not rows:
+            return moved
+        ArchivedJournalEntry.objects.bulk_create([
+            ArchivedJournalEntry(
+                id=row['id'],
+                id32=row['id32'],
+                transaction_id=row['transaction_id'],
+                journal=row['journal'],
+                amount=row['amount'],
+                debit_credit=row['debit_credit'],
+                period=row['transaction__transaction_date'].replace(day=1),
+                created_at=row['created_at'],
+                deleted_at=row['deleted_at'],
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+        JournalEntry.all_objects.filter(id__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+
+
+def sync_period_balances(first_month, month):
+    """
+    Recomputes the monthly balances from first_month through month from the archived
+    journal entries of those months, so the snapshots of a close agree with the
+    entries it archives. Only the balances that differ are written, and their version
+    is bumped so statements reading them go stale.
+
+    Returns:
+    - A dict of month to the list of (account id, debit, credit) of that month.
+    """
+    rows = list(ArchivedJournalEntry.objects.filter(
+        period__gte=first_month, period__lte=month, deleted_at__isnull=True,
+    ).values('journal', 'period').annotate(
+        debit=Sum('amount', filter=Q(debit_credit=DEBIT)),
+        credit=Sum('amount', filter=Q(debit_credit=CREDIT))).order_by())
+    account_ids = get_account_ids(row['journal'] for row in rows)
+    # Accounts sharing a name share a balance, as in post_journal.
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for row in rows:
+        key = (account_ids[row['journal']], row['period'])
+        totals[key][0] += row['debit'] or 0
+        totals[key][1] += row['credit'] or 0
+
+    stored = AccountPeriodBalance.objects.select_for_update().filter(period__gte=first_month, period__lte=month)
+    changed = []
+    for balance in stored:
+        debit, credit = totals.get((balance.account_id, balance.period), (Decimal(0), Decimal(0)))
+        if (balance.debit, balance.credit) != (debit, credit):
+            balance.debit, balance.credit = debit, credit
+            balance.version += 1
+            changed.append(balance)
+    AccountPeriodBalance.objects.bulk_update(changed, ['debit', 'credit', 'version'])
+    existing = {(balance.account_id, balance.period) for balance in stored}
+    AccountPeriodBalance.objects.bulk_create([
+        AccountPeriodBalance(account_id=account_id, period=period, debit=debit, credit=credit)
+        for (account_id, period), (debit, credit) in totals.items() if (account_id, period) not in existing
+    ])
+
+    monthly = defaultdict(list)
+    for (account_id, period), (debit, credit) in totals.items():
+        monthly[period].append((account_id, debit, credit))
+    return monthly
+
+
+@atomic
+def close_period(month, user=None, batch_size=5000):
+    """
+    Closes every open month up to and including `month`. The journal entries of the
+    closed months are moved to the archive first and the monthly balances of those
+    months are recomputed from them, so the snapshots never drift from the entries.
+    For each month the cumulative debits and credits of every account are then frozen
+    from the previous snapshot and the month's balances.
+
+    Parameters:
+    - month: A date within the last month to close. It must have ended.
+    - user: User recorded on the PeriodClose rows; defaults to the current request user.
+    - batch_size: Number of journal entries archived per batch.
+
+    Returns:
+    - The created PeriodClose objects, oldest first.
+
+    Raises:
+    - ValidationError: When the month has not ended or is already closed.
+    """
+    month = month.replace(day=1)
+    if month >= timezone.now().date().replace(day=1):
+        raise ValidationError({'period': _("Only a month that has ended can be closed.")})
+    last_close = PeriodClose.objects.select_for_update().order_by('-period').first()
+    if last_close and last_close.period >= month:
+        raise ValidationError({'period': _("The period is already closed through {period}.").format(
+            period=last_close.period.strftime('%Y-%m'))})
+
+    if last_close:
+        first_month = get_next_month(last_close.period)
+    else:
+        first_month = min(filter(None, [
+            month,
+            AccountPeriodBalance.objects.aggregate(first=Min('period'))['first'],
+            JournalEntry.all_objects.aggregate(
+                first=Min(TruncMonth('transaction__transaction_date')))['first'],
+        ]))
+    archived = archive_journal_entries(get_month_end(month), batch_size)
+    monthly = sync_period_balances(first_month, month)
+
+    periods = []
+    current = first_month
+    while current <= month:
+        periods.append(current)
+        current = get_next_month(current)
+    closes = PeriodClose.objects.bulk_create_with_audit([
+        PeriodClose(period=period, archived_entries=archived if period == month else 0) for period in periods
+    ], user)
+
+    balances = get_snapshot_balances(last_close)
+    snapshots = []
+    for period_close in closes:
+        for account_id, debit, credit in monthly[period_close.period]:
+            balances[account_id][0] += debit
+            balances[account_id][1] += credit
+        snapshots += [
+            AccountBalanceSnapshot(period_close=period_close, account_id=account_id, debit=debit, credit=credit)
+            for account_id, (debit, credit) in balances.items()
+        ]
+    AccountBalanceSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+    return closes
+
+
+def get_balances_as_of(as_of):
+    """
+    Returns the cumulative debits and credits of every account at the end of a day.
+    Starts from the snapshot of the latest month closed by then, adds the monthly
+    balances of the whole months after it and the journal entries of the days of the
+    last month.
+
+    Returns:
+    - A dict of account id to a (debit, credit) tuple.
+    """
+    as_of_month = as_of.replace(day=1)
+    if as_of == get_month_end(as_of):
+        as_of_month = get_next_month(as_of)
+    period_close = PeriodClose.objects.filter(period__lt=as_of_month).order_by('-period').first()
+    balances = get_snapshot_balances(period_close)
+    add_period_balances(balances, get_next_month(period_close.period) if period_close else None, as_of_month)
+
+    if as_of_month <= as_of:
+        # Entries of a closed month are only in the archive.
+        if PeriodClose.objects.filter(period=as_of_month).exists():
+            entries = ArchivedJournalEntry.objects.filter(
+                period=as_of_month, deleted_at__isnull=True, transaction__transaction_date__lte=as_of)
+        else:
+            entries = JournalEntry.objects.filter(
+                transaction__transaction_date__gte=as_of_month, transaction__transaction_date__lte=as_of)
+        rows = list(entries.values('journal').annotate(
+            debit=Sum('amount', filter=Q(debit_credit=DEBIT)),
+            credit=Sum('amount', filter=Q(debit_credit=CREDIT))).order_by())
+        account_ids = get_account_ids(row['journal'] for row in rows)
+        for row in rows:
+            balances[account_ids[row['journal']]][0] += row['debit'] or 0
+            balances[account_ids[row['journal']]][1] += row['credit'] or 0
+    return {account_id: (debit, credit) for account_id, (debit, credit) in balances.items()}
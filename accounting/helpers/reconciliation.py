@@ -0,0 +1,320 @@
+import csv
+import io
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from sales.models import SalesPayment
+from .constant import *
+from .transaction import check_open_period, get_account_ids
+from ..models import Transaction
+
+# Transaction types that move money into the bank account. Their statement lines have
+# a positive amount; the other types, except those in EITHER_WAY_TYPES, a negative one.
+INBOUND_TYPES = {INCOME, DEPOSIT, LOAN_RECEIPT, TAX_REFUND, INTEREST_INCOME, DIVIDEND}
+EITHER_WAY_TYPES = {TRANSFER, ADJUSTMENT, OTHER}
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']
+TOKEN_RE = re.compile(r'[a-z0-9]{4,}')
+# Tokens shared by more candidates than this (e.g. "payment") say nothing about a match.
+MAX_TOKEN_CANDIDATES = 50
+
+StatementLine = namedtuple('StatementLine', ['line', 'date', 'amount', 'reference', 'tokens'])
+Candidate = namedtuple('Candidate', ['key', 'kind', 'pk', 'id32', 'date', 'amount', 'label', 'tokens'])
+
+
+class StatementError(ValueError):
+    pass
+
+
+def tokenize(*texts):
+    """
+    Returns the lowercase words of at least four letters or digits in the texts, the
+    reference tokens lines and candidates are matched on.
+    """
+    return frozenset(token for text in texts if text for token in TOKEN_RE.findall(str(text).lower()))
+
+
+def parse_amount(value):
+    value = (value or '').strip().replace(' ', '')
+    # Accept both 1,234.56 and 1.234,56 thousand separators.
+    if ',' in value and (value.rfind(',') > value.rfind('.')):
+        value = value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    return Decimal(value)
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def read_statement(file, date_column='date', amount_column='amount', reference_columns=('description', 'reference')):
+    """
+    Reads bank statement lines from a CSV file one row at a time, so large statements
+    are never loaded as a whole.
+
+    Parameters:
+    - file: A binary or text file object with a header row.
+    - date_column, amount_column: Header names of the date and signed amount columns.
+      Money into the account is positive.
+    - reference_columns: Header names whose text is matched against references.
+
+    Returns:
+    - A generator of StatementLine tuples.
+
+    Raises:
+    - StatementError: When a column is missing or a row cannot be parsed.
+    """
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(file)
+    headers = reader.fieldnames or []
+    for column in [date_column, amount_column]:
+        if column not in headers:
+            raise StatementError(_("The statement has no '{column}' column.").format(column=column))
+
+    for row in reader:
+        try:
+            line_date = parse_date(row[date_column])
+            amount = parse_amount(row[amount_column])
+        except (ValueError, InvalidOperation):
+            raise StatementError(_("Line {line} has an invalid date or amount.").format(line=reader.line_num))
+        reference = ' '.join(row.get(column) or '' for column in reference_columns if column in headers).strip()
+        yield StatementLine(reader.line_num, line_date, amount, reference, tokenize(reference))
+
+
+def load_candidates(start_date, end_date):
+    """
+    Returns the payments and transactions between the two dates that no reconciliation
+    transaction has matched yet.
+
+    Candidates are settled or captured sales payments, which come in, and transactions
+    entered by users (`generate_journal` set). Transactions the system posts for
+    invoices and payments move no money through the bank. Matched ones are left out
+    by a NOT EXISTS on the reconciliation transactions, so only the window is read.
+    """
+    payment_type = ContentType.objects.get_for_model(SalesPayment)
+    transaction_type = ContentType.objects.get_for_model(Transaction)
+
+    def reconciled(content_type):
+        return Exists(Transaction.objects.filter(
+            transaction_type=RECONCILIATION, reconciled_type=content_type, reconciled_id=OuterRef('pk')))
+
+    candidates = []
+    payments = SalesPayment.objects.filter(
+        payment_date__range=(start_date, end_date),
+        status__in=[SalesPayment.SETTLEMENT, SalesPayment.CAPTURE],
+    ).exclude(reconciled(payment_type)).values_list('id', 'id32', 'payment_date', 'amount', 'invoice__id32',
+                  'invoice__order__id32', 'invoice__order__customer__name')
+    for pk, id32, payment_date, amount, invoice_id32, order_id32, customer in payments:
+        candidates.append(Candidate(
+            (payment_type.pk, pk), 'sales_payment', pk, id32, payment_date, amount,
+            _('Payment #{id32} for Invoice #{invoice}').format(id32=id32, invoice=invoice_id32),
+            tokenize(id32, invoice_id32, order_id32, customer)))
+
+    transactions = Transaction.objects.filter(
+        transaction_date__range=(start_date, end_date), generate_journal=True,
+    ).exclude(transaction_type=RECONCILIATION).exclude(reconciled(transaction_type)).values_list(
+        'id', 'id32', 'transaction_date', 'amount', 'transaction_type', 'external_id32', 'description')
+    for pk, id32, transaction_date, amount, kind, external_id32, description in transactions:
+        signed = amount if kind in INBOUND_TYPES or kind in EITHER_WAY_TYPES else -amount
+        candidates.append(Candidate(
+            (transaction_type.pk, pk), 'transaction', pk, id32, transaction_date, signed,
+            _('Transaction #{id32} ({kind})').format(id32=id32, kind=kind),
+            tokenize(id32, external_id32, description)))
+        if kind in EITHER_WAY_TYPES:
+            candidates.append(candidates[-1]._replace(amount=-amount))
+    return candidates
+
+
+class ReconciliationIndex:
+    """
+    Open candidates indexed for matching statement lines:
+
+    - by exact amount, each list sorted by date, so the candidates within a date window
+      are found by bisection;
+    - all amounts sorted, for candidates with a close amount;
+    - by reference token, for candidates sharing words with a line.
+
+    Matched candidates are marked used rather than removed, so every lookup stays
+    O(log n) plus the candidates it returns.
+    """
+
+    def __init__(self, candidates):
+        self.by_amount = defaultdict(list)
+        self.by_token = defaultdict(list)
+        for candidate in sorted(candidates, key=lambda candidate: (candidate.date, candidate.key)):
+            self.by_amount[candidate.amount].append(candidate)
+            for token in candidate.tokens:
+                self.by_token[token].append(candidate)
+        self.dates = {amount: [candidate.date for candidate in group] for amount, group in self.by_amount.items()}
+        self.amounts = sorted(self.by_amount)
+        self.used = set()
+
+    def in_window(self, amount, start_date, end_date):
+        dates = self.dates.get(amount)
+        if not dates:
+            return []
+        group = self.by_amount[amount]
+        return [candidate for candidate in group[bisect_left(dates, start_date):bisect_right(dates, end_date)]
+                if candidate.key not in self.used]
+
+    def near_amount(self, low, high, start_date, end_date):
+        candidates = []
+        for amount in self.amounts[bisect_left(self.amounts, low):bisect_right(self.amounts, high)]:
+            candidates += self.in_window(amount, start_date, end_date)
+        return candidates
+
+    def sharing_tokens(self, tokens):
+        return [candidate for token in tokens for candidate in self.by_token.get(token, [])
+                if len(self.by_token[token]) <= MAX_TOKEN_CANDIDATES and candidate.key not in self.used]
+
+    def use(self, candidate):
+        self.used.add(candidate.key)
+
+
+def score(line, candidate, window):
+    """
+    Returns how likely a candidate matches a line, between 0 and 1, from the shared
+    reference tokens, the amount difference and the date distance.
+    """
+    shared = len(line.tokens & candidate.tokens) / len(line.tokens | candidate.tokens) if line.tokens else 0
+    amount_gap = abs(line.amount - candidate.amount) / max(abs(line.amount), Decimal('0.01'))
+    days = abs((line.date - candidate.date).days)
+    return round(0.5 * shared + 0.3 * float(max(1 - amount_gap * 20, 0)) + 0.2 * max(1 - days / (window + 1), 0), 4)
+
+
+def reconcile(lines, candidates, window=3, tolerance=Decimal('0.02'), suggestions=3):
+    """
+    Matches statement lines against open candidates.
+
+    A line is matched automatically to a candidate of the same signed amount within
+    `window` days, preferring one sharing a reference token, then the closest date.
+    Ambiguous lines, with several such candidates and no shared token, and lines
+    without one get up to `suggestions` fuzzy candidates: same tokens, or an amount
+    within `tolerance` (a fraction of the line amount) in a wider window.
+
+    Parameters:
+    - lines: Iterable of StatementLine.
+    - candidates: List of Candidate, from load_candidates.
+
+    Returns:
+    - A (matches, unmatched) tuple: a list of (line, candidate) and a list of
+      (line, [(candidate, score), ...]).
+    """
+    index = ReconciliationIndex(candidates)
+    matches = []
+    pending = []
+    # Lines with a reference first, so they claim their candidate before a line of the
+    # same amount that can only be matched by date.
+    for line in sorted(lines, key=lambda line: (not line.tokens, line.date, line.line)):
+        delta = timedelta(days=window)
+        in_window = index.in_window(line.amount, line.date - delta, line.date + delta)
+        if not in_window:
+            pending.append(line)
+            continue
+        referenced = [candidate for candidate in in_window if candidate.tokens & line.tokens]
+        if referenced or len(in_window) == 1:
+            candidate = min(referenced or in_window, key=lambda candidate: abs((candidate.date - line.date).days))
+            index.use(candidate)
+            matches.append((line, candidate))
+        else:
+            pending.append(line)
+
+    unmatched = []
+    for line in pending:
+        delta = timedelta(days=window * 3)
+        margin = abs(line.amount) * tolerance
+        proposals = {candidate.key: candidate for candidate in index.sharing_tokens(line.tokens)}
+        proposals.update((candidate.key, candidate) for candidate in index.near_amount(
+            line.amount - margin, line.amount + margin, line.date - delta, line.date + delta))
+        scored = sorted(((candidate, score(line, candidate, window)) for candidate in proposals.values()),
+                        key=lambda pair: -pair[1])
+        unmatched.append((line, scored[:suggestions]))
+    matches.sort(key=lambda match: match[0].line)
+    unmatched.sort(key=lambda entry: entry[0].line)
+    return matches, unmatched
+
+
+@transaction.atomic
+def post_reconciliations(matches, user=None):
+    """
+    Records the matches as RECONCILIATION transactions on the cash account, with one
+    bulk insert. The matched payment or transaction is kept in `reconciled_object`, so
+    it is no longer a candidate.
+
+    Returns:
+    - The created transactions.
+
+    Raises:
+    - ValidationError: When a statement line is dated in a closed period.
+    """
+    check_open_period(line.date for line, _candidate in matches)
+    account_id = get_account_ids([CASH_ACCOUNT])[CASH_ACCOUNT]
+    return Transaction.objects.bulk_create_with_audit([
+        Transaction(
+            account_id=account_id,
+            transaction_date=line.date,
+            amount=abs(line.amount),
+            description=_('Statement line {line}: {reference} matched {label}').format(
+                line=line.line, reference=line.reference, label=candidate.label),
+            transaction_type=RECONCILIATION,
+            generate_journal=False,
+            external_id32=candidate.id32,
+            reconciled_type_id=candidate.key[0],
+            reconciled_id=candidate.pk,
+        )
+        for line, candidate in matches
+    ], user)
+
+
+def reconcile_statement(file, window=3, post=False, user=None, **columns):
+    """
+    Reads a statement CSV, matches it against the open candidates of its date range and
+    optionally posts the matches.
+
+    Parameters:
+    - file: The statement CSV, see read_statement.
+    - window: Days a payment date may differ from the statement date.
+    - post: Whether to record the automatic matches.
+    - user: User recorded on the posted transactions.
+    - columns: Column names passed to read_statement.
+
+    Returns:
+    - A dict with the `matched` and `unmatched` lines and the number `posted`.
+    """
+    lines = list(read_statement(file, **columns))
+    if not lines:
+        return {'matched': [], 'unmatched': [], 'posted': 0}
+    start_date = min(line.date for line in lines) - timedelta(days=window * 3)
+    end_date = max(line.date for line in lines) + timedelta(days=window * 3)
+    matches, unmatched = reconcile(lines, load_candidates(start_date, end_date), window)
+    posted = len(post_reconciliations(matches, user)) if post and matches else 0
+
+    def line_data(line):
+        return {'line': line.line, 'date': line.date, 'amount': line.amount, 'reference': line.reference}
+
+    def candidate_data(candidate):
+        return {'type': candidate.kind, 'id32': candidate.id32, 'date': candidate.date,
+                'amount': candidate.amount, 'label': candidate.label}
+
+    return {
+        'matched': [{**line_data(line), 'match': candidate_data(candidate)} for line, candidate in matches],
+        'unmatched': [
+            {**line_data(line), 'candidates': [{**candidate_data(candidate), 'score': value}
+                                               for candidate, value in scored]}
+            for line, scored in unmatched
+        ],
+        'posted': posted,
+    }
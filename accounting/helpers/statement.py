@@ -0,0 +1,172 @@
+import calendar
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.transaction import atomic
+from django.utils.translation import gettext_lazy as _
+from .constant import *
+from .transaction import get_account_ids
+from ..models import AccountPeriodBalance, ArchivedJournalEntry, FinancialEntry, FinancialStatement, JournalEntry
+
+
+def get_statement_lines(statement_type):
+    """
+    Returns the (section, line, account names, sign) tuples of a statement type, from
+    the FINANCIAL_STATEMENT_LINES setting or the defaults in helpers.constant.
+    """
+    lines = getattr(settings, 'FINANCIAL_STATEMENT_LINES', FINANCIAL_STATEMENT_LINES)
+    return lines[statement_type]
+
+
+def get_period(statement_type, start_month, end_month):
+    """
+    Returns the (start date, end date) of a statement covering whole months. A
+    balance sheet has no start date.
+    """
+    end_date = end_month.replace(day=calendar.monthrange(end_month.year, end_month.month)[1])
+    if statement_type == BALANCE_SHEET:
+        return None, end_date
+    return start_month.replace(day=1), end_date
+
+
+def get_period_balances(start_date, end_date):
+    balances = AccountPeriodBalance.objects.filter(period__lte=end_date)
+    if start_date:
+        balances = balances.filter(period__gte=start_date)
+    return balances
+
+
+def build_statement_entries(statement, balances):
+    """
+    Maps account balances to the statement lines.
+
+    Parameters:
+    - statement: The FinancialStatement the entries belong to.
+    - balances: Dict of account name to (account id, debit minus credit).
+
+    Returns:
+    - A list of unsaved FinancialEntry objects, one per line and account.
+    """
+    entries = []
+    mapped = set()
+
+    def add(section, line, account, amount):
+        if amount:
+            entries.append(FinancialEntry(
+                financial_statement=statement, account_id=balances[account][0] if account in balances else
+                get_account_ids([account])[account], amount=amount, section=section, line=line))
+
+    for section, line, accounts, sign in get_statement_lines(statement.statement_type):
+        for account in accounts:
+            mapped.add(account)
+            if account in balances:
+                add(section, line, account, sign * balances[account][1])
+
+    if statement.statement_type == BALANCE_SHEET:
+        income_accounts = {account for _section, _line, accounts, _sign in get_statement_lines(INCOME_STATEMENT)
+                           for account in accounts}
+        earnings = -sum(balances[account][1] for account in income_accounts if account in balances)
+        add('equity', CURRENT_EARNINGS_LINE, RETAINED_EARNING_ACCOUNT, earnings)
+        for account, (_account_id, amount) in sorted(balances.items()):
+            if account not in mapped and account not in income_accounts:
+                add(UNCLASSIFIED_SECTION, account, account, amount)
+    return entries
+
+
+def generate_statement(statement_type, start_month, end_month):
+    """
+    Returns the statement of a type for the months from start_month to end_month (for
+    an income statement) or as of the end of end_month (for a balance sheet).
+
+    Generated statements are stored and keyed by type, period and ledger version: the
+    sum of the versions of the monthly balances they add up. A posting bumps only the
+    versions of its own month, so a statement is recomputed only when a month it
+    covers changed, and then from the monthly balances rather than the journal.
+
+    Parameters:
+    - statement_type: INCOME_STATEMENT or BALANCE_SHEET.
+    - start_month, end_month: Dates within the first and last month.
+
+    Returns:
+    - The FinancialStatement, with its entries up to date.
+    """
+    start_date, end_date = get_period(statement_type, start_month, end_month)
+    balances = get_period_balances(start_date, end_date)
+    version = balances.aggregate(version=Sum('version'))['version'] or 0
+    statement = FinancialStatement.objects.filter(
+        statement_type=statement_type, start_date=start_date, end_date=end_date).first()
+    if statement and statement.ledger_version == version:
+        return statement
+
+    with atomic():
+        if not statement:
+            statement = FinancialStatement.objects.create(
+                name=dict(FinancialStatement.STATEMENT_TYPES)[statement_type],
+                description=_("{start} - {end}").format(start=start_date or '', end=end_date),
+                statement_type=statement_type,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        rows = balances.values('account_id', 'account__name').annotate(
+            net=Sum(F('debit') - F('credit'))).order_by()
+        account_balances = {row['account__name']: (row['account_id'], row['net']) for row in rows}
+        FinancialEntry.objects.filter(financial_statement=statement).delete()
+        FinancialEntry.objects.bulk_create_with_audit(build_statement_entries(statement, account_balances))
+        statement.ledger_version = version
+        statement.save()
+    return statement
+
+
+def summarize_statement(statement):
+    """
+    Returns the entries of a statement grouped by section and line, with totals.
+    """
+    sections = defaultdict(lambda: {'total': Decimal(0), 'lines': defaultdict(Decimal)})
+    for section, line, amount in FinancialEntry.objects.filter(
+            financial_statement=statement).values_list('section', 'line', 'amount').order_by('id'):
+        sections[section]['total'] += amount
+        sections[section]['lines'][line] += amount
+    summary = {
+        section: {'total': data['total'], 'lines': [{'line': line, 'amount': amount}
+                                                    for line, amount in data['lines'].items()]}
+        for section, data in sections.items()
+    }
+    if statement.statement_type == INCOME_STATEMENT:
+        net_income = summary.get('revenue', {}).get('total', 0) - summary.get('expense', {}).get('total', 0)
+        return {'sections': summary, 'net_income': net_income}
+    return {'sections': summary}
+
+
+@atomic
+def rebuild_period_balances(batch_size=2000):
+    """
+    Recomputes the monthly account balances from the journal entries and the archived
+    entries of closed months, e.g. for journals posted before the balances existed.
+    Stored statements are marked stale.
+
+    Returns:
+    - The number of monthly balances written.
+    """
+    sums = {'debit': Sum('amount', filter=Q(debit_credit=DEBIT)),
+            'credit': Sum('amount', filter=Q(debit_credit=CREDIT))}
+    rows = list(JournalEntry.objects.annotate(period=TruncMonth('transaction__transaction_date')).values(
+        'journal', 'period').annotate(**sums).order_by())
+    rows += ArchivedJournalEntry.objects.filter(deleted_at__isnull=True).values(
+        'journal', 'period').annotate(**sums).order_by()
+    account_ids = get_account_ids(row['journal'] for row in rows)
+    # Accounts sharing a name share a balance, as in post_journal.
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for row in rows:
+        key = (account_ids[row['journal']], row['period'])
+        totals[key][0] += row['debit'] or 0
+        totals[key][1] += row['credit'] or 0
+
+    AccountPeriodBalance.objects.all().delete()
+    written = AccountPeriodBalance.objects.bulk_create([
+        AccountPeriodBalance(account_id=account_id, period=period, debit=debit, credit=credit)
+        for (account_id, period), (debit, credit) in totals.items()
+    ], batch_size=batch_size)
+    FinancialStatement.objects.exclude(statement_type='').update(ledger_version=-1)
+    return len(written)
@@ -1,33 +1,193 @@
-
-
-from django.utils import timezone
+import calendar
+import threading
+import time
+from collections import defaultdict, namedtuple
 from decimal import Decimal
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db.models import F
+from django.db.transaction import atomic, on_commit
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from .constant import *
-from ..models import Account, Transaction, JournalEntry
+from ..models import Account, Transaction, JournalEntry, GeneralLedger, AccountPeriodBalance, PeriodClose
+
+JournalLine = namedtuple('JournalLine', ['account', 'debit_credit', 'amount'])
+CHART_VERSION_KEY = 'accounting:chart_version'
+# Seconds after which a process reloads its chart even when the version is unchanged.
+# The version is only shared between processes when CACHES is a shared backend; with
+# the default local-memory cache this bounds how long other processes stay stale.
+CHART_MAX_AGE = 300
+
+_account_lock = threading.Lock()
+_create_lock = threading.Lock()
+_chart = {'version': None, 'loaded_at': 0, 'accounts': {}, 'ledgers': {}}
+
+
+def warm_account_cache():
+    """
+    Loads the whole chart of accounts and the ledger of every account into the maps of
+    this process with two queries. Called by the first lookup of the process, when the
+    chart version in the cache changes and every CHART_MAX_AGE seconds.
+    """
+    version = cache.get(CHART_VERSION_KEY, 0)
+    accounts = dict(Account.objects.values_list('name', 'id'))
+    ledgers = dict(GeneralLedger.objects.order_by('-id').values_list('account_id', 'id'))
+    with _account_lock:
+        _chart.update(version=version, loaded_at=time.monotonic(), accounts=accounts, ledgers=ledgers)
+
+
+def get_chart():
+    if _chart['version'] != cache.get(CHART_VERSION_KEY, 0) or \
+            time.monotonic() - _chart['loaded_at'] > CHART_MAX_AGE:
+        warm_account_cache()
+    return _chart
+
+
+def remember_ids(key, ids):
+    """
+    Adds ids resolved inside a transaction to the chart of this process once the
+    transaction commits, so a rollback never leaves ids of rows that do not exist.
+    """
+    def remember():
+        with _account_lock:
+            _chart[key].update(ids)
+    on_commit(remember)
+
+
+def get_or_create_account(name):
+    """
+    Returns the id of the live account named `name`, creating it when missing. Live
+    account names are unique, so when another process creates the account first the
+    insert fails and that account is read instead.
+    """
+    account_id = Account.objects.filter(name=name).values_list('id', flat=True).first()
+    if account_id:
+        return account_id
+    try:
+        with atomic():
+            return Account.objects.create(name=name).id
+    except IntegrityError:
+        return Account.objects.filter(name=name).values_list('id', flat=True).get()
+
+
+def get_or_create_ledger(account_id):
+    """
+    Returns the id of the general ledger of an account, creating it when missing, with
+    the same retry as get_or_create_account.
+    """
+    ledger_id = GeneralLedger.objects.filter(account_id=account_id).values_list('id', flat=True).first()
+    if ledger_id:
+        return ledger_id
+    try:
+        with atomic():
+            return GeneralLedger.objects.create(account_id=account_id).id
+    except IntegrityError:
+        return GeneralLedger.objects.filter(account_id=account_id).values_list('id', flat=True).get()
+
+
+def get_account_ids(names):
+    """
+    Resolves account names to ids from the chart of accounts cached by this process.
+    Missing accounts are created once, under a lock, and cached when the transaction
+    creating them commits.
+
+    Parameters:
+    - names: Iterable of account names.
+
+    Returns:
+    - A dict of account name to account id.
+    """
+    names = set(names)
+    accounts = get_chart()['accounts']
+    ids = {name: accounts[name] for name in names if name in accounts}
+    missing = names - set(ids)
+    if missing:
+        with _create_lock:
+            for name in sorted(missing):
+                ids[name] = accounts.get(name) or get_or_create_account(name)
+        remember_ids('accounts', {name: ids[name] for name in missing})
+    return ids
+
+
+def get_ledger_ids(account_ids):
+    """
+    Returns a dict of account id to general ledger id, creating missing ledgers once,
+    under a lock, and caching them when the transaction commits.
+    """
+    ledgers = get_chart()['ledgers']
+    ids = {account_id: ledgers[account_id] for account_id in account_ids if account_id in ledgers}
+    missing = set(account_ids) - set(ids)
+    if missing:
+        with _create_lock:
+            for account_id in sorted(missing):
+                ids[account_id] = ledgers.get(account_id) or get_or_create_ledger(account_id)
+        remember_ids('ledgers', {account_id: ids[account_id] for account_id in missing})
+    return ids
+
+
+def clear_account_ids():
+    """
+    Drops the chart of accounts cached by this process and bumps the chart version
+    once the transaction commits, e.g. after an account is renamed or deleted.
+    Processes sharing the cache backend reload on their next lookup; with a
+    per-process cache the others reload within CHART_MAX_AGE seconds.
+    """
+    def bump_version():
+        try:
+            cache.incr(CHART_VERSION_KEY)
+        except ValueError:
+            cache.set(CHART_VERSION_KEY, 1, None)
+        with _account_lock:
+            _chart['version'] = None
+    on_commit(bump_version)
+
+
+def get_closed_through():
+    """
+    Returns the last day of the latest closed month, or None when no month is closed.
+    Read from the database every time, with one query on the unique period index, so
+    a close is seen by every process as soon as it commits.
+    """
+    period = PeriodClose.objects.order_by('-period').values_list('period', flat=True).first()
+    return period.replace(day=calendar.monthrange(period.year, period.month)[1]) if period else None
+
+
+def check_open_period(dates):
+    """
+    Raises a ValidationError when one of the dates falls in a closed month.
+    """
+    closed_through = get_closed_through()
+    if closed_through is None:
+        return
+    closed = sorted({value for value in dates if value is not None and value <= closed_through})
+    if closed:
+        raise ValidationError({'transaction_date': _(
+            "The period is closed through {closed_through}, {date} can no longer be posted to.").format(
+            closed_through=closed_through, date=closed[0])})
 
 
 def create_transaction(account_name, amount, transaction_type, description="", transaction_date=None, external_id32=None):
     """
-    Create a transaction and the associated journal entries.
+    Create a transaction whose journal is posted by the caller with post_journal.
 
     Args:
     - account_name (str): The name of the account involved in the transaction.
     - amount (Decimal): The transaction amount.
-    - transaction_type (str): The type of transaction (e.g., DEBIT or CREDIT).
+    - transaction_type (str): The type of transaction (e.g., SALE or INCOME).
     - description (str, optional): A description of the transaction.
     - transaction_date (date, optional): The date of the transaction.
+    - external_id32 (str, optional): id32 of the document the transaction records.
     """
 
     # Ensure transaction date is set
     if transaction_date is None:
         transaction_date = timezone.now().date()
 
-    # Retrieve or create the account
-    account, _ = Account.objects.get_or_create(name=account_name)
-
     # Create the Transaction
     transaction = Transaction.objects.create(
-        account=account,
+        account_id=get_account_ids([account_name])[account_name],
         transaction_date=transaction_date,
         amount=amount,
         description=description,
@@ -39,35 +199,125 @@ def create_transaction(account_name, amount, transaction_type, description="", t
     return transaction
 
 
-def create_journal_entry(transaction, amount, account_name, transaction_type):
-    account, _ = Account.objects.get_or_create(name=account_name)
-    JournalEntry.objects.create(
-        transaction=transaction,
-        journal=account_name,
-        debit_credit=transaction_type,
-        amount=amount
-    )
-    update_general_ledger(account, amount, transaction_type)
+def build_journal_entries(transaction, lines):
+    """
+    Validates the lines of one transaction and returns its unsaved JournalEntry objects.
 
+    Raises:
+    - ValidationError: When a line has an unknown side or debits and credits differ.
+    """
+    entries = []
+    totals = {DEBIT: Decimal(0), CREDIT: Decimal(0)}
+    for line in lines:
+        account, debit_credit, amount = line
+        if debit_credit not in totals:
+            raise ValidationError({'debit_credit': _("Journal line side must be DEBIT or CREDIT.")})
+        amount = Decimal(amount)
+        if not amount:
+            continue
+        totals[debit_credit] += amount
+        entries.append(JournalEntry(
+            transaction=transaction,
+            journal=account,
+            debit_credit=debit_credit,
+            amount=amount,
+        ))
+    if totals[DEBIT] != totals[CREDIT]:
+        raise ValidationError({'amount': _(
+            "Journal of transaction #{transaction} is not balanced: debit {debit}, credit {credit}.").format(
+            transaction=transaction.id32, debit=totals[DEBIT], credit=totals[CREDIT])})
+    return entries
 
-def update_general_ledger(account, amount, transaction_type):
+
+def apply_ledger_deltas(entries):
+    """
+    Adds the entries to the general ledgers, resolved from the cached chart of
+    accounts, updating each ledger's balance with one statement, in account order so
+    concurrent postings lock ledgers in the same order. A cached ledger id that no
+    longer matches a row is dropped and the ledger looked up again.
     """
-    Update the general ledger for the given account and amount.
+    account_ids = get_account_ids(entry.journal for entry in entries)
+    deltas = defaultdict(Decimal)
+    for entry in entries:
+        deltas[account_ids[entry.journal]] += entry.amount if entry.debit_credit == DEBIT else -entry.amount
+    ledger_ids = get_ledger_ids(deltas)
+    for account_id in sorted(deltas):
+        if not deltas[account_id]:
+            continue
+        updated = GeneralLedger.objects.filter(pk=ledger_ids[account_id]).update(
+            balance=F('balance') + deltas[account_id])
+        if not updated:
+            with _account_lock:
+                _chart['ledgers'].pop(account_id, None)
+            ledger_id = get_or_create_ledger(account_id)
+            GeneralLedger.objects.filter(pk=ledger_id).update(balance=F('balance') + deltas[account_id])
+            remember_ids('ledgers', {account_id: ledger_id})
 
-    Args:
-    - account (Account): The account object.
-    - amount (Decimal): The amount to update.
-    - transaction_type (str): The type of transaction (e.g., DEBIT or CREDIT).
+
+def apply_period_deltas(entries):
+    """
+    Adds the entries to the monthly account balances the financial statements read,
+    creating missing months in one insert and updating each (account, month) once.
+    """
+    account_ids = get_account_ids(entry.journal for entry in entries)
+    deltas = defaultdict(lambda: {DEBIT: Decimal(0), CREDIT: Decimal(0)})
+    for entry in entries:
+        period = entry.transaction.transaction_date.replace(day=1)
+        deltas[(account_ids[entry.journal], period)][entry.debit_credit] += entry.amount
+    AccountPeriodBalance.objects.bulk_create([
+        AccountPeriodBalance(account_id=account_id, period=period, version=0)
+        for account_id, period in deltas
+    ], ignore_conflicts=True)
+    for (account_id, period), delta in sorted(deltas.items()):
+        AccountPeriodBalance.objects.filter(account_id=account_id, period=period).update(
+            debit=F('debit') + delta[DEBIT], credit=F('credit') + delta[CREDIT], version=F('version') + 1)
+
+
+@atomic
+def post_journal(transaction, lines, user=None):
     """
-    from accounting.models import GeneralLedger
+    Posts the journal of a transaction: checks that debits equal credits, inserts all
+    lines with one bulk insert and moves each account's ledger balance once.
 
-    # Retrieve or create the general ledger entry for the account
-    ledger, _ = GeneralLedger.objects.get_or_create(account=account)
+    Parameters:
+    - transaction: The saved Transaction.
+    - lines: Iterable of JournalLine or (account name, DEBIT or CREDIT, amount) tuples.
+      Lines with a zero amount are skipped.
+    - user: User recorded on the inserted rows; defaults to the current request user.
 
-    # Update the ledger balance
-    if transaction_type == DEBIT:
-        ledger.balance += Decimal(amount)
-    elif transaction_type == CREDIT:
-        ledger.balance -= Decimal(amount)
+    Returns:
+    - The created JournalEntry objects.
+
+    Raises:
+    - ValidationError: When the journal is not balanced or dated in a closed period.
+    """
+    return post_journals([(transaction, lines)], user=user)
+
+
+@atomic
+def post_journals(journals, batch_size=1000, user=None):
+    """
+    Batch mode of post_journal, e.g. for historical transactions: every journal is
+    validated first, then all lines are inserted in batches of `batch_size` and each
+    account's ledger and monthly balance is updated once for the whole batch.
+
+    Parameters:
+    - journals: Iterable of (transaction, lines) pairs. Unsaved transactions are
+      inserted with one bulk insert first.
+    - user: User recorded on the inserted rows; defaults to the current request user.
+
+    Returns:
+    - The created JournalEntry objects.
+    """
+    journals = list(journals)
+    check_open_period(transaction.transaction_date for transaction, _lines in journals)
+    entries = []
+    for transaction, lines in journals:
+        entries += build_journal_entries(transaction, lines)
 
-    ledger.save()
+    Transaction.objects.bulk_create_with_audit(
+        [transaction for transaction, _lines in journals if transaction.pk is None], user, batch_size)
+    entries = JournalEntry.objects.bulk_create_with_audit(entries, user, batch_size)
+    apply_ledger_deltas(entries)
+    apply_period_deltas(entries)
+    return entries
@@ -0,0 +1,43 @@
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.helpers.period import close_period
+from libs.middleware import set_current_user
+
+
+class Command(BaseCommand):
+    help = 'Close every open month up to the given one: freeze account balances and archive its journal entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', help='Last month to close, YYYY-MM')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of journal entries archived per batch')
+        parser.add_argument('--username',
+                            help='User recorded as closing the periods')
+
+    def handle(self, *args, **options):
+        try:
+            period = date.fromisoformat(f"{options['period']}-01")
+        except ValueError:
+            raise CommandError('period must be in YYYY-MM format')
+
+        user = None
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+        else:
+            user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('Provide --username to record as closing user')
+        # Accounts created while rebuilding the balances are recorded under the same user.
+        set_current_user(user)
+        try:
+            closes = close_period(period, user, batch_size=options['batch_size'])
+        except ValidationError as e:
+            raise CommandError(e.messages)
+        for period_close in closes:
+            self.stdout.write(f'{period_close.period:%Y-%m} closed')
+        self.stdout.write(self.style.SUCCESS(f'{closes[-1].archived_entries} journal entries archived'))
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounting.helpers.constant import *
+from accounting.helpers.transaction import get_closed_through, post_journals
+from accounting.models import ArchivedJournalEntry, JournalEntry, Transaction
+from libs.middleware import set_current_user
+
+
+class Command(BaseCommand):
+    help = 'Post the journal of transactions that generate one but have no journal entries, e.g. imported history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of transactions posted per database transaction')
+        parser.add_argument('--username',
+                            help='User recorded as creator of the journal entries')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+        else:
+            user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('Provide --username to record as journal entry creator')
+        # Accounts and ledgers created while posting are recorded under the same user.
+        set_current_user(user)
+
+        debit_accounts = dict(JOURNAL_DEBIT_MAP)
+        pending = Transaction.objects.filter(
+            generate_journal=True, transaction_type__in=debit_accounts
+        ).exclude(pk__in=JournalEntry.objects.values('transaction_id')).exclude(
+            pk__in=ArchivedJournalEntry.objects.values('transaction_id')).select_related('account').order_by('id')
+        closed_through = get_closed_through()
+        if closed_through:
+            # Closed months can no longer be posted to.
+            pending = pending.filter(transaction_date__gt=closed_through)
+
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            entries = post_journals([
+                (transaction, [
+                    (debit_accounts[transaction.transaction_type], DEBIT, transaction.amount),
+                    (transaction.account.name, CREDIT, transaction.amount),
+                ])
+                for transaction in batch
+            ], batch_size=options['batch_size'], user=user)
+            total += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'{total} transaction(s) posted, {len(entries)} journal entries in this batch')
+        self.stdout.write(self.style.SUCCESS(f'{total} transaction(s) posted'))
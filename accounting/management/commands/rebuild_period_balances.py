@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounting.helpers.statement import rebuild_period_balances
+from libs.middleware import set_current_user
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly account balances the financial statements read from the journal entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username',
+                            help='User recorded as creator of accounts missing from the chart')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+        else:
+            user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('Provide --username to record as account creator')
+        set_current_user(user)
+
+        written = rebuild_period_balances()
+        self.stdout.write(self.style.SUCCESS(f'{written} monthly account balance(s) written'))
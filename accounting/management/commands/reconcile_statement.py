@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from accounting.helpers.reconciliation import StatementError, reconcile_statement
+from libs.middleware import set_current_user
+
+
+class Command(BaseCommand):
+    help = 'Match a bank statement CSV against the open sales payments and transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the statement CSV')
+        parser.add_argument('--window', type=int, default=3,
+                            help='Days a payment date may differ from the statement date')
+        parser.add_argument('--post', action='store_true',
+                            help='Record the automatic matches as reconciliation transactions')
+        parser.add_argument('--date-column', default='date')
+        parser.add_argument('--amount-column', default='amount')
+        parser.add_argument('--reference-column', action='append', dest='reference_columns',
+                            help='Column matched against references, repeatable (default: description, reference)')
+        parser.add_argument('--username',
+                            help='User recorded as creator of the reconciliation transactions')
+
+    def handle(self, *args, **options):
+        columns = {'date_column': options['date_column'], 'amount_column': options['amount_column']}
+        if options['reference_columns']:
+            columns['reference_columns'] = options['reference_columns']
+
+        user = None
+        if options['post']:
+            if options['username']:
+                try:
+                    user = get_user_model().objects.get(username=options['username'])
+                except get_user_model().DoesNotExist:
+                    raise CommandError(f"User {options['username']} does not exist")
+            else:
+                user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+            if not user:
+                raise CommandError('Provide --username to record as reconciliation creator')
+            # Accounts created while posting are recorded under the same user.
+            set_current_user(user)
+        try:
+            with open(options['statement'], 'rb') as statement:
+                result = reconcile_statement(statement, window=options['window'], post=options['post'],
+                                             user=user, **columns)
+        except (OSError, StatementError) as e:
+            raise CommandError(e)
+
+        for line in result['unmatched']:
+            self.stdout.write(f"Line {line['line']} {line['date']} {line['amount']} {line['reference']}: unmatched")
+            for candidate in line['candidates']:
+                self.stdout.write(f"    {candidate['score']:.2f} {candidate['label']} {candidate['date']} {candidate['amount']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['matched'])} line(s) matched, {len(result['unmatched'])} unmatched, "
+            f"{result['posted']} reconciliation(s) posted"))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('accounting', '0010_transaction_external_id32'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='reconciled_id',
+            field=models.PositiveIntegerField(blank=True, help_text='ID of the payment or transaction a reconciliation matched', null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='reconciled_type',
+            field=models.ForeignKey(blank=True, help_text='Content type of the payment or transaction a reconciliation matched', null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['reconciled_type', 'reconciled_id'], name='transaction_reconciled_idx'),
+        ),
+    ]
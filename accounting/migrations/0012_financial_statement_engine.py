@@ -0,0 +1,65 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0011_transaction_reconciled_object'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialentry',
+            name='line',
+            field=models.CharField(blank=True, help_text='Statement line the account is reported under', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='financialentry',
+            name='section',
+            field=models.CharField(blank=True, help_text='Statement section, e.g. asset or revenue', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='financialstatement',
+            name='end_date',
+            field=models.DateField(blank=True, help_text='Last day of the period', null=True),
+        ),
+        migrations.AddField(
+            model_name='financialstatement',
+            name='ledger_version',
+            field=models.BigIntegerField(default=0, help_text='Version of the period balances the entries were generated from'),
+        ),
+        migrations.AddField(
+            model_name='financialstatement',
+            name='start_date',
+            field=models.DateField(blank=True, help_text='First day of the period, empty for a balance sheet', null=True),
+        ),
+        migrations.AddField(
+            model_name='financialstatement',
+            name='statement_type',
+            field=models.CharField(blank=True, choices=[('income_statement', 'Income Statement'), ('balance_sheet', 'Balance Sheet')], help_text='Type of a generated statement', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='AccountPeriodBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=19)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=19)),
+                ('version', models.BigIntegerField(default=1, help_text='Incremented on every posting, so cached statements of the period go stale')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounting.account')),
+            ],
+            options={
+                'verbose_name': 'Account Period Balance',
+                'verbose_name_plural': 'Account Period Balances',
+                'ordering': ['-period'],
+                'indexes': [models.Index(fields=['period'], name='account_period_balance_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='accountperiodbalance',
+            constraint=models.UniqueConstraint(fields=('account', 'period'), name='unique_account_period_balance'),
+        ),
+    ]
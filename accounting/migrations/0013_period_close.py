@@ -0,0 +1,94 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounting', '0012_financial_statement_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nonce', models.CharField(blank=True, max_length=128, null=True)),
+                ('id32', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('created_at_timestamp', models.PositiveIntegerField(db_index=True)),
+                ('owned_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('owned_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('updated_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('published_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('unpublished_at', models.DateTimeField(blank=True, null=True)),
+                ('unpublished_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('unapproved_at', models.DateTimeField(blank=True, null=True)),
+                ('unapproved_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('deleted_at_timestamp', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('period', models.DateField(help_text='First day of the closed month', unique=True)),
+                ('archived_entries', models.PositiveIntegerField(default=0, help_text='Number of journal entries moved to the archive')),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_approved_by', to=settings.AUTH_USER_MODEL)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_created_by', to=settings.AUTH_USER_MODEL)),
+                ('deleted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_deleted_by', to=settings.AUTH_USER_MODEL)),
+                ('owned_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_owner', to=settings.AUTH_USER_MODEL)),
+                ('published_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_published_by', to=settings.AUTH_USER_MODEL)),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_site', to='sites.site')),
+                ('unapproved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_unapproved_by', to=settings.AUTH_USER_MODEL)),
+                ('unpublished_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_unpublished_by', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_%(class)s_updated_by', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Period Close',
+                'verbose_name_plural': 'Period Closes',
+                'ordering': ['-period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=19)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=19)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounting.account')),
+                ('period_close', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='accounting.periodclose')),
+            ],
+            options={
+                'verbose_name': 'Account Balance Snapshot',
+                'verbose_name_plural': 'Account Balance Snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedJournalEntry',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('id32', models.CharField(blank=True, max_length=100, null=True)),
+                ('journal', models.CharField(max_length=100)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=19)),
+                ('debit_credit', models.CharField(choices=[('DEBIT', 'Debit'), ('CREDIT', 'Credit')], max_length=10)),
+                ('period', models.DateField(help_text='First day of the month of the transaction')),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_journal_entries', to='accounting.transaction')),
+            ],
+            options={
+                'verbose_name': 'Archived Journal Entry',
+                'verbose_name_plural': 'Archived Journal Entries',
+                'indexes': [models.Index(fields=['period', 'journal'], name='archived_journal_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='accountbalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('period_close', 'account'), name='unique_account_balance_snapshot'),
+        ),
+    ]
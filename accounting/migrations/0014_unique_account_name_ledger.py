@@ -0,0 +1,45 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:28
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Live duplicates would violate the new constraints. Duplicate ledgers of an account
+    are merged into the oldest one. Duplicate account names were resolved to the newest
+    account when posting, so the older accounts get their id32 appended to the name.
+    """
+    Account = apps.get_model('accounting', 'Account')
+    GeneralLedger = apps.get_model('accounting', 'GeneralLedger')
+    ledgers = GeneralLedger.objects.filter(deleted_at__isnull=True)
+    for row in ledgers.values('account_id').annotate(count=Count('id'), total=Sum('balance')).filter(count__gt=1):
+        duplicates = list(ledgers.filter(account_id=row['account_id']).order_by('id').values_list('id', flat=True))
+        ledgers.filter(id=duplicates[0]).update(balance=row['total'])
+        ledgers.filter(id__in=duplicates[1:]).delete()
+
+    accounts = Account.objects.filter(deleted_at__isnull=True)
+    for row in accounts.values('name').annotate(count=Count('id')).filter(count__gt=1):
+        for account in accounts.filter(name=row['name']).order_by('-id')[1:]:
+            suffix = f' ({account.id32})'
+            account.name = account.name[:100 - len(suffix)] + suffix
+            account.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0013_period_close'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('name',), name='unique_live_account_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='generalledger',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('account',), name='unique_live_account_ledger'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 from libs.base_model import BaseModelGeneric, User
 from common.models import File
@@ -17,6 +19,10 @@ class Account(BaseModelGeneric):
     class Meta:
         verbose_name = _("Account")
         verbose_name_plural = _("Accounts")
+        constraints = [
+            models.UniqueConstraint(fields=['name'], condition=models.Q(deleted_at__isnull=True),
+                                    name='unique_live_account_name'),
+        ]
 
 
 class Tax(BaseModelGeneric):
@@ -66,6 +72,15 @@ class Transaction(BaseModelGeneric):
     attachements = models.ManyToManyField(File, blank=True)
     generate_journal = models.BooleanField(default=True)
     external_id32 = models.CharField(max_length=25, blank=True, null=True)
+    reconciled_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.SET_NULL,
+        blank=True, null=True,
+        help_text=_("Content type of the payment or transaction a reconciliation matched")
+    )
+    reconciled_id = models.PositiveIntegerField(
+        blank=True, null=True, help_text=_("ID of the payment or transaction a reconciliation matched"))
+    reconciled_object = GenericForeignKey('reconciled_type', 'reconciled_id')
 
     def __str__(self):
         return _("Transaction #{transaction_id} - {transaction_account}").format(transaction_id=self.id32, transaction_account=self.account)
@@ -73,6 +88,9 @@ class Transaction(BaseModelGeneric):
     class Meta:
         verbose_name = _("Transaction")
         verbose_name_plural = _("Transactions")
+        indexes = [
+            models.Index(fields=['reconciled_type', 'reconciled_id'], name='transaction_reconciled_idx'),
+        ]
 
 
 class JournalEntry(BaseModelGeneric):
@@ -105,11 +123,29 @@ class GeneralLedger(BaseModelGeneric):
     class Meta:
         verbose_name = _("General Ledger")
         verbose_name_plural = _("General Ledgers")
+        constraints = [
+            models.UniqueConstraint(fields=['account'], condition=models.Q(deleted_at__isnull=True),
+                                    name='unique_live_account_ledger'),
+        ]
 
 
 class FinancialStatement(BaseModelGeneric):
+    STATEMENT_TYPES = [
+        (INCOME_STATEMENT, _('Income Statement')),
+        (BALANCE_SHEET, _('Balance Sheet')),
+    ]
+
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
+    statement_type = models.CharField(
+        max_length=20, choices=STATEMENT_TYPES, blank=True,
+        help_text=_("Type of a generated statement"))
+    start_date = models.DateField(
+        blank=True, null=True, help_text=_("First day of the period, empty for a balance sheet"))
+    end_date = models.DateField(
+        blank=True, null=True, help_text=_("Last day of the period"))
+    ledger_version = models.BigIntegerField(
+        default=0, help_text=_("Version of the period balances the entries were generated from"))
 
     def __str__(self):
         return _("Financial Statement #{statement_id} - {statement_name}").format(statement_id=self.id32, statement_name=self.name)
@@ -124,6 +160,8 @@ class FinancialEntry(BaseModelGeneric):
         FinancialStatement, on_delete=models.CASCADE)
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=19, decimal_places=2)
+    section = models.CharField(max_length=20, blank=True, help_text=_("Statement section, e.g. asset or revenue"))
+    line = models.CharField(max_length=100, blank=True, help_text=_("Statement line the account is reported under"))
 
     def __str__(self):
         return _("Financial Entry #{entry_id} - {entry_statement}").format(entry_id=self.id32, entry_statement=self.financial_statement)
@@ -131,3 +169,100 @@ class FinancialEntry(BaseModelGeneric):
     class Meta:
         verbose_name = _("Financial Entry")
         verbose_name_plural = _("Financial Entries")
+
+
+class AccountPeriodBalance(models.Model):
+    """
+    Debits and credits posted to an account in one month, kept by post_journals. The
+    financial statements add these up instead of scanning the journal entries.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    period = models.DateField(help_text=_("First day of the month"))
+    debit = models.DecimalField(max_digits=19, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=19, decimal_places=2, default=0)
+    version = models.BigIntegerField(
+        default=1, help_text=_("Incremented on every posting, so cached statements of the period go stale"))
+
+    def __str__(self):
+        return f'{self.account_id} {self.period}: {self.debit} / {self.credit}'
+
+    class Meta:
+        ordering = ['-period']
+        verbose_name = _("Account Period Balance")
+        verbose_name_plural = _("Account Period Balances")
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'period'], name='unique_account_period_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['period'], name='account_period_balance_idx'),
+        ]
+
+
+class PeriodClose(BaseModelGeneric):
+    """
+    A closed month. Postings dated in or before a closed month are rejected, the
+    account balances at its end are frozen in AccountBalanceSnapshot rows and its
+    journal entries are moved to ArchivedJournalEntry.
+    """
+    period = models.DateField(unique=True, help_text=_("First day of the closed month"))
+    archived_entries = models.PositiveIntegerField(
+        default=0, help_text=_("Number of journal entries moved to the archive"))
+
+    def __str__(self):
+        return _("Period Close #{close_id} - {period}").format(close_id=self.id32, period=self.period.strftime('%Y-%m'))
+
+    class Meta:
+        ordering = ['-period']
+        verbose_name = _("Period Close")
+        verbose_name_plural = _("Period Closes")
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Cumulative debits and credits of an account at the end of a closed month. As-of
+    balances start from the nearest snapshot instead of the first posting.
+    """
+    period_close = models.ForeignKey(PeriodClose, on_delete=models.CASCADE, related_name='snapshots')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    debit = models.DecimalField(max_digits=19, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=19, decimal_places=2, default=0)
+
+    @property
+    def balance(self):
+        return self.debit - self.credit
+
+    def __str__(self):
+        return f'{self.account_id} {self.period_close_id}: {self.debit} / {self.credit}'
+
+    class Meta:
+        verbose_name = _("Account Balance Snapshot")
+        verbose_name_plural = _("Account Balance Snapshots")
+        constraints = [
+            models.UniqueConstraint(fields=['period_close', 'account'], name='unique_account_balance_snapshot'),
+        ]
+
+
+class ArchivedJournalEntry(models.Model):
+    """
+    Journal entry of a closed month, moved out of JournalEntry with its original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    id32 = models.CharField(max_length=100, blank=True, null=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='archived_journal_entries')
+    journal = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=19, decimal_places=2)
+    debit_credit = models.CharField(max_length=10, choices=JournalEntry.DEBIT_CREDIT_CHOICES)
+    period = models.DateField(help_text=_("First day of the month of the transaction"))
+    created_at = models.DateTimeField(blank=True, null=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return _("Archived Journal Entry #{entry_id} - {entry_transaction}").format(
+            entry_id=self.id32, entry_transaction=self.transaction_id)
+
+    class Meta:
+        verbose_name = _("Archived Journal Entry")
+        verbose_name_plural = _("Archived Journal Entries")
+        indexes = [
+            models.Index(fields=['period', 'journal'], name='archived_journal_period_idx'),
+        ]
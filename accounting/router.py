@@ -1,5 +1,6 @@
 from rest_framework.routers import DefaultRouter
-from .views import AccountViewSet, TaxViewSet, TransactionViewSet, JournalEntryViewSet, GeneralLedgerViewSet
+from .views import (AccountViewSet, TaxViewSet, TransactionViewSet, JournalEntryViewSet, GeneralLedgerViewSet,
+                    FinancialStatementViewSet, PeriodCloseViewSet)
 from .views.reports import TransactionSaleReportViewSet
 
 router = DefaultRouter()
@@ -8,4 +9,6 @@ router.register('tax', TaxViewSet, basename='tax')
 router.register('transaction', TransactionViewSet, basename='transaction')
 router.register('journal_entry', JournalEntryViewSet, basename='journal_entry')
 router.register('general_ledger', GeneralLedgerViewSet, basename='general_ledger')
+router.register('financial_statement', FinancialStatementViewSet, basename='financial_statement')
+router.register('period_close', PeriodCloseViewSet, basename='period_close')
 router.register('transaction_report', TransactionSaleReportViewSet, basename='transaction_report')
@@ -1,5 +1,8 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from ..models import Account, Tax, GeneralLedger, JournalEntry
+from rest_framework.validators import UniqueValidator
+from ..models import Account, Tax, GeneralLedger, JournalEntry, FinancialStatement, PeriodClose
+from ..helpers.statement import summarize_statement
 
 
 class AccountSerializer(serializers.ModelSerializer):
@@ -7,6 +10,10 @@ class AccountSerializer(serializers.ModelSerializer):
         model = Account
         fields = ["id32", "parent", "name", "description"]
         read_only_fields = ["id32"]
+        extra_kwargs = {
+            "name": {"validators": [UniqueValidator(
+                queryset=Account.objects.all(), message=_("An account with this name already exists."))]},
+        }
 
 
 class TaxSerializer(serializers.ModelSerializer):
@@ -28,3 +35,22 @@ class GeneralLedgerSerializer(serializers.ModelSerializer):
         model = GeneralLedger
         fields = ["id32", "account", "balance"]
         read_only_fields = ["id32"]
+
+
+class FinancialStatementSerializer(serializers.ModelSerializer):
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FinancialStatement
+        fields = ["id32", "name", "description", "statement_type", "start_date", "end_date", "summary"]
+        read_only_fields = fields
+
+    def get_summary(self, obj):
+        return summarize_statement(obj)
+
+
+class PeriodCloseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PeriodClose
+        fields = ["id32", "period", "archived_entries", "created_at"]
+        read_only_fields = fields
@@ -1,4 +1,6 @@
+from django.core.exceptions import ValidationError
 from rest_framework import serializers
+from ..helpers.transaction import check_open_period
 from ..models import Transaction, Account
 
 
@@ -34,6 +36,16 @@ class TransactionSerializer(TransactionMixin, serializers.ModelSerializer):
         ]
         read_only_fields = ["id32", "account"]
 
+    def validate(self, data):
+        dates = [data.get('transaction_date')]
+        if self.instance:
+            dates.append(self.instance.transaction_date)
+        try:
+            check_open_period(dates)
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return data
+
 
 class TransactionListSerializer(TransactionMixin, serializers.ModelSerializer):
     class Meta:
@@ -1,11 +1,19 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
-from ..models import Transaction
-from ..helpers.transaction import create_journal_entry
+from ..models import Account, GeneralLedger, Transaction
+from ..helpers.transaction import post_journal, clear_account_ids, check_open_period
 from ..helpers.constant import *
 
 
+@receiver(pre_save, sender=Transaction)
+def ensure_open_period(sender, instance, **kwargs):
+    dates = [instance.transaction_date]
+    if instance.pk:
+        dates += Transaction.all_objects.filter(pk=instance.pk).values_list('transaction_date', flat=True)
+    check_open_period(dates)
+
+
 @receiver(post_save, sender=Transaction)
 def generate_journal_entry(sender, instance, created, **kwargs):
     account_type = instance.transaction_type
@@ -13,5 +21,18 @@ def generate_journal_entry(sender, instance, created, **kwargs):
     amount = instance.amount
     if created and instance.generate_journal and account_type in dict(JOURNAL_DEBIT_MAP):
         debit_account_name = dict(JOURNAL_DEBIT_MAP).get(account_type)
-        create_journal_entry(instance, amount, debit_account_name, DEBIT)
-        create_journal_entry(instance, amount, account_name, CREDIT)
+        post_journal(instance, [
+            (debit_account_name, DEBIT, amount),
+            (account_name, CREDIT, amount),
+        ])
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=GeneralLedger)
+@receiver(post_delete, sender=GeneralLedger)
+def clear_account_map(sender, instance, created=False, **kwargs):
+    # A new account or ledger is added to the map by whoever looks it up first.
+    if not created:
+        clear_account_ids()
+
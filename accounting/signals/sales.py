@@ -2,7 +2,7 @@ from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from sales.models import Invoice, SalesPayment
-from ..helpers.transaction import create_transaction, create_journal_entry
+from ..helpers.transaction import create_transaction, post_journal
 from ..helpers.constant import *
 
 
@@ -21,14 +21,18 @@ def record_sales_order_transaction(sender, instance, created, **kwargs):
 
     transaction = create_transaction(SALES_ACCOUNT, subtotal, SALE, description=_(
         f"Sales of #{instance.order.id32} (Inv #{instance.id32})"), external_id32=instance.order.id32)
-    create_journal_entry(transaction, subtotal, AR_ACCOUNT, DEBIT)
-    create_journal_entry(transaction, subtotal, SALES_ACCOUNT, CREDIT)
+    post_journal(transaction, [
+        (AR_ACCOUNT, DEBIT, subtotal),
+        (SALES_ACCOUNT, CREDIT, subtotal),
+    ])
 
     if tax_amount > 0:
         vat_transaction = create_transaction(TAX_LIAB_ACCOUNT, tax_amount, TAX_PAYMENT, description=_(
             f"VAT of Sales #{instance.order.id32} (Inv #{instance.id32})"))
-        create_journal_entry(vat_transaction, tax_amount, AR_ACCOUNT, DEBIT)
-        create_journal_entry(vat_transaction, tax_amount, TAX_LIAB_ACCOUNT, CREDIT)
+        post_journal(vat_transaction, [
+            (AR_ACCOUNT, DEBIT, tax_amount),
+            (TAX_LIAB_ACCOUNT, CREDIT, tax_amount),
+        ])
 
 
 @receiver(pre_save, sender=SalesPayment)
@@ -46,7 +50,8 @@ def record_payment_transaction(sender, instance, **kwargs):
         payment_difference = instance.amount - instance.invoice.total
         transaction = create_transaction(CASH_ACCOUNT, instance.amount, INCOME, description=_(
             f"Receipt of payment #{instance.id32} for Invoice #{instance.invoice.id32})"))
-        create_journal_entry(transaction, instance.amount, CASH_ACCOUNT, DEBIT)
-        create_journal_entry(transaction, instance.invoice.total, AR_ACCOUNT, CREDIT)
-        if payment_difference !=0:
-            create_journal_entry(transaction, payment_difference, ROUNDING_ACCOUNT, CREDIT)
+        post_journal(transaction, [
+            (CASH_ACCOUNT, DEBIT, instance.amount),
+            (AR_ACCOUNT, CREDIT, instance.invoice.total),
+            (ROUNDING_ACCOUNT, CREDIT, payment_difference),
+        ])
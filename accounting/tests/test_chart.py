@@ -0,0 +1,55 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db.transaction import atomic
+from django.test import TestCase
+from libs.middleware import set_current_user
+from ..helpers.constant import ADJUSTMENT, CREDIT, DEBIT
+from ..helpers.transaction import _chart, get_account_ids, get_chart, post_journals
+from ..models import Account, GeneralLedger, Transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+class ChartCacheTest(TestCase):
+    def setUp(self):
+        _chart.update(version=None, loaded_at=0, accounts={}, ledgers={})
+        set_current_user(get_user_model().objects.create_user(username='tester'))
+        self.addCleanup(set_current_user, None)
+
+    def test_ids_created_in_a_rolled_back_transaction_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with atomic():
+                    get_account_ids(['Test Rollback'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.assertNotIn('Test Rollback', _chart['accounts'])
+        self.assertFalse(Account.objects.filter(name='Test Rollback').exists())
+
+    def test_ids_are_cached_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            account_id = get_account_ids(['Test Cash'])['Test Cash']
+            self.assertNotIn('Test Cash', _chart['accounts'])
+
+        self.assertEqual(_chart['accounts']['Test Cash'], account_id)
+
+    def test_stale_ledger_id_is_looked_up_again(self):
+        cash = Account.objects.create(name='Test Cash')
+        Account.objects.create(name='Test Sales')
+        get_chart()
+        _chart['ledgers'][cash.id] = 10 ** 12
+
+        transaction = Transaction(account=cash, transaction_date=date(2023, 1, 10), amount=Decimal('100.00'),
+                                  transaction_type=ADJUSTMENT, generate_journal=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            post_journals([(transaction, [('Test Cash', DEBIT, Decimal('100.00')),
+                                          ('Test Sales', CREDIT, Decimal('100.00'))])])
+
+        ledger = GeneralLedger.objects.get(account=cash)
+        self.assertEqual(ledger.balance, Decimal('100.00'))
+        self.assertEqual(_chart['ledgers'][cash.id], ledger.id)
@@ -0,0 +1,53 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from libs.middleware import set_current_user
+from ..helpers.constant import ADJUSTMENT, CREDIT, DEBIT
+from ..helpers.transaction import _chart, post_journals
+from ..models import Account, AccountPeriodBalance, GeneralLedger, JournalEntry, Transaction
+
+
+class PostJournalsTest(TestCase):
+    def setUp(self):
+        _chart.update(version=None, loaded_at=0, accounts={}, ledgers={})
+        self.user = get_user_model().objects.create_user(username='tester')
+        set_current_user(self.user)
+        self.addCleanup(set_current_user, None)
+        self.cash = Account.objects.create(name='Test Cash')
+        self.sales = Account.objects.create(name='Test Sales')
+
+    def journal(self, transaction_date, amount):
+        transaction = Transaction(account=self.cash, transaction_date=transaction_date, amount=amount,
+                                  transaction_type=ADJUSTMENT, generate_journal=False)
+        return transaction, [(self.cash.name, DEBIT, amount), (self.sales.name, CREDIT, amount)]
+
+    def test_posting_moves_each_ledger_and_month_once(self):
+        clerk = get_user_model().objects.create_user(username='clerk')
+        entries = post_journals([
+            self.journal(date(2023, 1, 10), Decimal('100.00')),
+            self.journal(date(2023, 1, 20), Decimal('50.00')),
+            self.journal(date(2023, 2, 1), Decimal('25.00')),
+        ], user=clerk)
+
+        self.assertEqual(len(entries), 6)
+        self.assertEqual({entry.created_by for entry in entries}, {clerk})
+        self.assertEqual(GeneralLedger.objects.get(account=self.cash).balance, Decimal('175.00'))
+        self.assertEqual(GeneralLedger.objects.get(account=self.sales).balance, Decimal('-175.00'))
+        january = AccountPeriodBalance.objects.get(account=self.cash, period=date(2023, 1, 1))
+        self.assertEqual((january.debit, january.credit), (Decimal('150.00'), Decimal('0.00')))
+        february = AccountPeriodBalance.objects.get(account=self.sales, period=date(2023, 2, 1))
+        self.assertEqual((february.debit, february.credit), (Decimal('0.00'), Decimal('25.00')))
+
+    def test_unbalanced_journal_writes_nothing(self):
+        transaction = Transaction(account=self.cash, transaction_date=date(2023, 1, 10), amount=Decimal('10.00'),
+                                  transaction_type=ADJUSTMENT, generate_journal=False)
+        with self.assertRaises(ValidationError):
+            post_journals([
+                self.journal(date(2023, 1, 10), Decimal('100.00')),
+                (transaction, [(self.cash.name, DEBIT, Decimal('10.00')), (self.sales.name, CREDIT, Decimal('9.00'))]),
+            ])
+
+        self.assertFalse(JournalEntry.objects.filter(journal__in=[self.cash.name, self.sales.name]).exists())
+        self.assertFalse(AccountPeriodBalance.objects.filter(account__in=[self.cash, self.sales]).exists())
@@ -0,0 +1,76 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from libs.middleware import set_current_user
+from ..helpers.constant import ADJUSTMENT, CREDIT, DEBIT
+from ..helpers.period import close_period, get_balances_as_of
+from ..helpers.transaction import _chart, get_closed_through, post_journals
+from ..models import (Account, AccountBalanceSnapshot, AccountPeriodBalance, ArchivedJournalEntry, JournalEntry,
+                      PeriodClose, Transaction)
+
+
+class ClosePeriodTest(TestCase):
+    def setUp(self):
+        _chart.update(version=None, loaded_at=0, accounts={}, ledgers={})
+        self.user = get_user_model().objects.create_user(username='tester')
+        set_current_user(self.user)
+        self.addCleanup(set_current_user, None)
+        self.cash = Account.objects.create(name='Test Cash')
+        self.sales = Account.objects.create(name='Test Sales')
+        self.post(date(2023, 1, 10), Decimal('100.00'))
+        self.post(date(2023, 2, 1), Decimal('30.00'))
+
+    def post(self, transaction_date, amount):
+        transaction = Transaction(account=self.cash, transaction_date=transaction_date, amount=amount,
+                                  transaction_type=ADJUSTMENT, generate_journal=False)
+        return post_journals([(transaction, [(self.cash.name, DEBIT, amount), (self.sales.name, CREDIT, amount)])])
+
+    def snapshot(self, period_close, account):
+        snapshot = AccountBalanceSnapshot.objects.get(period_close=period_close, account=account)
+        return snapshot.debit, snapshot.credit
+
+    def test_close_rebuilds_drifted_balances_from_archived_entries(self):
+        AccountPeriodBalance.objects.filter(account=self.cash, period=date(2023, 1, 1)).update(debit=Decimal('999.00'))
+
+        set_current_user(None)
+        closes = close_period(date(2023, 1, 31), self.user)
+
+        self.assertEqual([close.period for close in closes], [date(2023, 1, 1)])
+        self.assertEqual(closes[-1].created_by, self.user)
+        self.assertEqual(PeriodClose.objects.get(period=date(2023, 1, 1)).archived_entries, 2)
+        self.assertEqual(self.snapshot(closes[-1], self.cash), (Decimal('100.00'), Decimal('0.00')))
+        self.assertEqual(self.snapshot(closes[-1], self.sales), (Decimal('0.00'), Decimal('100.00')))
+        self.assertEqual(AccountPeriodBalance.objects.get(account=self.cash, period=date(2023, 1, 1)).debit,
+                         Decimal('100.00'))
+        self.assertEqual(ArchivedJournalEntry.objects.filter(period=date(2023, 1, 1)).count(), 2)
+        self.assertEqual(JournalEntry.objects.filter(transaction__transaction_date=date(2023, 2, 1)).count(), 2)
+        self.assertFalse(JournalEntry.objects.filter(transaction__transaction_date=date(2023, 1, 10)).exists())
+
+        self.assertEqual(get_balances_as_of(date(2023, 1, 15))[self.cash.id], (Decimal('100.00'), Decimal('0.00')))
+        self.assertEqual(get_balances_as_of(date(2023, 2, 28))[self.cash.id], (Decimal('130.00'), Decimal('0.00')))
+
+    def test_next_close_starts_from_previous_snapshot(self):
+        close_period(date(2023, 1, 31))
+        closes = close_period(date(2023, 2, 28))
+
+        self.assertEqual([close.period for close in closes], [date(2023, 2, 1)])
+        self.assertEqual(closes[-1].archived_entries, 2)
+        self.assertEqual(self.snapshot(closes[-1], self.cash), (Decimal('130.00'), Decimal('0.00')))
+        self.assertEqual(get_balances_as_of(date(2023, 3, 31))[self.sales.id], (Decimal('0.00'), Decimal('130.00')))
+
+    def test_closed_period_rejects_postings_and_closes(self):
+        close_period(date(2023, 1, 31))
+
+        with self.assertRaises(ValidationError):
+            self.post(date(2023, 1, 20), Decimal('10.00'))
+        with self.assertRaises(ValidationError):
+            close_period(date(2023, 1, 31))
+        self.post(date(2023, 2, 2), Decimal('10.00'))
+        self.assertEqual(get_balances_as_of(date(2023, 2, 28))[self.cash.id], (Decimal('140.00'), Decimal('0.00')))
+
+    def test_closed_through_is_read_from_the_database(self):
+        self.assertIsNone(get_closed_through())
+        PeriodClose.objects.create(period=date(2023, 3, 1))
+        self.assertEqual(get_closed_through(), date(2023, 3, 31))
@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from libs.middleware import set_current_user
+from ..helpers.constant import *
+from ..helpers.statement import generate_statement, summarize_statement
+from ..helpers.transaction import _chart, get_account_ids, post_journals
+from ..models import FinancialEntry, Transaction
+
+
+class GenerateStatementTest(TestCase):
+    def setUp(self):
+        _chart.update(version=None, loaded_at=0, accounts={}, ledgers={})
+        set_current_user(get_user_model().objects.create_user(username='tester'))
+        self.addCleanup(set_current_user, None)
+        self.cash_id = get_account_ids([CASH_ACCOUNT, SALES_ACCOUNT])[CASH_ACCOUNT]
+
+    def sell(self, transaction_date, amount):
+        transaction = Transaction(account_id=self.cash_id, transaction_date=transaction_date, amount=amount,
+                                  transaction_type=ADJUSTMENT, generate_journal=False)
+        post_journals([(transaction, [(CASH_ACCOUNT, DEBIT, amount), (SALES_ACCOUNT, CREDIT, amount)])])
+
+    def test_statement_is_recomputed_only_when_its_months_change(self):
+        self.sell(date(2023, 1, 10), Decimal('100.00'))
+        statement = generate_statement(INCOME_STATEMENT, date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual(summarize_statement(statement)['net_income'], Decimal('100.00'))
+        entry_ids = set(FinancialEntry.objects.filter(financial_statement=statement).values_list('id', flat=True))
+
+        self.sell(date(2023, 2, 1), Decimal('30.00'))
+        unchanged = generate_statement(INCOME_STATEMENT, date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual(unchanged.ledger_version, statement.ledger_version)
+        self.assertEqual(set(FinancialEntry.objects.filter(
+            financial_statement=unchanged).values_list('id', flat=True)), entry_ids)
+
+        self.sell(date(2023, 1, 20), Decimal('50.00'))
+        regenerated = generate_statement(INCOME_STATEMENT, date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual(regenerated.pk, statement.pk)
+        self.assertNotEqual(regenerated.ledger_version, statement.ledger_version)
+        self.assertEqual(summarize_statement(regenerated)['net_income'], Decimal('150.00'))
+
+    def test_balance_sheet_carries_current_earnings(self):
+        self.sell(date(2023, 1, 10), Decimal('100.00'))
+        self.sell(date(2023, 2, 1), Decimal('30.00'))
+        sections = summarize_statement(generate_statement(BALANCE_SHEET, None, date(2023, 2, 28)))['sections']
+
+        self.assertEqual(sections['asset']['total'], Decimal('130.00'))
+        self.assertEqual(sections['equity']['lines'], [{'line': CURRENT_EARNINGS_LINE, 'amount': Decimal('130.00')}])
@@ -1,10 +1,17 @@
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, mixins, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from libs.pagination import CustomPagination
-from ..models import Account, Tax, Transaction, JournalEntry, GeneralLedger
-from ..serializers import AccountSerializer, TaxSerializer, JournalEntrySerializer, GeneralLedgerSerializer
+from datetime import date
+from ..helpers.constant import BALANCE_SHEET, INCOME_STATEMENT
+from ..helpers.period import close_period, get_balances_as_of
+from ..helpers.reconciliation import StatementError, reconcile_statement
+from ..helpers.statement import generate_statement
+from ..models import Account, Tax, Transaction, JournalEntry, GeneralLedger, FinancialStatement, PeriodClose
+from ..serializers import (AccountSerializer, TaxSerializer, JournalEntrySerializer, GeneralLedgerSerializer,
+                           FinancialStatementSerializer, PeriodCloseSerializer)
 from ..serializers.transaction import TransactionListSerializer, TransactionSerializer
 
 # Create your views here.
@@ -43,6 +50,31 @@ class TransactionViewSet(viewsets.ModelViewSet):
             return TransactionListSerializer
         return TransactionSerializer
 
+    @action(detail=False, methods=['post'])
+    def reconcile(self, request):
+        """
+        Matches a bank statement CSV (`file`, with `date`, `amount` and `description`
+        columns) against the open sales payments and transactions. Automatic matches are
+        recorded as RECONCILIATION transactions when `post` is true; the other lines come
+        back with fuzzy candidates. `window` is the number of days a payment date may
+        differ from the statement date (3 by default).
+        """
+        statement = request.FILES.get('file')
+        if not statement:
+            return Response({"error": _("A statement CSV file is required.")}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            window = int(request.data.get('window', 3))
+        except ValueError:
+            return Response({"error": _("window must be a number of days.")}, status=status.HTTP_400_BAD_REQUEST)
+        post = str(request.data.get('post', '')).lower() in ['true', '1']
+        try:
+            result = reconcile_statement(statement.file, window=max(window, 0), post=post, user=request.user)
+        except StatementError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
 
 class JournalEntryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = JournalEntry.objects.all()
@@ -55,6 +87,13 @@ class JournalEntryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, view
 
 
 class GeneralLedgerViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    General ledgers with their current balance.
+
+    as_of:
+    Return the debit, credit and balance of every account at the end of `date`
+    (YYYY-MM-DD), starting from the snapshot of the latest month closed by then.
+    """
     queryset = GeneralLedger.objects.all()
     serializer_class = GeneralLedgerSerializer
     lookup_field = 'id32'
@@ -62,3 +101,84 @@ class GeneralLedgerViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, vie
                           permissions.DjangoModelPermissions]
     pagination_class = CustomPagination
     filter_backends = (filters.OrderingFilter,)
+
+    @action(detail=False, methods=['get'])
+    def as_of(self, request):
+        try:
+            as_of = date.fromisoformat(request.query_params['date'])
+        except (KeyError, ValueError):
+            return Response({"error": _("date must be in 'YYYY-MM-DD' format.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        balances = get_balances_as_of(as_of)
+        accounts = Account.objects.filter(pk__in=balances).values('id', 'id32', 'name').order_by('name')
+        return Response([
+            {'account_id32': account['id32'], 'account_name': account['name'],
+             'debit': balances[account['id']][0], 'credit': balances[account['id']][1],
+             'balance': balances[account['id']][0] - balances[account['id']][1]}
+            for account in accounts
+        ])
+
+
+class PeriodCloseViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Closed months.
+
+    close:
+    Close every open month up to `period` (YYYY-MM): account balances are frozen,
+    postings dated in those months are rejected and their journal entries archived.
+    """
+    queryset = PeriodClose.objects.all()
+    serializer_class = PeriodCloseSerializer
+    lookup_field = 'id32'
+    permission_classes = [permissions.IsAuthenticated,
+                          permissions.DjangoModelPermissions]
+    pagination_class = CustomPagination
+    filter_backends = (filters.OrderingFilter,)
+
+    @action(detail=False, methods=['post'])
+    def close(self, request):
+        try:
+            period = date.fromisoformat(f"{request.data['period']}-01")
+        except (KeyError, ValueError):
+            return Response({"error": _("period must be in 'YYYY-MM' format.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            closes = close_period(period, user=request.user)
+        except ValidationError as e:
+            return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(closes, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class FinancialStatementViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Generated financial statements.
+
+    generate:
+    Return the statement of `statement_type` (income_statement or balance_sheet) for
+    the months `start` to `end` (YYYY-MM). A balance sheet is as of the end of `end`.
+    The stored statement is reused unless a posting touched one of its months.
+    """
+    queryset = FinancialStatement.objects.exclude(statement_type='')
+    serializer_class = FinancialStatementSerializer
+    lookup_field = 'id32'
+    permission_classes = [permissions.IsAuthenticated,
+                          permissions.DjangoModelPermissions]
+    pagination_class = CustomPagination
+    filter_backends = (filters.OrderingFilter,)
+
+    @action(detail=False, methods=['get'])
+    def generate(self, request):
+        statement_type = request.query_params.get('statement_type')
+        if statement_type not in [INCOME_STATEMENT, BALANCE_SHEET]:
+            return Response({"error": _("statement_type must be income_statement or balance_sheet.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = date.fromisoformat(f"{request.query_params['end']}-01")
+            start = date.fromisoformat(f"{request.query_params.get('start') or request.query_params['end']}-01")
+        except (KeyError, ValueError):
+            return Response({"error": _("start and end must be in 'YYYY-MM' format.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": _("start must not be after end.")}, status=status.HTTP_400_BAD_REQUEST)
+        statement = generate_statement(statement_type, start, end)
+        return Response(self.get_serializer(statement).data)
@@ -2,27 +2,27 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Sum, Value, DecimalField
-from django.db.models.functions import TruncDay, TruncMonth, Coalesce
+from django.db.models.functions import TruncMonth, Coalesce
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from libs.mixins import ReplicaReadMixin
 from datetime import timedelta
-from ..models import Transaction
-from ..filters import TransactionFilter
-from ..helpers.constant import SALE
+from sales.models import DailySalesFact
+from ..filters import SalesFactFilter
 
-class TransactionSaleReportViewSet(viewsets.ViewSet):
+class TransactionSaleReportViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """
     A ViewSet for viewing transaction sales statistics.
+
+    Totals are read from the DailySalesFact rollup (gross sales excluding VAT, by
+    invoice date), so the cost does not grow with the number of transactions.
     """
+    replica_actions = ['sales_statistics']
     filter_backends = (DjangoFilterBackend,)
-    filterset_class = TransactionFilter
+    filterset_class = SalesFactFilter
 
     def get_queryset(self):
-        """
-        Restricts the returned sales to transactions marked as SALE.
-        """
-        queryset = Transaction.objects.filter(transaction_type=SALE)
-        return queryset
+        return DailySalesFact.objects.all()
 
     @action(detail=False, methods=['get'], url_path='sales-statistics')
     def sales_statistics(self, request, *args, **kwargs):
@@ -33,14 +33,13 @@ class TransactionSaleReportViewSet(viewsets.ViewSet):
         
         # Aggregate data
         if aggregate_by == 'daily':
-            aggregated_data = queryset.annotate(date=TruncDay('transaction_date')) \
-                                      .values('date') \
-                                      .annotate(total_sales=Coalesce(Sum('amount'), Value(0), output_field=DecimalField())) \
+            aggregated_data = queryset.values('date') \
+                                      .annotate(total_sales=Coalesce(Sum('gross'), Value(0), output_field=DecimalField())) \
                                       .order_by('date')
         else:  # Monthly aggregation
-            aggregated_data = queryset.annotate(month=TruncMonth('transaction_date')) \
+            aggregated_data = queryset.annotate(month=TruncMonth('date')) \
                                       .values('month') \
-                                      .annotate(total_sales=Coalesce(Sum('amount'), Value(0), output_field=DecimalField())) \
+                                      .annotate(total_sales=Coalesce(Sum('gross'), Value(0), output_field=DecimalField())) \
                                       .order_by('month')
 
         # Prepare the result set
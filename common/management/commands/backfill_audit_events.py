@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from libs import audit
+from libs.base_model import _BaseAbstract
+from common.models import AuditEvent
+
+BACKFILLED_ACTIONS = [audit.APPROVED, audit.UNAPPROVED,
+                      audit.PUBLISHED, audit.UNPUBLISHED, audit.DELETED]
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the inline approval, publication and deletion columns of every model into "
+        "the AuditEvent log. Only the latest state is known, so one event is created per "
+        "record and action. Models that already have events for an action are skipped, "
+        "so the command can be rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Number of events inserted per query.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the events without writing them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        for model in apps.get_models():
+            if not issubclass(model, _BaseAbstract):
+                continue
+            content_type = ContentType.objects.get_for_model(model)
+            for action in BACKFILLED_ACTIONS:
+                if AuditEvent.objects.filter(content_type=content_type, action=action).exists():
+                    continue
+                rows = model.all_objects.filter(**{f'{action}_at__isnull': False}).order_by().values_list(
+                    'pk', f'{action}_at', f'{action}_by_id')
+                count = 0
+                batch = []
+                for pk, action_at, user_id in rows.iterator(chunk_size=batch_size):
+                    batch.append(AuditEvent(content_type=content_type, object_id=pk, action=action,
+                                            user_id=user_id, created_at=action_at))
+                    if len(batch) >= batch_size:
+                        count += self.write(batch, options['dry_run'])
+                        batch = []
+                count += self.write(batch, options['dry_run'])
+                if count:
+                    self.stdout.write(f"{model._meta.label} {action}: {count}")
+                total += count
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} audit events."))
+
+    def write(self, batch, dry_run):
+        if batch and not dry_run:
+            AuditEvent.objects.bulk_create(batch)
+        return len(batch)
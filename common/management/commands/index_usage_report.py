@@ -0,0 +1,84 @@
+import re
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from hr.models import Attendance
+from inventory.models import StockMovement, StockMovementItem, Warehouse, WarehouseStock
+from sales.models import CustomerVisit, Trip
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+INDEX_SCAN = re.compile(r'(?:Index Scan|Index Only Scan|Bitmap Index Scan) (?:Backward )?(?:using|on) (\w+)')
+
+
+def get_hot_queries():
+    """
+    Catalogue of the hottest query shapes of the app, with placeholder ids. The plan
+    depends on the shape of the filter, not on the id values.
+    """
+    warehouse_ct = ContentType.objects.get_for_model(Warehouse)
+    trip_ct = ContentType.objects.get_for_model(Trip)
+    return [
+        ('warehouse stock batches with quantity',
+         WarehouseStock.objects.filter(warehouse_id=1, product_id=1, unit_id=1, quantity__gt=0)),
+        ('warehouse stock batches of products',
+         WarehouseStock.objects.filter(warehouse_id=1, product_id__in=[1, 2])),
+        ('stock movements to a warehouse by status',
+         StockMovement.objects.filter(destination_type=warehouse_ct, destination_id=1,
+                                      status__in=[StockMovement.READY, StockMovement.ON_DELIVERY])),
+        ('stock movements created by a trip',
+         StockMovement.objects.filter(creator_type=trip_ct, creator_id=1)),
+        ('movement items by origin status',
+         StockMovementItem.objects.filter(stock_movement_id=1, origin_movement_status=StockMovementItem.PUT)),
+        ('movement items by destination status',
+         StockMovementItem.objects.filter(stock_movement_id=1, destination_movement_status=StockMovementItem.PUT)),
+        ('customer visits of a trip by status',
+         CustomerVisit.objects.filter(trip_id=1, status='completed')),
+        ('open attendance of an employee',
+         Attendance.objects.filter(employee_id=1, clock_out__isnull=True)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN over the catalogue of hot queries, flag sequential scans and list index usage statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Use EXPLAIN ANALYZE, which executes the queries')
+        parser.add_argument('--plans', action='store_true',
+                            help='Print the full query plans')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The index usage report requires PostgreSQL')
+
+        seq_scans = 0
+        for label, queryset in get_hot_queries():
+            plan = queryset.explain(analyze=options['analyze'])
+            tables = SEQ_SCAN.findall(plan)
+            indexes = INDEX_SCAN.findall(plan)
+            if tables:
+                seq_scans += 1
+                self.stdout.write(self.style.WARNING(
+                    f'SEQ SCAN  {label}: {", ".join(tables)}'))
+            else:
+                self.stdout.write(f'OK        {label}: {", ".join(indexes) or "-"}')
+            if options['plans']:
+                self.stdout.write(plan)
+
+        self.stdout.write('\nIndex usage (pg_stat_user_indexes):')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, indexrelname, idx_scan, pg_size_pretty(pg_relation_size(indexrelid)) "
+                "FROM pg_stat_user_indexes WHERE indexrelname LIKE %s OR indexrelname LIKE %s "
+                "OR indexrelname LIKE %s ORDER BY idx_scan",
+                ['inv\\_%', 'sales\\_%', 'hr\\_%'])
+            for table, index, scans, size in cursor.fetchall():
+                self.stdout.write(f'  {table}.{index}: {scans} scan(s), {size}')
+
+        message = f'{seq_scans} hot query(ies) use a sequential scan'
+        if seq_scans:
+            self.stdout.write(self.style.WARNING(
+                message + '. Small tables are often scanned sequentially on purpose; '
+                'run ANALYZE and check again on production-sized data.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
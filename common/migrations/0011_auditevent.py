@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('common', '0010_alter_file_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(help_text='Primary key of the audited record')),
+                ('action', models.CharField(choices=[('approved', 'Approved'), ('unapproved', 'Unapproved'), ('published', 'Published'), ('unpublished', 'Unpublished'), ('deleted', 'Deleted'), ('undeleted', 'Undeleted')], help_text='Lifecycle action performed on the record', max_length=20)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='When the action was performed')),
+                ('content_type', models.ForeignKey(help_text='Model of the audited record', on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(blank=True, help_text='User who performed the action', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Audit Event',
+                'verbose_name_plural': 'Audit Events',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='common_audit_object_idx')],
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+from libs import audit
 from libs.base_model import BaseModelGeneric, User
 from libs.storage import FILE_STORAGE
 
@@ -37,6 +39,56 @@ class File(BaseModelGeneric):
         verbose_name_plural = _("Files")
 
 
+class AuditEvent(models.Model):
+    """
+    Append-only log of record lifecycle actions (approval, publication, deletion),
+    written in bulk by libs.audit at transaction commit.
+    """
+    ACTION_CHOICES = [
+        (audit.APPROVED, _('Approved')),
+        (audit.UNAPPROVED, _('Unapproved')),
+        (audit.PUBLISHED, _('Published')),
+        (audit.UNPUBLISHED, _('Unpublished')),
+        (audit.DELETED, _('Deleted')),
+        (audit.UNDELETED, _('Undeleted')),
+    ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        help_text=_("Model of the audited record"))
+    object_id = models.PositiveBigIntegerField(
+        help_text=_("Primary key of the audited record"))
+    content_object = GenericForeignKey('content_type', 'object_id')
+    action = models.CharField(
+        max_length=20,
+        choices=ACTION_CHOICES,
+        help_text=_("Lifecycle action performed on the record"))
+    user = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='audit_events',
+        help_text=_("User who performed the action"))
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text=_("When the action was performed"))
+
+    def __str__(self):
+        return f"{self.content_type} #{self.object_id} {self.action}"
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _("Audit Event")
+        verbose_name_plural = _("Audit Events")
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'],
+                         name='common_audit_object_idx'),
+        ]
+
+
 class AdministrativeBaseModel(models.Model):
     class Meta:
         abstract = True
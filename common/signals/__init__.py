@@ -0,0 +1,50 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from libs.token_cache import clear_token_cache, invalidate_token, invalidate_user
+
+
+# Table of Content
+
+# Token cache
+# 1. drop_cached_token: Removes a deleted or replaced token from the token cache.
+# 2. drop_cached_user: Removes the tokens of a changed or deleted user from the token cache.
+# 3. drop_cached_user_permissions: Removes the tokens of a user whose groups or permissions change.
+# 4. drop_cached_group_permissions: Clears the token cache when group permissions change.
+# 5. drop_cached_group: Clears the token cache when a group is deleted.
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def drop_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def drop_cached_user_permissions(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # Changed from the group/permission side, which may affect many users.
+        clear_token_cache()
+    else:
+        invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def drop_cached_group_permissions(sender, action, **kwargs):
+    if action.startswith('post_'):
+        clear_token_cache()
+
+
+@receiver(post_delete, sender=Group)
+def drop_cached_group(sender, instance, **kwargs):
+    clear_token_cache()
@@ -2,6 +2,9 @@
 ASGI config for erp_backoffice project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI worker, e.g.
+``gunicorn -k uvicorn.workers.UvicornWorker erp_backoffice.asgi:application``,
+so async views (product catalogue, stock lookup) run concurrently on one worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
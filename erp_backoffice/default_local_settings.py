@@ -38,6 +38,26 @@ DATABASES = {
     }
 }
 
+# Optional read replica for reporting endpoints. Locally, point it at a second
+# Postgres instance or a copy of the database to try the routing.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Shared cache for all workers, e.g. redis://redis:6379/0.
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+        }
+    }
+
 # S3 Configuration
 USE_S3 = True
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
@@ -71,6 +71,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'libs.middleware.SetCurrentUserMiddleware',
+    'libs.middleware.StickyPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -174,6 +175,33 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Audit log: when True, publication actions and the *_timestamp / deleted_by audit
+# columns are only kept in common.AuditEvent, not written inline on every table.
+COMPACT_AUDIT = False
+
+# Django cache. The accounting chart version, the token cache versions
+# (libs.token_cache) and replica stickiness (libs.db_router) are only seen by every
+# worker when this is a shared backend; local_settings switches it to Redis when
+# CACHE_URL is set. The default local-memory cache is per process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Per-process cache of validated API tokens and their users' permissions.
+# Set TOKEN_CACHE_TTL to 0 to disable it.
+TOKEN_CACHE_TTL = 300
+TOKEN_CACHE_MAXSIZE = 10000
+
+# Read replica for reporting endpoints (libs.db_router). Replica reads are only used
+# when DATABASES has a REPLICA_DATABASE alias; otherwise everything reads the primary.
+DATABASE_ROUTERS = ['libs.db_router.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_MAX_LAG = 30  # seconds of replication lag before falling back to the primary
+REPLICA_LAG_CHECK_INTERVAL = 5
+REPLICA_STICKY_SECONDS = 15  # reads stay on the primary this long after a user writes
+
 # swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
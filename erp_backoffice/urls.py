@@ -33,6 +33,7 @@ from django.conf.urls.i18n import i18n_patterns
 from django.views.i18n import set_language
 from django.conf import settings
 
+from inventory.views.catalogue import ProductCatalogueView, StockLookupView
 from sales.views.report import SalesReportAPIView
 
 schema_view = get_schema_view(
@@ -58,6 +59,8 @@ urlpatterns = [
     path('api/common/', include(common_router.urls)),
     path('api/hr/', include(hr_router.urls)),
     path('api/identities/', include(identities_router.urls)),
+    path('api/inventory/catalogue/', ProductCatalogueView.as_view(), name='product_catalogue'),
+    path('api/inventory/stock_lookup/', StockLookupView.as_view(), name='stock_lookup'),
     path('api/inventory/', include(inventory_router.urls)),
     path('api/logistics/', include(logistics_router.urls)),
     path('api/production/', include(production_router.urls)),
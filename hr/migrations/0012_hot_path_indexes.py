@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('hr', '0011_alter_locationtracker_employee'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('clock_out__isnull', True), ('deleted_at__isnull', True)), fields=['employee'], name='hr_attendance_open_idx'),
+        ),
+    ]
@@ -81,6 +81,10 @@ class Attendance(BaseModelGeneric):
         ordering = ['-id']
         verbose_name = _("Attendance")
         verbose_name_plural = _("Attendances")
+        indexes = [
+            models.Index(fields=['employee'], condition=models.Q(
+                deleted_at__isnull=True, clock_out__isnull=True), name='hr_attendance_open_idx'),
+        ]
 
 
 class Performance(BaseModelGeneric):
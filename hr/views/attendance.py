@@ -5,6 +5,7 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, mixins, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from libs.mixins import ReplicaReadMixin
 from libs.pagination import CustomPagination
 from ..models import Attendance, Employee
 from ..serializers.attendance import (ClockInSerializer, 
@@ -44,7 +45,8 @@ class AttendanceFilter(django_filters.FilterSet):
             Q(employee__user__last_name__icontains=value)
         )
 
-class AttendanceViewSet(mixins.CreateModelMixin,
+class AttendanceViewSet(ReplicaReadMixin,
+                        mixins.CreateModelMixin,
                         mixins.RetrieveModelMixin,
                         mixins.ListModelMixin,
                         mixins.UpdateModelMixin,
@@ -57,6 +59,7 @@ class AttendanceViewSet(mixins.CreateModelMixin,
     filterset_class = AttendanceFilter
     filter_backends = (django_filters.rest_framework.DjangoFilterBackend, filters.OrderingFilter)
     lookup_field = 'id32'
+    replica_actions = ['monthly_report']
 
     def get_serializer_class(self):
         if self.action == 'clock_in':
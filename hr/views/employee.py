@@ -1,4 +1,5 @@
 from rest_framework import viewsets, permissions, filters
+from libs.mixins import LeanListMixin
 from libs.pagination import CustomPagination
 from ..models import Department, Employee, LocationTracker
 from ..serializers.employee import DepartmentSerializer, EmployeeSerializer, LocationTrackerSerializer
@@ -23,7 +24,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'patch', 'head', 'options', 'put']
 
 
-class LocationTrackerViewSet(viewsets.ModelViewSet):
+class LocationTrackerViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = LocationTracker.objects.all()
     serializer_class = LocationTrackerSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
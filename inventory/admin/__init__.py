@@ -5,7 +5,8 @@ from django import forms
 from libs.admin import BaseAdmin
 
 from inventory.models import (Category, Unit, Product, ProductGroup, ProductLog, StockMovement, StockMovementItem,
-                              StockAdjustment, ReplenishmentOrder, ReplenishmentReceived, Warehouse, WarehouseStock, ProductLocation)
+                              StockAdjustment, ReplenishmentOrder, ReplenishmentReceived, Warehouse, WarehouseStock, ProductLocation,
+                              StockLedgerEntry, CostLayer)
 
 
 @admin.register(Category)
@@ -181,6 +182,37 @@ class WarehouseStockAdmin(BaseAdmin):
               'expire_date', 'inbound_movement_item', 'dispatch_movement_items']
 
 
+@admin.register(StockLedgerEntry)
+class StockLedgerEntryAdmin(BaseAdmin):
+    list_display = ['date', 'warehouse', 'product', 'unit', 'delta', 'reason', 'created_by']
+    list_filter = ['reason', 'warehouse']
+    readonly_fields = ['warehouse', 'product', 'unit', 'batch', 'delta', 'reason', 'ref_type', 'ref_id',
+                       'date', 'created_by']
+    ordering = ['-id']
+    search_fields = ['product__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CostLayer)
+class CostLayerAdmin(BaseAdmin):
+    list_display = ['warehouse', 'product', 'unit_cost', 'quantity', 'remaining', 'received_at']
+    list_filter = ['warehouse']
+    readonly_fields = ['warehouse', 'product', 'inbound_movement_item', 'unit_cost', 'quantity', 'remaining']
+    ordering = ['-id']
+    search_fields = ['product__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ProductLocation)
 class ProductLocationAdmin(BaseAdmin):
     list_display = ['id32', 'warehouse', 'area',
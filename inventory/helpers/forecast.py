@@ -0,0 +1,263 @@
+import math
+from datetime import timedelta
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from sales.models import OrderItem, SalesOrder
+from ..models import Product, ReplenishmentOrder, StockMovement, StockMovementItem, Warehouse
+from .stock import get_stock_balances
+
+MOVING_AVERAGE = 'moving_average'
+EXPONENTIAL_SMOOTHING = 'exponential_smoothing'
+SOURCE_ORDER = 'order'
+SOURCE_MOVEMENT = 'movement'
+
+EXCLUDED_ORDER_STATUSES = [SalesOrder.DRAFT,
+                           SalesOrder.REJECTED, SalesOrder.CANCELED]
+EXCLUDED_MOVEMENT_STATUSES = [StockMovement.REQUESTED,
+                              StockMovement.CANCELED, StockMovement.RETURNED]
+
+
+def get_daily_sales(start_date, end_date, source=SOURCE_ORDER, warehouse_ids=None):
+    """
+    Returns daily sold quantity per (product, warehouse, unit) in one aggregated query.
+
+    Parameters:
+    - start_date, end_date: Inclusive date range of the history.
+    - source: SOURCE_ORDER reads OrderItem of non draft/rejected/canceled sales orders,
+      SOURCE_MOVEMENT reads StockMovementItem dispatched from a warehouse to a customer.
+    - warehouse_ids: Optional list of warehouse ids to limit the history to.
+
+    Returns:
+    - A list of (product_id, warehouse_id, date, unit_id, quantity) tuples.
+    """
+    if source == SOURCE_MOVEMENT:
+        rows = StockMovementItem.objects.filter(
+            stock_movement__origin_type=ContentType.objects.get_for_model(
+                Warehouse),
+            destination_customer__isnull=False,
+            stock_movement__movement_date__date__range=(start_date, end_date),
+        ).exclude(stock_movement__status__in=EXCLUDED_MOVEMENT_STATUSES)
+        if warehouse_ids:
+            rows = rows.filter(stock_movement__origin_id__in=warehouse_ids)
+        rows = rows.annotate(day=TruncDate('stock_movement__movement_date')).values_list(
+            'product_id', 'stock_movement__origin_id', 'day', 'unit_id')
+    else:
+        rows = OrderItem.objects.filter(
+            order__warehouse__isnull=False,
+            order__order_date__range=(start_date, end_date),
+        ).exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+        if warehouse_ids:
+            rows = rows.filter(order__warehouse_id__in=warehouse_ids)
+        rows = rows.values_list(
+            'product_id', 'order__warehouse_id', 'order__order_date', 'unit_id')
+    return list(rows.annotate(total=Sum('quantity')).order_by())
+
+
+def build_demand_matrix(rows, start_date, days, products, units):
+    """
+    Pivots daily sales rows into a (pairs x days) matrix in the product's smallest unit.
+
+    Returns:
+    - A tuple of (pairs, matrix) where pairs is an array of (product_id, warehouse_id)
+      rows aligned with the matrix rows.
+    """
+    size = len(rows)
+    product_ids = np.fromiter((row[0] or 0 for row in rows), dtype=np.int64, count=size)
+    warehouse_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=size)
+    day_index = np.fromiter((row[2].toordinal() for row in rows), dtype=np.int64, count=size) \
+        - start_date.toordinal()
+    unit_ids = np.fromiter((row[3] or 0 for row in rows), dtype=np.int64, count=size)
+    totals = np.fromiter((row[4] for row in rows), dtype=np.float64, count=size)
+
+    # Conversion factors are resolved once per distinct (product, unit) pair. Pairs are
+    # packed into a single integer key, which np.unique sorts much faster than rows.
+    unit_span = int(unit_ids.max()) + 1
+    product_units, unit_index = np.unique(
+        product_ids * unit_span + unit_ids, return_inverse=True)
+    factors = np.full(len(product_units), np.nan)
+    for i, key in enumerate(product_units):
+        product_id, unit_id = divmod(int(key), unit_span)
+        product = products.get(product_id)
+        if product and unit_id:
+            conversion = units.conversion_to_ancestor(
+                unit_id, product.smallest_unit_id)
+            if conversion is not None:
+                factors[i] = float(conversion)
+    quantities = totals * factors[unit_index.reshape(-1)]
+    valid = ~np.isnan(quantities) & (day_index >= 0) & (day_index < days)
+
+    warehouse_span = int(warehouse_ids.max()) + 1
+    pair_keys, pair_index = np.unique(
+        product_ids[valid] * warehouse_span + warehouse_ids[valid], return_inverse=True)
+    pairs = np.stack(np.divmod(pair_keys, warehouse_span), axis=1)
+    matrix = np.bincount(
+        pair_index.reshape(-1) * days + day_index[valid],
+        weights=quantities[valid],
+        minlength=len(pairs) * days,
+    ).reshape(len(pairs), days)
+    return pairs, matrix
+
+
+def forecast_demand(history_days=365, window=28, alpha=0.3, lead_time_days=7, review_days=7,
+                    safety_factor=1.65, method=EXPONENTIAL_SMOOTHING, source=SOURCE_ORDER,
+                    warehouse_ids=None, end_date=None):
+    """
+    Forecasts daily demand for the whole catalog at once and proposes replenishment.
+
+    The daily demand is either the moving average of the last `window` days or the
+    simple exponential smoothing level over the whole history. Safety stock is
+    `safety_factor * std(last window) * sqrt(lead_time_days)`, the reorder point is the
+    lead time demand plus safety stock, and an order is proposed when the stock is at or
+    below the reorder point, enough to cover the reorder point plus `review_days` demand.
+
+    Parameters:
+    - history_days: Number of days of sales history to read, ending at end_date.
+    - window: Days used for the moving average and the demand deviation.
+    - alpha: Smoothing factor for exponential smoothing, between 0 and 1.
+    - lead_time_days: Days between ordering and receiving stock.
+    - review_days: Days of demand each order should cover beyond the reorder point.
+    - safety_factor: Service level z-score (1.65 is about 95%).
+    - method: MOVING_AVERAGE or EXPONENTIAL_SMOOTHING.
+    - source: SOURCE_ORDER or SOURCE_MOVEMENT, see get_daily_sales.
+    - warehouse_ids: Optional list of warehouse ids to limit the forecast to.
+    - end_date: Last day of history, defaults to today.
+
+    Returns:
+    - A list of dicts, one per (product, warehouse) with sales history. `reorder_point`
+      and `order_quantity` are in the product's purchasing unit.
+    """
+    end_date = end_date or timezone.now().date()
+    start_date = end_date - timedelta(days=history_days - 1)
+    window = max(1, min(window, history_days))
+
+    rows = get_daily_sales(start_date, end_date, source, warehouse_ids)
+    if not rows:
+        return []
+    product_ids = {row[0] for row in rows if row[0]}
+    balances, products, units = get_stock_balances(warehouse_ids, product_ids)
+    pairs, matrix = build_demand_matrix(rows, start_date, history_days, products, units)
+    if not len(pairs):
+        return []
+
+    recent = matrix[:, -window:]
+    if method == MOVING_AVERAGE:
+        daily = recent.mean(axis=1)
+    else:
+        # level_T = sum(alpha * (1 - alpha)^(T - t) * x_t), seeded with the first day.
+        weights = alpha * (1 - alpha) ** np.arange(history_days - 1, -1, -1)
+        weights[0] = (1 - alpha) ** (history_days - 1)
+        daily = matrix @ weights
+    deviation = recent.std(axis=1, ddof=1) if window > 1 else np.zeros(len(pairs))
+    safety_stock = safety_factor * deviation * math.sqrt(lead_time_days)
+    reorder_point = daily * lead_time_days + safety_stock
+    order_up_to = reorder_point + daily * review_days
+
+    stock = np.array([float(balances.get((int(warehouse_id), int(product_id)), 0))
+                      for product_id, warehouse_id in pairs])
+    conversion = np.ones(len(pairs))
+    for i, product_id in enumerate(pairs[:, 0]):
+        product = products[int(product_id)]
+        if product.purchasing_unit_id:
+            factor = units.conversion_to_ancestor(
+                product.purchasing_unit_id, product.smallest_unit_id)
+            conversion[i] = float(factor) if factor else 1
+    order_quantity = np.where(
+        stock <= reorder_point, np.ceil((order_up_to - stock) / conversion), 0)
+    reorder_point_purchase = np.ceil(reorder_point / conversion)
+
+    proposals = []
+    for i, (product_id, warehouse_id) in enumerate(pairs):
+        proposals.append({
+            'product_id': int(product_id),
+            'warehouse_id': int(warehouse_id),
+            'product_name': products[int(product_id)].name,
+            'daily_demand': round(float(daily[i]), 4),
+            'safety_stock': round(float(safety_stock[i]), 4),
+            'stock_quantity': float(stock[i]),
+            'reorder_point': int(reorder_point_purchase[i]),
+            'order_quantity': max(int(order_quantity[i]), 0),
+        })
+    return proposals
+
+
+@transaction.atomic
+def apply_forecast(proposals, user, order_date=None, update_minimum_quantity=False):
+    """
+    Stores forecast proposals as ReplenishmentOrder rows.
+
+    Proposals with an order quantity become ReplenishmentOrder rows for order_date;
+    unreceived rows of the same (product, warehouse, order_date) are updated instead, so
+    rerunning the forecast on the same day does not duplicate them.
+
+    Parameters:
+    - proposals: The list returned by forecast_demand.
+    - user: The user recorded as creator of the new rows.
+    - order_date: The order date of the rows, defaults to today.
+    - update_minimum_quantity: Also set Product.minimum_quantity to the highest reorder
+      point of the product across warehouses, which the replenishment planner uses.
+
+    Returns:
+    - A dict with the number of replenishment orders created and updated, and products updated.
+    """
+    now = timezone.now()
+    order_date = order_date or now.date()
+    orders = [proposal for proposal in proposals if proposal['order_quantity'] > 0]
+    existing = {}
+    for replenishment in ReplenishmentOrder.objects.filter(
+            order_date=order_date,
+            product_id__in={proposal['product_id'] for proposal in orders},
+            replenishmentreceived__isnull=True):
+        existing.setdefault(
+            (replenishment.product_id, replenishment.warehouse_id), replenishment)
+
+    new_orders = []
+    changed_orders = []
+    for proposal in orders:
+        replenishment = existing.get(
+            (proposal['product_id'], proposal['warehouse_id']))
+        if replenishment:
+            replenishment.quantity = proposal['order_quantity']
+            replenishment.reorder_point = proposal['reorder_point']
+            replenishment.updated_at = now
+            replenishment.updated_at_timestamp = int(now.timestamp())
+            replenishment.updated_by = user
+            changed_orders.append(replenishment)
+        else:
+            new_orders.append(ReplenishmentOrder(
+                product_id=proposal['product_id'],
+                warehouse_id=proposal['warehouse_id'],
+                quantity=proposal['order_quantity'],
+                reorder_point=proposal['reorder_point'],
+                order_date=order_date,
+            ))
+    ReplenishmentOrder.objects.bulk_create_with_audit(new_orders, user)
+    ReplenishmentOrder.objects.bulk_update(
+        changed_orders, ['quantity', 'reorder_point', 'updated_at', 'updated_at_timestamp', 'updated_by'])
+
+    # The audit fields are stamped by hand, as bulk_update bypasses save(), so the
+    # product sync feed reading updated_at sees the new minimum quantities.
+    changed_products = []
+    if update_minimum_quantity:
+        reorder_points = {}
+        for proposal in proposals:
+            reorder_points[proposal['product_id']] = max(
+                reorder_points.get(proposal['product_id'], 0), proposal['reorder_point'])
+        for product in Product.objects.filter(pk__in=reorder_points).only('id', 'minimum_quantity'):
+            if product.minimum_quantity != reorder_points[product.id]:
+                product.minimum_quantity = reorder_points[product.id]
+                product.updated_at = now
+                product.updated_at_timestamp = int(now.timestamp())
+                product.updated_by = user
+                changed_products.append(product)
+        Product.objects.bulk_update(
+            changed_products, ['minimum_quantity', 'updated_at', 'updated_at_timestamp', 'updated_by'])
+
+    return {
+        'replenishment_orders_created': len(new_orders),
+        'replenishment_orders_updated': len(changed_orders),
+        'products_updated': len(changed_products),
+    }
@@ -0,0 +1,130 @@
+import re
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from ..models import ProductLocation, StockMovement, StockMovementItem, Warehouse
+
+WAVE_MOVEMENT_STATUSES = [StockMovement.REQUESTED, StockMovement.PREPARING]
+WAVE_ITEM_STATUSES = [StockMovementItem.WAITING, StockMovementItem.ON_PROGRESS]
+
+
+def natural_key(value):
+    """
+    Sort key that orders "A2" before "A10".
+    """
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', value or '')]
+
+
+def get_primary_locations(locations):
+    """
+    Returns a dict of product id to the location to pick it from: the one holding the
+    most of it, the first on the route on a tie.
+    """
+    primary = {}
+    for location in sorted(locations, key=lambda location: (
+            natural_key(location.area), natural_key(location.shelving), natural_key(location.position))):
+        current = primary.get(location.product_id)
+        if current is None or location.quantity > current.quantity:
+            primary[location.product_id] = location
+    return primary
+
+
+def sort_serpentine(lines):
+    """
+    Orders pick lines into a serpentine route: area by area, shelving by shelving, with
+    the positions walked up one shelving and down the next so the picker never walks an
+    aisle back. Lines without a location come last.
+
+    Parameters:
+    - lines: Dicts with 'area', 'shelving' and 'position' keys, None when unlocated.
+
+    Returns:
+    - The lines in route order.
+    """
+    aisles = defaultdict(list)
+    unlocated = []
+    for line in lines:
+        if line['area'] is None:
+            unlocated.append(line)
+        else:
+            aisles[(line['area'], line['shelving'])].append(line)
+
+    route = []
+    for index, aisle in enumerate(sorted(aisles, key=lambda aisle: (natural_key(aisle[0]), natural_key(aisle[1])))):
+        route += sorted(aisles[aisle], key=lambda line: natural_key(line['position']), reverse=index % 2 == 1)
+    return route + sorted(unlocated, key=lambda line: line['product_name'] or '')
+
+
+def build_pick_wave(warehouse, stock_movement_id32s=None, max_movements=None):
+    """
+    Groups the open stock movements leaving a warehouse into one wave and returns a
+    single pick list for it. Quantities are summed per (product, unit, location), each
+    line keeps how much goes aside for each movement, and the lines are sorted into a
+    serpentine route. The items and the locations are read with one query each.
+
+    Parameters:
+    - warehouse: The origin Warehouse.
+    - stock_movement_id32s: Optional movements to limit the wave to.
+    - max_movements: Optional number of movements in the wave, oldest first.
+
+    Returns:
+    - A dict with the movements of the wave and the pick lines in route order.
+    """
+    items = StockMovementItem.objects.filter(
+        stock_movement__origin_type=ContentType.objects.get_for_model(Warehouse),
+        stock_movement__origin_id=warehouse.id,
+        stock_movement__status__in=WAVE_MOVEMENT_STATUSES,
+        stock_movement__deleted_at__isnull=True,
+        origin_movement_status__in=WAVE_ITEM_STATUSES,
+        product__isnull=False,
+        quantity__gt=0,
+    ).select_related('stock_movement', 'product', 'unit').order_by('stock_movement__created_at', 'stock_movement_id', 'order')
+    if stock_movement_id32s:
+        items = items.filter(stock_movement__id32__in=stock_movement_id32s)
+
+    movements = {}
+    wave_items = []
+    for item in items:
+        if item.stock_movement_id not in movements:
+            if max_movements and len(movements) >= max_movements:
+                continue
+            movements[item.stock_movement_id] = item.stock_movement
+        wave_items.append(item)
+
+    primary = get_primary_locations(ProductLocation.objects.filter(
+        warehouse=warehouse, product_id__in={item.product_id for item in wave_items}))
+
+    lines = {}
+    for item in wave_items:
+        location = primary.get(item.product_id)
+        key = (item.product_id, item.unit_id, location.id if location else None)
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {
+                'area': location.area if location else None,
+                'shelving': location.shelving if location else None,
+                'position': location.position if location else None,
+                'product_id32': item.product.id32,
+                'product_name': item.product.name,
+                'unit_id32': item.unit.id32 if item.unit else None,
+                'unit_symbol': item.unit.symbol if item.unit else None,
+                'quantity': 0,
+                'put_aside': {},
+            }
+        line['quantity'] += item.quantity
+        put_aside = line['put_aside'].setdefault(item.stock_movement_id, {
+            'stock_movement_id32': item.stock_movement.id32,
+            'quantity': 0,
+            'item_id32s': [],
+        })
+        put_aside['quantity'] += item.quantity
+        put_aside['item_id32s'].append(item.id32)
+
+    route = sort_serpentine(lines.values())
+    for sequence, line in enumerate(route, start=1):
+        line['sequence'] = sequence
+        line['put_aside'] = list(line['put_aside'].values())
+    return {
+        'warehouse_id32': warehouse.id32,
+        'stock_movements': [movement.id32 for movement in movements.values()],
+        'lines': route,
+    }
@@ -0,0 +1,218 @@
+from datetime import timedelta
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from ..models import ProductLocation, StockMovementItem, Warehouse
+from .forecast import EXCLUDED_MOVEMENT_STATUSES
+from .picking import natural_key
+from .unit import UnitTree
+
+
+def get_pick_velocity(warehouse, start_date, end_date):
+    """
+    Returns the pick frequency and volume of every product dispatched from a warehouse
+    with one grouped query. A pick is one movement item; the volume is in the smallest
+    unit.
+
+    Returns:
+    - A dict of product id to a dict with the product id32, name, picks and volume.
+    """
+    rows = StockMovementItem.objects.filter(
+        stock_movement__origin_type=ContentType.objects.get_for_model(Warehouse),
+        stock_movement__origin_id=warehouse.id,
+        stock_movement__movement_date__date__range=(start_date, end_date),
+        product__isnull=False,
+    ).exclude(stock_movement__status__in=EXCLUDED_MOVEMENT_STATUSES).values_list(
+        'product_id', 'product__id32', 'product__name', 'unit_id').annotate(picks=Count('id'), quantity=Sum('quantity')).order_by()
+    units = UnitTree()
+    velocity = {}
+    for product_id, id32, name, unit_id, picks, quantity in rows:
+        totals = velocity.setdefault(product_id, {'id32': id32, 'name': name, 'picks': 0, 'volume': 0.0})
+        totals['picks'] += picks
+        totals['volume'] += float(quantity * units.conversion_to_top_level(unit_id) if unit_id else quantity)
+    return velocity
+
+
+def classify_abc(values, a_share=0.8, b_share=0.95):
+    """
+    ABC classification: sorted by value, the items making up the first `a_share` of the
+    total are A, up to `b_share` are B and the rest C. Items without value are C.
+
+    Returns:
+    - An array of 'A', 'B' or 'C' aligned with `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    classes = np.full(len(values), 'C')
+    total = values.sum()
+    if not total:
+        return classes
+    order = np.argsort(-values, kind='stable')
+    # Share of the total reached before each item, so the item crossing a threshold
+    # still falls in the class it starts in.
+    before = (np.cumsum(values[order]) - values[order]) / total
+    ranked = np.where(before < a_share, 'A', np.where(before < b_share, 'B', 'C'))
+    classes[order] = np.where(values[order] > 0, ranked, 'C')
+    return classes
+
+
+def get_slot_distances(locations, dispatch_area=None):
+    """
+    Ranks the slots of a warehouse by how far a picker walks from the dispatch area:
+    areas by their distance in natural order from `dispatch_area` (the first area by
+    default), then shelvings and positions in natural order.
+
+    Returns:
+    - An array of distinct ranks aligned with `locations`, 0 for the nearest slot.
+    """
+    areas = sorted({location.area for location in locations}, key=natural_key)
+    start = areas.index(dispatch_area) if dispatch_area in areas else 0
+    area_rank = {area: (abs(index - start), index) for index, area in enumerate(areas)}
+    order = sorted(range(len(locations)), key=lambda index: (
+        area_rank[locations[index].area], natural_key(locations[index].shelving),
+        natural_key(locations[index].position), locations[index].id))
+    distances = np.empty(len(locations), dtype=np.int64)
+    distances[order] = np.arange(len(locations))
+    return distances
+
+
+def plan_swaps(weights, distances, max_swaps=None):
+    """
+    Proposes slot swaps that move the heaviest weights to the nearest slots. Slots are
+    filled nearest first with the heaviest weight not placed yet, swapping it with the
+    current occupant only when their weights differ, so every swap cuts the expected
+    travel and the number of swaps is the fewest for distinct weights.
+
+    Parameters:
+    - weights: Expected picks of the content of each slot.
+    - distances: Distinct distance ranks of the slots.
+    - max_swaps: Optional cap, keeping the swaps of the nearest slots.
+
+    Returns:
+    - A list of (moved, occupant) index pairs, to apply in order: the content at index
+      `moved` trades its slot with the content at index `occupant`.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    slots = np.argsort(distances, kind='stable')
+    at = slots.copy()  # at[rank]: index of the content now in the slot of that rank
+    where = np.empty(len(slots), dtype=np.int64)
+    where[at] = np.arange(len(slots))
+    heaviest = iter(np.lexsort((distances, -weights)))
+    placed = np.zeros(len(slots), dtype=bool)
+    swaps = []
+    candidate = next(heaviest, None)
+    for rank in range(len(slots)):
+        while candidate is not None and placed[candidate]:
+            candidate = next(heaviest, None)
+        if candidate is None or (max_swaps is not None and len(swaps) >= max_swaps):
+            break
+        occupant = at[rank]
+        if weights[occupant] == weights[candidate]:
+            placed[occupant] = True
+            continue
+        other = where[candidate]
+        swaps.append((int(candidate), int(occupant)))
+        at[rank], at[other] = candidate, occupant
+        where[candidate], where[occupant] = rank, other
+        placed[candidate] = True
+    return swaps
+
+
+def recommend_slotting(warehouse, days=90, dispatch_area=None, max_swaps=None, a_share=0.8, b_share=0.95,
+                       end_date=None):
+    """
+    Scores the product locations of a warehouse by pick velocity and distance from the
+    dispatch area and proposes the swaps that bring fast movers closer.
+
+    The velocity of a product is read from its outbound movement items of the last
+    `days` days and split evenly over its locations. The expected travel of a slotting
+    is the sum of picks times distance rank over all slots.
+
+    Parameters:
+    - warehouse: The Warehouse.
+    - days: Days of movement history, ending at end_date (today by default).
+    - dispatch_area: Area the pickers start from, the first area by default.
+    - max_swaps: Optional cap on the number of swaps.
+    - a_share, b_share: Cumulative pick shares closing the A and B classes.
+
+    Returns:
+    - A dict with the products and their ABC class, the swaps and the expected travel
+      before and after them.
+    """
+    end_date = end_date or timezone.now().date()
+    velocity = get_pick_velocity(warehouse, end_date - timedelta(days=days - 1), end_date)
+    locations = list(ProductLocation.objects.filter(warehouse=warehouse).select_related('product'))
+    names = {product_id: (totals['id32'], totals['name']) for product_id, totals in velocity.items()}
+    names.update({location.product_id: (location.product.id32, location.product.name) for location in locations})
+    product_ids = sorted(names)
+
+    picks = np.array([velocity.get(product_id, {}).get('picks', 0) for product_id in product_ids], dtype=np.float64)
+    classes = classify_abc(picks, a_share, b_share)
+    products = [{
+        'product_id32': names[product_id][0],
+        'product_name': names[product_id][1],
+        'picks': int(picks[index]),
+        'volume': round(velocity.get(product_id, {}).get('volume', 0.0), 4),
+        'abc_class': str(classes[index]),
+    } for index, product_id in enumerate(product_ids)]
+    if not locations:
+        return {'warehouse_id32': warehouse.id32, 'products': products, 'swaps': [],
+                'expected_travel': 0.0, 'proposed_travel': 0.0}
+
+    index_of = np.searchsorted(product_ids, [location.product_id for location in locations])
+    weights = picks[index_of] / np.bincount(index_of, minlength=len(product_ids))[index_of]
+    distances = get_slot_distances(locations, dispatch_area)
+    swaps = plan_swaps(weights, distances, max_swaps)
+
+    proposed = distances.copy()
+    slots = [{'area': location.area, 'shelving': location.shelving, 'position': location.position}
+             for location in locations]
+    rows = []
+    for moved, occupant in swaps:
+        rows.append({
+            'location_id32': locations[moved].id32,
+            'product_name': locations[moved].product.name,
+            'from_slot': slots[moved],
+            'with_location_id32': locations[occupant].id32,
+            'with_product_name': locations[occupant].product.name,
+            'to_slot': slots[occupant],
+            'saving': round(float((weights[moved] - weights[occupant]) * (proposed[moved] - proposed[occupant])), 4),
+        })
+        proposed[moved], proposed[occupant] = proposed[occupant], proposed[moved]
+        slots[moved], slots[occupant] = slots[occupant], slots[moved]
+    return {
+        'warehouse_id32': warehouse.id32,
+        'products': products,
+        'swaps': rows,
+        'expected_travel': round(float(weights @ distances), 4),
+        'proposed_travel': round(float(weights @ proposed), 4),
+    }
+
+
+@transaction.atomic
+def apply_slotting(swaps, user=None):
+    """
+    Swaps the area, shelving and position of the product locations of each proposed
+    swap, in order, and saves them with one bulk update.
+
+    Parameters:
+    - swaps: The swaps returned by recommend_slotting.
+
+    Returns:
+    - The number of locations updated.
+    """
+    locations = ProductLocation.objects.select_for_update().in_bulk(
+        {swap[key] for swap in swaps for key in ('location_id32', 'with_location_id32')}, field_name='id32')
+    for swap in swaps:
+        first, second = locations[swap['location_id32']], locations[swap['with_location_id32']]
+        (first.area, first.shelving, first.position), (second.area, second.shelving, second.position) = \
+            (second.area, second.shelving, second.position), (first.area, first.shelving, first.position)
+    now = timezone.now()
+    for location in locations.values():
+        location.updated_by = user
+        location.updated_at = now
+        location.updated_at_timestamp = int(now.timestamp())
+    ProductLocation.objects.bulk_update(
+        locations.values(), ['area', 'shelving', 'position', 'updated_by', 'updated_at', 'updated_at_timestamp'])
+    return len(locations)
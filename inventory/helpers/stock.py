@@ -0,0 +1,166 @@
+import math
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q, Sum
+from ..models import Product, StockLedgerEntry, WarehouseStock
+from .stock_ledger import record_stock_changes
+from .unit import UnitTree
+
+
+def get_stock_balances(warehouse_ids=None, product_ids=None):
+    """
+    Aggregates on-hand stock per (warehouse, product) in the product's smallest unit.
+
+    Every (warehouse, product) pair that has a WarehouseStock row is returned, including
+    pairs whose stock is fully depleted, so they are still considered for replenishment.
+
+    Parameters:
+    - warehouse_ids: Optional list of warehouse ids to limit the balances to.
+    - product_ids: Optional list of product ids to limit the balances to.
+
+    Returns:
+    - A tuple of (balances, products, units) where balances maps (warehouse_id, product_id)
+      to the quantity in the smallest unit, products maps product id to a Product instance
+      and units is the UnitTree used for the conversion.
+    """
+    stocks = WarehouseStock.objects.all()
+    products = Product.objects.filter(smallest_unit__isnull=False)
+    if warehouse_ids:
+        stocks = stocks.filter(warehouse_id__in=warehouse_ids)
+    if product_ids is not None:
+        stocks = stocks.filter(product_id__in=product_ids)
+        products = products.filter(pk__in=product_ids)
+    rows = stocks.values('warehouse_id', 'product_id', 'unit_id').annotate(
+        total=Sum('quantity', filter=Q(quantity__gt=0)))
+
+    units = UnitTree()
+    products = products.in_bulk()
+
+    balances = {}
+    for row in rows:
+        product = products.get(row['product_id'])
+        if not product:
+            continue
+        key = (row['warehouse_id'], row['product_id'])
+        balances.setdefault(key, Decimal(0))
+        if not row['total']:
+            continue
+        conversion = units.conversion_to_ancestor(
+            row['unit_id'], product.smallest_unit_id)
+        if conversion is None:
+            continue
+        balances[key] += row['total'] * conversion
+    return balances, products, units
+
+
+def get_warehouse_batches(warehouse, product_ids, lock=False):
+    """
+    Loads every stock batch of the given products in a warehouse with one query.
+
+    Parameters:
+    - warehouse: The Warehouse instance.
+    - product_ids: The product ids to load batches for.
+    - lock: Lock the rows with SELECT ... FOR UPDATE; must run inside a transaction.
+
+    Returns:
+    - A dict mapping product id to its list of WarehouseStock batches, newest first.
+    """
+    stocks = WarehouseStock.objects.filter(warehouse=warehouse, product_id__in=product_ids)
+    if lock:
+        stocks = stocks.select_for_update()
+    batches = {}
+    for stock in stocks:
+        batches.setdefault(stock.product_id, []).append(stock)
+    return batches
+
+
+def plan_stock_explosion(batches, unit_id, quantity_needed, units):
+    """
+    Plans breaking bigger unit stock down (e.g. cartons -> packs -> pieces) until
+    `quantity_needed` of `unit_id` is on hand, entirely in memory.
+
+    Only the shortfall is broken down. When the next bigger unit is short as well it
+    is broken down from the unit above first, recursively. `batches` is updated in
+    place: quantities are adjusted and new batches (without pk) are appended for a
+    (unit, expire date) that has no batch yet, so consecutive calls see the result of
+    previous ones. Nothing is written, pass the plan to apply_stock_explosion.
+
+    Parameters:
+    - batches: List of WarehouseStock of one product in one warehouse.
+    - unit_id: The unit that is needed.
+    - quantity_needed: The quantity needed in that unit.
+    - units: UnitTree used for the unit hierarchy and conversions.
+
+    Returns:
+    - A list of steps, each a dict with the source batch, target batch, quantity taken
+      from the source and quantity added to the target.
+    """
+    available = sum(stock.quantity for stock in batches if stock.unit_id == unit_id)
+    shortfall = quantity_needed - available
+    bigger_unit_id = units.child(unit_id)
+    if shortfall <= 0 or not bigger_unit_id:
+        return []
+
+    conversion = units.conversion_to_ancestor(bigger_unit_id, unit_id)
+    bigger_needed = math.ceil(shortfall / conversion)
+    plan = plan_stock_explosion(batches, bigger_unit_id, bigger_needed, units)
+
+    for stock in [stock for stock in batches if stock.unit_id == bigger_unit_id and stock.quantity > 0]:
+        quantity = min(bigger_needed, stock.quantity)
+        target = next((batch for batch in batches if batch.unit_id == unit_id
+                       and batch.expire_date == stock.expire_date), None)
+        if not target:
+            target = WarehouseStock(
+                warehouse_id=stock.warehouse_id,
+                product_id=stock.product_id,
+                unit_id=unit_id,
+                expire_date=stock.expire_date,
+                quantity=0,
+            )
+            batches.append(target)
+        converted_quantity = int(quantity * conversion)
+        stock.quantity -= quantity
+        target.quantity += converted_quantity
+        plan.append({
+            'source': stock,
+            'target': target,
+            'quantity': quantity,
+            'converted_quantity': converted_quantity,
+        })
+        bigger_needed -= quantity
+        if bigger_needed <= 0:
+            break
+    return plan
+
+
+def save_stock_batches(stocks, user=None, reason=StockLedgerEntry.ADJUSTMENT, ref=None):
+    """
+    Writes in-memory WarehouseStock batches with one bulk_create for the new ones and one
+    bulk_update of the quantity for the existing ones, and their stock ledger entries
+    with one more bulk_create. Signals are not sent.
+    """
+    unique_stocks = list({id(stock): stock for stock in stocks}.values())
+    new_batches = [stock for stock in unique_stocks if not stock.pk]
+    changed_batches = [stock for stock in unique_stocks if stock.pk]
+
+    WarehouseStock.objects.bulk_create_with_audit(new_batches, user)
+    if changed_batches:
+        for stock in changed_batches:
+            stock._set_timestamp('updated_at')
+            stock.updated_by = user or stock._current_user
+        WarehouseStock.objects.bulk_update(
+            changed_batches, ['quantity', 'updated_at', 'updated_at_timestamp', 'updated_by'])
+    record_stock_changes(unique_stocks, reason, ref, user)
+
+
+@transaction.atomic
+def apply_stock_explosion(plan, user=None):
+    """
+    Writes a plan from plan_stock_explosion with one bulk_create for the new batches and
+    one bulk_update for the existing ones. Signals are not sent.
+    """
+    stocks = []
+    for step in plan:
+        stocks += [step['source'], step['target']]
+    save_stock_batches(stocks, user, StockLedgerEntry.EXPLOSION)
+    return plan
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from libs.middleware import get_current_user
+from ..models import Product, StockLedgerEntry, StockSnapshot, Unit, Warehouse
+
+
+def record_stock_changes(stocks, reason=StockLedgerEntry.ADJUSTMENT, ref=None, user=None, deleted=False):
+    """
+    Writes one ledger entry per batch whose quantity changed since it was loaded, with
+    one bulk insert. Batches that were never loaded, i.e. created since, count from zero.
+
+    Parameters:
+    - stocks: Saved WarehouseStock batches.
+    - reason: One of StockLedgerEntry.REASON_CHOICES.
+    - ref: The document that changed the stock, e.g. a StockMovementItem.
+    - user: User recorded on the entries; defaults to the current request user.
+    - deleted: The batches were hard deleted, so their whole loaded quantity leaves.
+
+    Returns:
+    - The created StockLedgerEntry objects.
+    """
+    ref_type = ContentType.objects.get_for_model(ref) if ref is not None else None
+    user = user or get_current_user()
+    today = timezone.localdate()
+    entries = []
+    for stock in {id(stock): stock for stock in stocks}.values():
+        quantity = 0 if deleted else stock.ledger_quantity
+        delta = quantity - getattr(stock, '_loaded_quantity', 0)
+        stock._loaded_quantity = quantity
+        if not delta:
+            continue
+        entries.append(StockLedgerEntry(
+            warehouse_id=stock.warehouse_id,
+            product_id=stock.product_id,
+            unit_id=stock.unit_id,
+            batch=None if deleted else stock,
+            delta=delta,
+            reason=reason,
+            ref_type=ref_type,
+            ref_id=ref.pk if ref is not None else None,
+            date=today,
+            created_by=user,
+        ))
+    return StockLedgerEntry.objects.bulk_create(entries)
+
+
+def get_stock_as_of(as_of, warehouse_ids=None, product_ids=None):
+    """
+    Returns the stock at the end of a day, starting from the latest snapshot taken by
+    then and adding the ledger entries after it.
+
+    Parameters:
+    - as_of: The date.
+    - warehouse_ids: Optional warehouse ids to limit the stock to.
+    - product_ids: Optional product ids to limit the stock to.
+
+    Returns:
+    - A dict mapping (warehouse_id, product_id, unit_id) to the quantity in that unit,
+      without the zero quantities.
+    """
+    snapshot_date = StockSnapshot.objects.filter(date__lte=as_of).aggregate(date=Max('date'))['date']
+    snapshots = StockSnapshot.objects.filter(date=snapshot_date)
+    entries = StockLedgerEntry.objects.filter(date__lte=as_of)
+    if snapshot_date:
+        entries = entries.filter(date__gt=snapshot_date)
+    if warehouse_ids is not None:
+        snapshots = snapshots.filter(warehouse_id__in=warehouse_ids)
+        entries = entries.filter(warehouse_id__in=warehouse_ids)
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+        entries = entries.filter(product_id__in=product_ids)
+
+    stock = defaultdict(int)
+    if snapshot_date:
+        for warehouse_id, product_id, unit_id, quantity in snapshots.values_list(
+                'warehouse_id', 'product_id', 'unit_id', 'quantity'):
+            stock[(warehouse_id, product_id, unit_id)] += quantity
+    for row in entries.values('warehouse_id', 'product_id', 'unit_id').annotate(quantity=Sum('delta')).order_by():
+        stock[(row['warehouse_id'], row['product_id'], row['unit_id'])] += row['quantity']
+    return {key: quantity for key, quantity in stock.items() if quantity}
+
+
+def describe_stock(stock):
+    """
+    Turns the result of get_stock_as_of into rows with the warehouse, product and unit
+    id32 and names, loading each of them with one query.
+    """
+    warehouses = Warehouse.objects.in_bulk({warehouse_id for warehouse_id, _p, _u in stock})
+    products = Product.objects.in_bulk({product_id for _w, product_id, _u in stock})
+    units = Unit.objects.in_bulk({unit_id for _w, _p, unit_id in stock})
+    rows = []
+    for (warehouse_id, product_id, unit_id), quantity in stock.items():
+        warehouse, product, unit = warehouses.get(warehouse_id), products.get(product_id), units.get(unit_id)
+        if not (warehouse and product and unit):
+            continue
+        rows.append({
+            'warehouse__id32': warehouse.id32,
+            'warehouse__name': warehouse.name,
+            'product__id32': product.id32,
+            'product__name': product.name,
+            'unit__id32': unit.id32,
+            'unit__name': unit.name,
+            'unit__symbol': unit.symbol,
+            'total_quantity': quantity,
+        })
+    return sorted(rows, key=lambda row: (row['warehouse__name'], row['product__name'], row['unit__name']))
+
+
+@transaction.atomic
+def take_stock_snapshot(date=None, batch_size=2000):
+    """
+    Stores the stock at the end of a day, replacing an earlier snapshot of that day.
+    Only a day that has ended can be snapshotted, since entries are dated the day they
+    are written.
+
+    Parameters:
+    - date: The day, yesterday by default.
+
+    Returns:
+    - The number of snapshot rows written.
+    """
+    date = date or timezone.localdate() - timedelta(days=1)
+    if date >= timezone.localdate():
+        raise ValidationError({'date': _("Only a day that has ended can be snapshotted.")})
+    stock = get_stock_as_of(date)
+    StockSnapshot.objects.filter(date=date).delete()
+    return len(StockSnapshot.objects.bulk_create([
+        StockSnapshot(date=date, warehouse_id=warehouse_id, product_id=product_id, unit_id=unit_id,
+                      quantity=quantity)
+        for (warehouse_id, product_id, unit_id), quantity in stock.items()
+    ], batch_size=batch_size))
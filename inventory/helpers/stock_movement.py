@@ -1,31 +1,38 @@
 from django.contrib.contenttypes.models import ContentType
 from purchasing.models import Supplier
-from ..models import WarehouseStock
+from ..models import StockLedgerEntry, WarehouseStock
+from .valuation import dispatch_cost_layers, receive_cost_layers, return_cost_layers
 
 
-def deduct_stock(stock, quantity):
+def deduct_stock(stock, quantity, reason=StockLedgerEntry.DISPATCH, ref=None):
     """
     Deduct a specified quantity from a WarehouseStock instance.
 
     Args:
     - stock (WarehouseStock): The WarehouseStock instance to deduct from.
     - quantity (int/float): The amount to be deducted.
+    - reason (str, optional): Reason recorded in the stock ledger.
+    - ref (Instance, optional): Document recorded in the stock ledger.
 
     """
     stock.quantity -= quantity
+    stock.ledger_reason, stock.ledger_ref = reason, ref
     stock.save()
 
 
-def add_stock(stock, quantity):
+def add_stock(stock, quantity, reason=StockLedgerEntry.INBOUND, ref=None):
     """
     Add a specified quantity to a WarehouseStock instance.
 
     Args:
     - stock (WarehouseStock): The WarehouseStock instance to add to.
     - quantity (int/float): The amount to be added.
+    - reason (str, optional): Reason recorded in the stock ledger.
+    - ref (Instance, optional): Document recorded in the stock ledger.
 
     """
     stock.quantity += quantity
+    stock.ledger_reason, stock.ledger_ref = reason, ref
     stock.save()
 
 
@@ -39,7 +46,7 @@ def create_new_destination_stock(stock, item, quantity):
     - quantity (int/float): The amount to be added.
 
     """
-    WarehouseStock.objects.create(
+    destination_stock = WarehouseStock(
         warehouse=item.stock_movement.destination,
         product=item.product,
         quantity=quantity,
@@ -47,6 +54,8 @@ def create_new_destination_stock(stock, item, quantity):
         inbound_movement_item=item,
         unit=item.unit
     )
+    destination_stock.ledger_reason, destination_stock.ledger_ref = StockLedgerEntry.INBOUND, item
+    destination_stock.save()
 
 
 def calculate_buy_price(item):
@@ -116,7 +125,8 @@ def handle_return_status_change(stock_movement, item):
     stock = stocks.first()
     if stock:
         stock.dispatch_movement_items.remove(item)
-        add_stock(stock, item.quantity)
+        add_stock(stock, item.quantity, StockLedgerEntry.RETURN, item)
+        return_cost_layers(item, item.quantity, warehouse_id=stock_movement.origin_id)
 
 
 def get_filtered_stocks(warehouse, item, for_dispatch=True):
@@ -162,18 +172,23 @@ def handle_destination_warehouse(item):
     )
     if not stock.inbound_movement_item:
         stock.inbound_movement_item = item
-    add_stock(stock, item.quantity)
+    add_stock(stock, item.quantity, StockLedgerEntry.INBOUND, item)
     if item.stock_movement.origin_type == ContentType.objects.get_for_model(Supplier):
         calculate_buy_price(item)
 
+    if stock_movement.origin_type.model != 'warehouse':
+        receive_cost_layers(item, item.quantity)
+
     if stock_movement.origin_type.model == 'warehouse':
+        # Transfers carry the cost of the origin layers to the destination.
+        dispatch_cost_layers(item, item.quantity, destination_warehouse_id=stock_movement.destination_id)
         stocks = get_filtered_stocks(stock_movement.origin, item)
         quantity_remaining = item.quantity
 
         for stock in stocks:
             stock.dispatch_movement_items.add(item)
             quantity = quantity_remaining if quantity_remaining <= stock.quantity else stock.quantity
-            deduct_stock(stock, quantity)
+            deduct_stock(stock, quantity, StockLedgerEntry.DISPATCH, item)
             quantity_remaining -= quantity
             if quantity_remaining <= 0:
                 break
@@ -195,9 +210,14 @@ def handle_origin_warehouse(item):
     for stock in stocks:
         stock.dispatch_movement_items.add(item)
         quantity = quantity_remaining if quantity_remaining <= stock.quantity else stock.quantity
-        deduct_stock(stock, quantity)
+        deduct_stock(stock, quantity, StockLedgerEntry.DISPATCH, item)
         if stock_movement.destination_type.model == 'warehouse':
             create_new_destination_stock(stock, item, quantity)
         quantity_remaining -= quantity
         if quantity_remaining <= 0:
             break
+
+    dispatch_cost_layers(
+        item, item.quantity - max(quantity_remaining, 0),
+        destination_warehouse_id=stock_movement.destination_id
+        if stock_movement.destination_type.model == 'warehouse' else None)
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from ..models import Unit
+
+
+class UnitTree:
+    """
+    In-memory copy of the unit hierarchy, loaded with a single query.
+
+    Mirrors Unit.conversion_to_top_level and Unit.conversion_to_ancestor so
+    batch jobs can convert quantities without walking `unit.parent` one query
+    at a time.
+    """
+
+    def __init__(self, queryset=None):
+        queryset = queryset if queryset is not None else Unit.objects.all()
+        self.parents = {}
+        self.factors = {}
+        self.children = {}
+        for unit_id, parent_id, factor in queryset.order_by('-id').values_list(
+                'id', 'parent_id', 'conversion_factor'):
+            self.parents[unit_id] = parent_id
+            self.factors[unit_id] = factor
+            # Unit ordering is ['-id'], so the first child seen is the one
+            # `Unit.objects.filter(parent=unit).first()` would return.
+            if parent_id is not None:
+                self.children.setdefault(parent_id, unit_id)
+
+    def conversion_to_top_level(self, unit_id):
+        """
+        Returns the conversion factor from unit_id to its top-level ancestor.
+        """
+        conversion = self.factors[unit_id]
+        current = self.parents.get(unit_id)
+        while current:
+            conversion *= self.factors[current]
+            current = self.parents.get(current)
+        return conversion
+
+    def conversion_to_ancestor(self, unit_id, ancestor_id):
+        """
+        Returns the conversion factor from unit_id to ancestor_id, or None
+        when ancestor_id is not an ancestor of (or equal to) unit_id.
+        """
+        conversion = Decimal(1)
+        current = unit_id
+        while current and current != ancestor_id:
+            conversion *= self.factors[current]
+            current = self.parents.get(current)
+        return conversion if current and current == ancestor_id else None
+
+    def child(self, unit_id):
+        """
+        Returns the id of the next bigger unit (the unit whose parent is unit_id).
+        """
+        return self.children.get(unit_id)
+
+    def level(self, unit_id):
+        level = 0
+        current = self.parents.get(unit_id)
+        while current:
+            level += 1
+            current = self.parents.get(current)
+        return level
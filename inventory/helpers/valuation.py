@@ -0,0 +1,290 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from sales.models import OrderItem
+from ..models import CostLayer, CostLayerConsumption, Product
+from .stock import get_stock_balances
+from .unit import UnitTree
+
+VALUE = DecimalField(max_digits=19, decimal_places=4)
+
+
+def get_unit_cost(item, units):
+    """
+    Returns the cost of one smallest unit received with an inbound item: its buy price
+    per item unit converted down, or the product's last buy price without a buy price.
+    """
+    if item.buy_price and item.unit_id:
+        return item.buy_price / units.conversion_to_top_level(item.unit_id)
+    return item.product.last_buy_price or Decimal(0)
+
+
+def add_cost_layers(warehouse_id, product_id, item, costs):
+    """
+    Opens cost layers in a warehouse with one bulk insert.
+
+    Parameters:
+    - warehouse_id, product_id: Where the stock was received.
+    - item: The inbound StockMovementItem.
+    - costs: List of (quantity in the smallest unit, unit cost).
+
+    Returns:
+    - The created CostLayer objects.
+    """
+    return CostLayer.objects.bulk_create([
+        CostLayer(warehouse_id=warehouse_id, product_id=product_id, inbound_movement_item=item,
+                  unit_cost=unit_cost, quantity=quantity, remaining=quantity)
+        for quantity, unit_cost in costs if quantity > 0
+    ])
+
+
+@transaction.atomic
+def consume_cost_layers(warehouse_id, requests):
+    """
+    Takes quantities out of the open cost layers of a warehouse, oldest layer first.
+    The layers of every requested product are loaded and row-locked with one query,
+    allocated in memory and written back with one bulk update, and the consumptions
+    with one bulk insert.
+
+    Parameters:
+    - warehouse_id: The warehouse the stock leaves.
+    - requests: List of (product id, quantity in the smallest unit, document taking it).
+
+    Returns:
+    - A list with, per request, its CostLayerConsumption objects. A quantity no layer
+      covers is valued at the product's last buy price.
+    """
+    product_ids = {product_id for product_id, _quantity, _ref in requests}
+    layers = defaultdict(list)
+    for layer in CostLayer.objects.select_for_update().filter(
+            warehouse_id=warehouse_id, product_id__in=product_ids, remaining__gt=0).order_by('received_at', 'id'):
+        layers[layer.product_id].append(layer)
+    buy_prices = dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'last_buy_price'))
+
+    touched = {}
+    result = []
+    for product_id, quantity, ref in requests:
+        ref_type = ContentType.objects.get_for_model(ref) if ref is not None else None
+        consumptions = []
+
+        def consume(layer, taken, unit_cost):
+            consumptions.append(CostLayerConsumption(
+                layer=layer, warehouse_id=warehouse_id, product_id=product_id, quantity=taken, unit_cost=unit_cost,
+                ref_type=ref_type, ref_id=ref.pk if ref is not None else None))
+
+        missing = Decimal(quantity)
+        for layer in layers[product_id]:
+            if missing <= 0:
+                break
+            if layer.remaining <= 0:
+                continue
+            taken = min(missing, layer.remaining)
+            layer.remaining -= taken
+            touched[layer.pk] = layer
+            missing -= taken
+            consume(layer, taken, layer.unit_cost)
+        if missing > 0:
+            consume(None, missing, buy_prices.get(product_id) or Decimal(0))
+        result.append(consumptions)
+
+    CostLayer.objects.bulk_update(touched.values(), ['remaining'])
+    CostLayerConsumption.objects.bulk_create([consumption for consumptions in result for consumption in consumptions])
+    return result
+
+
+def get_consumed_cost(consumptions):
+    return sum((consumption.quantity * consumption.unit_cost for consumption in consumptions), Decimal(0))
+
+
+def get_carried_order_items(item):
+    """
+    Returns the sold order items a movement item carries: those of its movement's
+    orders with the same product and unit, for its customer when it has one.
+    """
+    order_items = OrderItem.objects.filter(
+        order__stock_movements=item.stock_movement_id, product_id=item.product_id, unit_id=item.unit_id)
+    if item.destination_customer_id:
+        order_items = order_items.filter(order__customer_id=item.destination_customer_id)
+    return order_items
+
+
+def get_order_item_requests(item, quantity, units):
+    """
+    Splits a dispatched quantity of a movement item over the sold order items it
+    carries, oldest first, so each order item gets its own cost. What no order item
+    accounts for is requested for the movement item itself.
+
+    Returns:
+    - A list of (product id, quantity in the smallest unit, OrderItem or the movement item).
+    """
+    order_items = get_carried_order_items(item).filter(cogs__isnull=True).order_by('id')
+    conversion = units.conversion_to_top_level(item.unit_id)
+    requests = []
+    for order_item in order_items:
+        if quantity <= 0:
+            break
+        taken = min(quantity, order_item.quantity)
+        requests.append((item.product_id, taken * conversion, order_item))
+        quantity -= taken
+    if quantity > 0:
+        requests.append((item.product_id, quantity * conversion, item))
+    return requests
+
+
+@transaction.atomic
+def dispatch_cost_layers(item, quantity, destination_warehouse_id=None):
+    """
+    Consumes the cost layers of a movement item leaving its origin warehouse. A
+    transfer opens layers at the same costs in the destination warehouse; a delivery
+    to a customer records the cost of goods sold on the order items it carries.
+
+    Parameters:
+    - item: The StockMovementItem.
+    - quantity: Quantity dispatched, in the item unit.
+    - destination_warehouse_id: The destination of a transfer.
+    """
+    if not quantity or not item.unit_id:
+        return
+    units = UnitTree()
+    warehouse_id = item.stock_movement.origin_id
+    if destination_warehouse_id:
+        requests = [(item.product_id, quantity * units.conversion_to_top_level(item.unit_id), item)]
+    else:
+        requests = get_order_item_requests(item, quantity, units)
+    result = consume_cost_layers(warehouse_id, requests)
+
+    if destination_warehouse_id:
+        add_cost_layers(destination_warehouse_id, item.product_id, item, [
+            (consumption.quantity, consumption.unit_cost) for consumption in result[0]])
+        return
+
+    sold = [(ref, consumptions) for (_product_id, _quantity, ref), consumptions in zip(requests, result)
+            if isinstance(ref, OrderItem)]
+    for order_item, consumptions in sold:
+        order_item.cogs = get_consumed_cost(consumptions).quantize(Decimal('0.01'))
+    OrderItem.objects.bulk_update([order_item for order_item, _consumptions in sold], ['cogs'])
+
+
+def receive_cost_layers(item, quantity, warehouse_id=None):
+    """
+    Opens the cost layer of a movement item received from outside the warehouses, at
+    its buy price, in its destination warehouse or `warehouse_id`.
+    """
+    if not quantity or not item.unit_id:
+        return []
+    units = UnitTree()
+    return add_cost_layers(warehouse_id or item.stock_movement.destination_id, item.product_id, item, [
+        (quantity * units.conversion_to_top_level(item.unit_id), get_unit_cost(item, units))])
+
+
+@transaction.atomic
+def return_cost_layers(item, quantity, warehouse_id=None):
+    """
+    Reverses the dispatch of a movement item back into its origin warehouse (or
+    `warehouse_id`). The consumptions recorded for the item and the order items it
+    carries are reversed newest first: each quantity goes back to the layer it was
+    taken from at the cost it was taken at, and quantities no layer covered open a
+    new layer at their recorded cost. The returned cost is taken off the order items'
+    cost of goods sold.
+
+    Parameters:
+    - item: The StockMovementItem.
+    - quantity: Quantity returned, in the item unit.
+
+    Returns:
+    - The cost returned to the layers.
+    """
+    if not quantity or not item.unit_id:
+        return Decimal(0)
+    units = UnitTree()
+    warehouse_id = warehouse_id or item.stock_movement.origin_id
+    order_item_type = ContentType.objects.get_for_model(OrderItem)
+    order_items = get_carried_order_items(item).in_bulk()
+    consumptions = list(CostLayerConsumption.objects.select_for_update().filter(
+        Q(ref_type=ContentType.objects.get_for_model(item), ref_id=item.pk) |
+        Q(ref_type=order_item_type, ref_id__in=order_items),
+        warehouse_id=warehouse_id, product_id=item.product_id,
+    ).order_by('-id'))
+    layers = CostLayer.objects.select_for_update().in_bulk(
+        {consumption.layer_id for consumption in consumptions if consumption.layer_id})
+
+    missing = Decimal(quantity) * units.conversion_to_top_level(item.unit_id)
+    touched = {}
+    new_layers = []
+    changed = []
+    emptied = []
+    returned_cost = defaultdict(Decimal)
+    total = Decimal(0)
+    for consumption in consumptions:
+        if missing <= 0:
+            break
+        returned = min(missing, consumption.quantity)
+        missing -= returned
+        total += returned * consumption.unit_cost
+        if consumption.layer_id in layers:
+            layers[consumption.layer_id].remaining += returned
+            touched[consumption.layer_id] = layers[consumption.layer_id]
+        else:
+            new_layers.append((returned, consumption.unit_cost))
+        if consumption.ref_type_id == order_item_type.pk:
+            returned_cost[consumption.ref_id] += returned * consumption.unit_cost
+        consumption.quantity -= returned
+        (changed if consumption.quantity > 0 else emptied).append(consumption)
+
+    CostLayer.objects.bulk_update(touched.values(), ['remaining'])
+    add_cost_layers(warehouse_id, item.product_id, item, new_layers)
+    CostLayerConsumption.objects.bulk_update(changed, ['quantity'])
+    CostLayerConsumption.objects.filter(pk__in=[consumption.pk for consumption in emptied]).delete()
+
+    still_sold = set(CostLayerConsumption.objects.filter(
+        ref_type=order_item_type, ref_id__in=returned_cost).values_list('ref_id', flat=True))
+    for order_item_id, cost in returned_cost.items():
+        order_item = order_items[order_item_id]
+        # A fully returned order item gets its cost again when it is dispatched again.
+        order_item.cogs = (order_item.cogs or Decimal(0)) - cost.quantize(Decimal('0.01')) \
+            if order_item_id in still_sold else None
+    OrderItem.objects.bulk_update([order_items[order_item_id] for order_item_id in returned_cost], ['cogs'])
+    return total
+
+
+def get_inventory_valuation(warehouse_ids=None, by_product=False):
+    """
+    Sums the remaining cost layers per warehouse, or per warehouse and product, with one
+    grouped query.
+
+    Returns:
+    - A list of dicts with the warehouse (and product) id32 and name, the remaining
+      quantity in the smallest unit and its value.
+    """
+    layers = CostLayer.objects.filter(remaining__gt=0)
+    if warehouse_ids is not None:
+        layers = layers.filter(warehouse_id__in=warehouse_ids)
+    fields = ['warehouse__id32', 'warehouse__name']
+    if by_product:
+        fields += ['product__id32', 'product__name']
+    return list(layers.values(*fields).annotate(
+        quantity=Sum('remaining'),
+        value=Sum(ExpressionWrapper(F('remaining') * F('unit_cost'), output_field=VALUE)),
+    ).order_by(*fields[1::2]))
+
+
+@transaction.atomic
+def open_cost_layers(batch_size=2000):
+    """
+    Opens one layer at the product's last buy price for the stock of every warehouse
+    and product that has no open cost layer yet, e.g. stock received before cost
+    layers were kept.
+
+    Returns:
+    - The number of layers opened.
+    """
+    balances, products, _units = get_stock_balances()
+    layered = set(CostLayer.objects.filter(remaining__gt=0).values_list('warehouse_id', 'product_id').distinct())
+    return len(CostLayer.objects.bulk_create([
+        CostLayer(warehouse_id=warehouse_id, product_id=product_id, unit_cost=products[product_id].last_buy_price or 0,
+                  quantity=quantity, remaining=quantity)
+        for (warehouse_id, product_id), quantity in balances.items()
+        if quantity > 0 and (warehouse_id, product_id) not in layered
+    ], batch_size=batch_size))
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from inventory.helpers.forecast import (
+    EXPONENTIAL_SMOOTHING, MOVING_AVERAGE, SOURCE_MOVEMENT, SOURCE_ORDER, apply_forecast, forecast_demand)
+from inventory.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = 'Forecast daily demand per product and warehouse, and propose replenishment orders and reorder points.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=365,
+                            help='Days of sales history to read')
+        parser.add_argument('--window', type=int, default=28,
+                            help='Days used for the moving average and demand deviation')
+        parser.add_argument('--alpha', type=float, default=0.3,
+                            help='Exponential smoothing factor')
+        parser.add_argument('--lead-time', type=int, default=7,
+                            help='Supplier lead time in days')
+        parser.add_argument('--review-days', type=int, default=7,
+                            help='Days of demand each order covers beyond the reorder point')
+        parser.add_argument('--safety-factor', type=float, default=1.65,
+                            help='Service level z-score used for safety stock')
+        parser.add_argument('--method', choices=[EXPONENTIAL_SMOOTHING, MOVING_AVERAGE],
+                            default=EXPONENTIAL_SMOOTHING)
+        parser.add_argument('--source', choices=[SOURCE_ORDER, SOURCE_MOVEMENT], default=SOURCE_ORDER,
+                            help='Read sales history from order items or dispatched movement items')
+        parser.add_argument('--warehouse', action='append', default=[],
+                            help='Limit the forecast to a warehouse id32 (repeatable)')
+        parser.add_argument('--update-minimum-quantity', action='store_true',
+                            help='Also set Product.minimum_quantity to the forecasted reorder point')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print the proposals, do not store them')
+        parser.add_argument('--username',
+                            help='User recorded as creator of the replenishment orders')
+
+    def handle(self, *args, **options):
+        warehouse_ids = None
+        if options['warehouse']:
+            warehouse_ids = list(Warehouse.objects.filter(
+                id32__in=options['warehouse']).values_list('id', flat=True))
+            if len(warehouse_ids) != len(set(options['warehouse'])):
+                raise CommandError('One or more warehouses do not exist')
+
+        proposals = forecast_demand(
+            history_days=options['history_days'],
+            window=options['window'],
+            alpha=options['alpha'],
+            lead_time_days=options['lead_time'],
+            review_days=options['review_days'],
+            safety_factor=options['safety_factor'],
+            method=options['method'],
+            source=options['source'],
+            warehouse_ids=warehouse_ids,
+        )
+        for proposal in proposals:
+            if proposal['order_quantity'] or options['verbosity'] > 1:
+                self.stdout.write(
+                    'warehouse={warehouse_id} product={product_name} daily={daily_demand} '
+                    'stock={stock_quantity} reorder_point={reorder_point} order={order_quantity}'.format(**proposal))
+        ordered = sum(1 for proposal in proposals if proposal['order_quantity'])
+        self.stdout.write(f'{len(proposals)} product(s) forecasted, {ordered} to reorder')
+
+        if options['dry_run']:
+            return
+
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+        else:
+            user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('Provide --username to record as replenishment order creator')
+
+        result = apply_forecast(
+            proposals, user, update_minimum_quantity=options['update_minimum_quantity'])
+        self.stdout.write(self.style.SUCCESS(
+            '{replenishment_orders_created} replenishment order(s) created, '
+            '{replenishment_orders_updated} updated, {products_updated} product(s) updated'.format(**result)))
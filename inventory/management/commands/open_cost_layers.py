@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from inventory.helpers.valuation import open_cost_layers
+
+
+class Command(BaseCommand):
+    help = 'Open a cost layer at the last buy price of the product for stock that has no open FIFO cost layer yet.'
+
+    def handle(self, *args, **options):
+        opened = open_cost_layers()
+        self.stdout.write(self.style.SUCCESS(f'{opened} cost layer(s) opened'))
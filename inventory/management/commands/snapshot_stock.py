@@ -0,0 +1,22 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from inventory.helpers.stock_ledger import take_stock_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Store the stock per warehouse, product and unit at the end of a day, for as-of stock queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot, YYYY-MM-DD (default: yesterday)')
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError('date must be in YYYY-MM-DD format')
+        try:
+            written = take_stock_snapshot(day)
+        except ValidationError as e:
+            raise CommandError(e.messages)
+        self.stdout.write(self.style.SUCCESS(f'{written} stock snapshot row(s) written'))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-19 12:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_stockmovement_generate_items_from_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='replenishmentorder',
+            name='reorder_point',
+            field=models.PositiveIntegerField(blank=True, help_text='Forecasted reorder point in purchasing unit', null=True),
+        ),
+        migrations.AddField(
+            model_name='replenishmentorder',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, help_text='Select the warehouse to replenish', null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0026_replenishmentorder_warehouse_reorder_point'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['destination_type', 'destination_id', 'status'], name='inv_sm_destination_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['creator_type', 'creator_id'], name='inv_sm_creator_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovementitem',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['stock_movement', 'origin_movement_status'], name='inv_smi_origin_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovementitem',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['stock_movement', 'destination_movement_status'], name='inv_smi_destination_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='warehousestock',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['warehouse', 'product', 'unit'], name='inv_ws_wh_product_unit_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='warehousestock',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('quantity__gt', 0)), fields=['warehouse', 'product', 'unit'], name='inv_ws_wh_product_unit_pos_idx'),
+        ),
+    ]
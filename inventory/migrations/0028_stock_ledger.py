@@ -0,0 +1,85 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill_opening_entries(apps, schema_editor):
+    """
+    Opens the stock ledger with the current quantity of every batch, so the ledger
+    adds up to WarehouseStock from the start.
+    """
+    WarehouseStock = apps.get_model('inventory', 'WarehouseStock')
+    StockLedgerEntry = apps.get_model('inventory', 'StockLedgerEntry')
+    today = timezone.localdate()
+    StockLedgerEntry.objects.bulk_create([
+        StockLedgerEntry(warehouse_id=stock.warehouse_id, product_id=stock.product_id, unit_id=stock.unit_id,
+                         batch_id=stock.id, delta=stock.quantity, reason='opening', date=today)
+        for stock in WarehouseStock.objects.filter(deleted_at__isnull=True, quantity__gt=0).only(
+            'id', 'warehouse_id', 'product_id', 'unit_id', 'quantity').iterator()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0027_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(help_text='Quantity change in the batch unit')),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('inbound', 'Inbound movement'), ('dispatch', 'Dispatch movement'), ('return', 'Returned movement'), ('production', 'Produced item'), ('consumption', 'Consumed component'), ('explosion', 'Unit break-down'), ('adjustment', 'Adjustment')], default='adjustment', max_length=20)),
+                ('ref_id', models.PositiveIntegerField(blank=True, help_text='ID of the document that changed the stock', null=True)),
+                ('date', models.DateField(help_text='Day the change counts for in as-of stock')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('batch', models.ForeignKey(blank=True, help_text='Stock batch that changed', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='inventory.warehousestock')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('ref_type', models.ForeignKey(blank=True, help_text='Content type of the document that changed the stock', null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.unit')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Stock Ledger Entry',
+                'verbose_name_plural': 'Stock Ledger Entries',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'warehouse', 'product', 'unit'), name='unique_stock_snapshot'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerentry',
+            index=models.Index(fields=['date', 'warehouse', 'product'], name='inv_stock_ledger_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerentry',
+            index=models.Index(fields=['ref_type', 'ref_id'], name='inv_stock_ledger_ref_idx'),
+        ),
+        migrations.RunPython(backfill_opening_entries, migrations.RunPython.noop),
+    ]
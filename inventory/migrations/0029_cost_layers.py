@@ -0,0 +1,57 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('inventory', '0028_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_cost', models.DecimalField(decimal_places=4, help_text='Cost of one smallest unit', max_digits=19)),
+                ('quantity', models.DecimalField(decimal_places=4, help_text='Quantity received', max_digits=19)),
+                ('remaining', models.DecimalField(decimal_places=4, help_text='Quantity not consumed yet', max_digits=19)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('inbound_movement_item', models.ForeignKey(blank=True, help_text='Inbound movement item the layer was received with', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layers', to='inventory.stockmovementitem')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Cost Layer',
+                'verbose_name_plural': 'Cost Layers',
+                'ordering': ['received_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CostLayerConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=19)),
+                ('ref_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('layer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consumptions', to='inventory.costlayer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('ref_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Cost Layer Consumption',
+                'verbose_name_plural': 'Cost Layer Consumptions',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['ref_type', 'ref_id'], name='inv_cost_consumption_ref_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(condition=models.Q(('remaining__gt', 0)), fields=['warehouse', 'product', 'received_at'], name='inv_cost_layer_open_idx'),
+        ),
+    ]
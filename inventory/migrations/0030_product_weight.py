@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0029_cost_layers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='weight',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text='Weight of one smallest unit in kg, used to plan vehicle loads', max_digits=19, null=True),
+        ),
+    ]
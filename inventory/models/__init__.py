@@ -192,6 +192,10 @@ class Product(BaseModelGeneric):
     )
     picture = models.ForeignKey(
         File, blank=True, null=True, on_delete=models.SET_NULL, help_text=_("Picture for the product"))
+    weight = models.DecimalField(
+        blank=True, null=True,
+        max_digits=19, decimal_places=4,
+        help_text=_("Weight of one smallest unit in kg, used to plan vehicle loads"))
 
     def __str__(self):
         return _("Product #{product_id} - {product_name}").format(
@@ -477,6 +481,12 @@ class StockMovement(BaseModelGeneric):
         ordering = ['-id']
         verbose_name = _("Stock Movement")
         verbose_name_plural = _("Stock Movements")
+        indexes = [
+            models.Index(fields=['destination_type', 'destination_id', 'status'],
+                         condition=models.Q(deleted_at__isnull=True), name='inv_sm_destination_status_idx'),
+            models.Index(fields=['creator_type', 'creator_id'],
+                         condition=models.Q(deleted_at__isnull=True), name='inv_sm_creator_idx'),
+        ]
 
     @property
     def last_purchase_order(self):
@@ -538,6 +548,12 @@ class StockMovementItem(BaseModelGeneric):
         ordering = ['order']
         verbose_name = _("Stock Movement Item")
         verbose_name_plural = _("Stock Movement Items")
+        indexes = [
+            models.Index(fields=['stock_movement', 'origin_movement_status'],
+                         condition=models.Q(deleted_at__isnull=True), name='inv_smi_origin_status_idx'),
+            models.Index(fields=['stock_movement', 'destination_movement_status'],
+                         condition=models.Q(deleted_at__isnull=True), name='inv_smi_destination_status_idx'),
+        ]
 
     def __str__(self):
         return _("Stock Movement Item #{movement_item_id} - {product_name}").format(movement_item_id=self.id32, product_name=self.product)
@@ -605,10 +621,168 @@ class WarehouseStock(BaseModelGeneric):
     def smallest_unit_quantity(self):
         return self.quantity * self.unit.conversion_to_top_level()
 
+    @property
+    def ledger_quantity(self):
+        """
+        Quantity the stock ledger accounts for: nothing once the batch is deleted.
+        """
+        return 0 if self.deleted_at else self.quantity
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stock ledger records the difference with the loaded quantity on save.
+        if 'quantity' in instance.__dict__ and 'deleted_at' in instance.__dict__:
+            instance._loaded_quantity = instance.ledger_quantity
+        return instance
+
     class Meta:
         ordering = ['-id']
         verbose_name = _("Warehouse Stock")
         verbose_name_plural = _("Warehouse Stocks")
+        indexes = [
+            models.Index(fields=['warehouse', 'product', 'unit'],
+                         condition=models.Q(deleted_at__isnull=True), name='inv_ws_wh_product_unit_idx'),
+            models.Index(fields=['warehouse', 'product', 'unit'],
+                         condition=models.Q(deleted_at__isnull=True, quantity__gt=0), name='inv_ws_wh_product_unit_pos_idx'),
+        ]
+
+
+class StockLedgerEntry(models.Model):
+    """
+    Append-only change of a stock batch quantity, written with every WarehouseStock
+    change. Entries are never updated; a correction is a new entry.
+    """
+    OPENING = 'opening'
+    INBOUND = 'inbound'
+    DISPATCH = 'dispatch'
+    RETURN = 'return'
+    PRODUCTION = 'production'
+    CONSUMPTION = 'consumption'
+    EXPLOSION = 'explosion'
+    ADJUSTMENT = 'adjustment'
+
+    REASON_CHOICES = [
+        (OPENING, _('Opening balance')),
+        (INBOUND, _('Inbound movement')),
+        (DISPATCH, _('Dispatch movement')),
+        (RETURN, _('Returned movement')),
+        (PRODUCTION, _('Produced item')),
+        (CONSUMPTION, _('Consumed component')),
+        (EXPLOSION, _('Unit break-down')),
+        (ADJUSTMENT, _('Adjustment')),
+    ]
+
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE)
+    batch = models.ForeignKey(
+        WarehouseStock, blank=True, null=True, on_delete=models.SET_NULL, related_name='ledger_entries',
+        help_text=_("Stock batch that changed"))
+    delta = models.IntegerField(help_text=_("Quantity change in the batch unit"))
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default=ADJUSTMENT)
+    ref_type = models.ForeignKey(
+        ContentType, blank=True, null=True, on_delete=models.SET_NULL,
+        help_text=_("Content type of the document that changed the stock"))
+    ref_id = models.PositiveIntegerField(
+        blank=True, null=True, help_text=_("ID of the document that changed the stock"))
+    ref = GenericForeignKey('ref_type', 'ref_id')
+    date = models.DateField(help_text=_("Day the change counts for in as-of stock"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(User, blank=True, null=True, on_delete=models.SET_NULL,
+                                   related_name='stock_ledger_entries')
+
+    def __str__(self):
+        return f'{self.date} {self.warehouse_id}/{self.product_id}/{self.unit_id}: {self.delta:+d} ({self.reason})'
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _("Stock Ledger Entry")
+        verbose_name_plural = _("Stock Ledger Entries")
+        indexes = [
+            models.Index(fields=['date', 'warehouse', 'product'], name='inv_stock_ledger_date_idx'),
+            models.Index(fields=['ref_type', 'ref_id'], name='inv_stock_ledger_ref_idx'),
+        ]
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock of a product unit in a warehouse at the end of a day. As-of stock starts from
+    the latest snapshot and adds the ledger entries after it.
+    """
+    date = models.DateField()
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} {self.warehouse_id}/{self.product_id}/{self.unit_id}: {self.quantity}'
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = _("Stock Snapshot")
+        verbose_name_plural = _("Stock Snapshots")
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'warehouse', 'product', 'unit'], name='unique_stock_snapshot'),
+        ]
+
+
+class CostLayer(models.Model):
+    """
+    Stock of a product received in a warehouse at one unit cost, consumed first in,
+    first out. Quantities are in the product's smallest unit.
+    """
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    inbound_movement_item = models.ForeignKey(
+        StockMovementItem, blank=True, null=True, on_delete=models.SET_NULL, related_name='cost_layers',
+        help_text=_("Inbound movement item the layer was received with"))
+    unit_cost = models.DecimalField(max_digits=19, decimal_places=4, help_text=_("Cost of one smallest unit"))
+    quantity = models.DecimalField(max_digits=19, decimal_places=4, help_text=_("Quantity received"))
+    remaining = models.DecimalField(max_digits=19, decimal_places=4, help_text=_("Quantity not consumed yet"))
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.warehouse_id}/{self.product_id}: {self.remaining} of {self.quantity} at {self.unit_cost}'
+
+    class Meta:
+        ordering = ['received_at', 'id']
+        verbose_name = _("Cost Layer")
+        verbose_name_plural = _("Cost Layers")
+        indexes = [
+            models.Index(fields=['warehouse', 'product', 'received_at'],
+                         condition=models.Q(remaining__gt=0), name='inv_cost_layer_open_idx'),
+        ]
+
+
+class CostLayerConsumption(models.Model):
+    """
+    Quantity taken from a cost layer by a dispatch, with the document it was taken for
+    (the OrderItem of a sale, otherwise the StockMovementItem). Quantities no layer
+    covered have no layer and are valued at the product's last buy price.
+    """
+    layer = models.ForeignKey(CostLayer, blank=True, null=True, on_delete=models.SET_NULL,
+                              related_name='consumptions')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=19, decimal_places=4)
+    unit_cost = models.DecimalField(max_digits=19, decimal_places=4)
+    ref_type = models.ForeignKey(ContentType, blank=True, null=True, on_delete=models.SET_NULL)
+    ref_id = models.PositiveIntegerField(blank=True, null=True)
+    ref = GenericForeignKey('ref_type', 'ref_id')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.warehouse_id}/{self.product_id}: {self.quantity} at {self.unit_cost}'
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = _("Cost Layer Consumption")
+        verbose_name_plural = _("Cost Layer Consumptions")
+        indexes = [
+            models.Index(fields=['ref_type', 'ref_id'], name='inv_cost_consumption_ref_idx'),
+        ]
 
 
 class StockAdjustment(BaseModelGeneric):
@@ -634,6 +808,10 @@ class ReplenishmentOrder(BaseModelGeneric):
         Product, on_delete=models.CASCADE, help_text=SELECT_PRODUCT)
     quantity = models.PositiveIntegerField(help_text=ENTER_THE_QUANTITY)
     order_date = models.DateField(help_text=_("Specify the order date"))
+    warehouse = models.ForeignKey(
+        Warehouse, blank=True, null=True, on_delete=models.CASCADE, help_text=_("Select the warehouse to replenish"))
+    reorder_point = models.PositiveIntegerField(
+        blank=True, null=True, help_text=_("Forecasted reorder point in purchasing unit"))
 
     def __str__(self):
         return _("Replenishment Order #{order_id}").format(order_id=self.id32)
@@ -97,7 +97,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'margin_type', 'margin_value',
             'category', 'quantity', 'phsycal_quantity', 'smallest_unit', 'purchasing_unit',
             'product_type', 'price_calculation', 'brand', 'minimum_quantity',
-            'is_active', 'picture', 'suppliers'
+            'is_active', 'weight', 'picture', 'suppliers'
             # add or remove fields as needed
         ]
         read_only_fields = ['phsycal_quantity']
@@ -143,7 +143,7 @@ class ProductEditSerializer(ProductValidator, serializers.ModelSerializer):
             'margin_type', 'margin_value',
             'category_id32', 'quantity', 'smallest_unit_id32', 'purchasing_unit_id32',
             'product_type', 'price_calculation', 'brand_id32', 'minimum_quantity',
-            'is_active'
+            'is_active', 'weight'
             # add or remove fields as needed
         ]
 
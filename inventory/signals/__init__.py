@@ -1,4 +1,4 @@
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.db import models
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
@@ -6,8 +6,9 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from hr.models import Attendance
 from libs.constants import PICKER_CHECKER_GROUP_NAME
-from ..models import Product, ProductLog, StockMovement, Warehouse, StockMovementItem, WarehouseStock
+from ..models import Product, ProductLog, StockLedgerEntry, StockMovement, Warehouse, StockMovementItem, WarehouseStock
 from ..helpers.stock_movement import handle_origin_warehouse, handle_destination_warehouse, is_dispatch_status_change
+from ..helpers.stock_ledger import record_stock_changes
 
 
 # Table of Content
@@ -22,16 +23,18 @@ from ..helpers.stock_movement import handle_origin_warehouse, handle_destination
 # 5. create_product_log: Creates a log entry for product changes.
 # 6. change_global_stock: Updates product quantity if its smallest unit changes.
 # 7. create_dummy_warehouse_stock: Create dummy stock for all product units when new stock is created
+# 8. record_stock_ledger_entry: Appends the quantity change of a saved stock batch to the stock ledger.
+# 9. record_deleted_stock_ledger_entry: Appends the quantity of a deleted stock batch to the stock ledger.
 
 # Stock Movement
-# 8. check_sm_status_before: Logs the StockMovement's status before save.
-# 9. check_movement_item_previous_status: Checks for status in movement item status before save.
-# 10. handle_movement_item_status_change_post: Checks for changes in movement item status after save.
-# 11. stock_movement_status_update: Updates stock movement status based on associated item's status.
-# 12. set_movement_date_on_status_change: Set the movement_date to the current time if it's None
+# 10. check_sm_status_before: Logs the StockMovement's status before save.
+# 11. check_movement_item_previous_status: Checks for status in movement item status before save.
+# 12. handle_movement_item_status_change_post: Checks for changes in movement item status after save.
+# 13. stock_movement_status_update: Updates stock movement status based on associated item's status.
+# 14. set_movement_date_on_status_change: Set the movement_date to the current time if it's None
 
 # Others
-# 13. set_agent_able_to_checkout: Set agents (checker or picker) able to checkout if there is nothing to move
+# 15. set_agent_able_to_checkout: Set agents (checker or picker) able to checkout if there is nothing to move
 
 
 def commit_base_price(product, buy_price):
@@ -282,6 +285,22 @@ def create_dummy_warehouse_stock(sender, instance, created, **kwargs):
                 )
 
 
+@receiver(post_save, sender=WarehouseStock)
+def record_stock_ledger_entry(sender, instance, **kwargs):
+    """
+    Record the quantity change of a saved batch, with the reason and document set by
+    add_stock or deduct_stock, if any.
+    """
+    record_stock_changes([instance], getattr(instance, 'ledger_reason', StockLedgerEntry.ADJUSTMENT),
+                         getattr(instance, 'ledger_ref', None))
+    instance.ledger_reason = instance.ledger_ref = None
+
+
+@receiver(post_delete, sender=WarehouseStock)
+def record_deleted_stock_ledger_entry(sender, instance, **kwargs):
+    record_stock_changes([instance], StockLedgerEntry.ADJUSTMENT, deleted=True)
+
+
 @receiver(post_save, sender=StockMovement)
 def set_agent_able_to_checkout(sender, instance, created, **kwargs):
     """
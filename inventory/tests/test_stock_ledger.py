@@ -0,0 +1,56 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+from ..helpers.stock import save_stock_batches
+from ..helpers.stock_ledger import get_stock_as_of, take_stock_snapshot
+from ..models import Category, Product, StockLedgerEntry, StockSnapshot, Unit, Warehouse, WarehouseStock
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='tester')
+        self.unit, = Unit.objects.bulk_create_with_audit([Unit(name='Piece', symbol='pcs')], self.user)
+        category, = Category.objects.bulk_create_with_audit([Category(name='Test')], self.user)
+        self.product, = Product.objects.bulk_create_with_audit([Product(
+            name='Test Product', sku='TEST-1', category=category, smallest_unit=self.unit,
+            product_type='finished_goods', price_calculation='manual', margin_type='fixed')], self.user)
+        self.warehouse, = Warehouse.objects.bulk_create_with_audit([Warehouse(name='Test', address='Test')], self.user)
+        self.key = (self.warehouse.id, self.product.id, self.unit.id)
+        self.today = timezone.localdate()
+
+    def save_batch(self, quantity):
+        stock = WarehouseStock(warehouse=self.warehouse, product=self.product, unit=self.unit, quantity=quantity)
+        save_stock_batches([stock], self.user, StockLedgerEntry.INBOUND)
+        return stock
+
+    def test_batch_saves_record_their_quantity_changes(self):
+        stock = self.save_batch(10)
+        stock.quantity = 4
+        save_stock_batches([stock], self.user)
+        stock = WarehouseStock.objects.get(pk=stock.pk)
+        stock.quantity = 3
+        save_stock_batches([stock], self.user)
+
+        self.assertEqual(list(StockLedgerEntry.objects.order_by('id').values_list('reason', 'delta')), [
+            (StockLedgerEntry.INBOUND, 10), (StockLedgerEntry.ADJUSTMENT, -6), (StockLedgerEntry.ADJUSTMENT, -1)])
+        self.assertEqual(get_stock_as_of(self.today), {self.key: 3})
+        self.assertEqual(get_stock_as_of(self.today - timedelta(days=1)), {})
+
+    def test_stock_as_of_starts_from_the_latest_snapshot(self):
+        stock = self.save_batch(10)
+        StockLedgerEntry.objects.update(date=self.today - timedelta(days=2))
+        stock.quantity = 4
+        save_stock_batches([stock], self.user)
+
+        self.assertEqual(take_stock_snapshot(), 1)
+        self.assertEqual(StockSnapshot.objects.get(date=self.today - timedelta(days=1)).quantity, 10)
+        # Entries up to the snapshot are no longer read, so a late change to them is not seen.
+        StockLedgerEntry.objects.filter(delta=10).update(delta=11)
+        self.assertEqual(get_stock_as_of(self.today), {self.key: 4})
+        self.assertEqual(get_stock_as_of(self.today - timedelta(days=2)), {self.key: 11})
+
+    def test_only_an_ended_day_can_be_snapshotted(self):
+        with self.assertRaises(ValidationError):
+            take_stock_snapshot(self.today)
@@ -0,0 +1,83 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from sales.models import Customer, OrderItem, SalesOrder
+from ..helpers.valuation import consume_cost_layers, dispatch_cost_layers, return_cost_layers
+from ..models import (Category, CostLayer, CostLayerConsumption, Product, StockMovement, StockMovementItem, Unit,
+                      Warehouse)
+
+
+class CostLayerTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='tester')
+        unit, = Unit.objects.bulk_create_with_audit([Unit(name='Piece', symbol='pcs')], user)
+        category, = Category.objects.bulk_create_with_audit([Category(name='Test')], user)
+        self.product, = Product.objects.bulk_create_with_audit([Product(
+            name='Test Product', sku='TEST-1', category=category, smallest_unit=unit, product_type='finished_goods',
+            price_calculation='manual', margin_type='fixed', base_price=Decimal('99'),
+            last_buy_price=Decimal('3'))], user)
+        self.warehouse, = Warehouse.objects.bulk_create_with_audit([Warehouse(name='Test', address='Test')], user)
+        customer, = Customer.objects.bulk_create_with_audit([Customer(
+            name='Test Customer', contact_number='0800', address='Test')], user)
+        movement, = StockMovement.objects.bulk_create_with_audit([StockMovement(
+            origin_type=ContentType.objects.get_for_model(Warehouse), origin_id=self.warehouse.id,
+            destination_type=ContentType.objects.get_for_model(Customer), destination_id=customer.id,
+            status=StockMovement.ON_DELIVERY, generate_items_from_sales=False)], user)
+        self.item, = StockMovementItem.objects.bulk_create_with_audit([StockMovementItem(
+            stock_movement=movement, product=self.product, unit=unit, quantity=7,
+            destination_customer=customer)], user)
+        order, = SalesOrder.objects.bulk_create_with_audit([SalesOrder(
+            customer=customer, order_date=date(2023, 1, 10))], user)
+        order.stock_movements.add(movement)
+        self.order_item, = OrderItem.objects.bulk_create_with_audit([OrderItem(
+            order=order, product=self.product, unit=unit, quantity=7, price=Decimal('10'))], user)
+        self.layers = CostLayer.objects.bulk_create([
+            CostLayer(warehouse=self.warehouse, product=self.product, unit_cost=unit_cost, quantity=5, remaining=5)
+            for unit_cost in (Decimal('2'), Decimal('4'))
+        ])
+
+    def remaining(self):
+        return list(CostLayer.objects.filter(product=self.product).order_by('id').values_list('remaining', flat=True))
+
+    def cogs(self):
+        return OrderItem.objects.get(pk=self.order_item.pk).cogs
+
+    def test_dispatch_takes_oldest_layers_first(self):
+        dispatch_cost_layers(self.item, 7)
+
+        self.assertEqual(self.remaining(), [0, 3])
+        self.assertEqual(self.cogs(), Decimal('18.00'))
+
+    def test_uncovered_quantity_is_valued_at_last_buy_price(self):
+        consumptions, = consume_cost_layers(self.warehouse.id, [(self.product.id, 12, None)])
+
+        self.assertEqual(sum(consumption.quantity * consumption.unit_cost for consumption in consumptions), 36)
+        self.assertEqual((consumptions[-1].layer, consumptions[-1].quantity, consumptions[-1].unit_cost),
+                         (None, 2, Decimal('3')))
+
+    def test_partial_return_goes_back_to_newest_consumption_first(self):
+        dispatch_cost_layers(self.item, 7)
+
+        self.assertEqual(return_cost_layers(self.item, 3), Decimal('10'))
+        self.assertEqual(self.remaining(), [1, 5])
+        self.assertEqual(self.cogs(), Decimal('8.00'))
+
+    def test_full_return_restores_layers_and_clears_cogs(self):
+        dispatch_cost_layers(self.item, 7)
+
+        self.assertEqual(return_cost_layers(self.item, 7), Decimal('18'))
+        self.assertEqual(self.remaining(), [5, 5])
+        self.assertIsNone(self.cogs())
+        self.assertFalse(CostLayerConsumption.objects.exists())
+        self.assertEqual(return_cost_layers(self.item, 7), 0)
+        self.assertEqual(self.remaining(), [5, 5])
+
+    def test_return_of_uncovered_quantity_opens_a_layer_at_its_cost(self):
+        dispatch_cost_layers(self.item, 12)
+
+        self.assertEqual(return_cost_layers(self.item, 12), Decimal('36'))
+        self.assertEqual(list(CostLayer.objects.filter(product=self.product).order_by('id').values_list(
+            'remaining', 'unit_cost')), [(5, 2), (5, 4), (2, 3)])
+        self.assertIsNone(self.cogs())
@@ -5,6 +5,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from libs.pagination import CustomPagination
 from common.serializers import SetFileSerializer
+from ..helpers.picking import build_pick_wave
+from ..helpers.slotting import apply_slotting, recommend_slotting
+from ..helpers.valuation import get_inventory_valuation
 from ..models import Product, Unit, Category, Warehouse
 from ..serializers.product import ProductListSerializer, ProductDetailSerializer, ProductCreateSerializer, ProductEditSerializer
 from ..serializers.unit import UnitCreateUpdateSerializer, UnitDetailSerializer, UnitListSerializer
@@ -106,3 +109,73 @@ class WarehouseViewSet(viewsets.ModelViewSet):
         if self.action == 'list':
             return WarehouseListSerializer
         return WarehouseSerializer
+
+    @action(detail=False, methods=['get'])
+    def valuation(self, request):
+        """
+        Value of the stock per warehouse from its open FIFO cost layers, per product as
+        well with `by_product=true`. Filter with `warehouse_id32`.
+        """
+        warehouse_ids = None
+        if request.query_params.get('warehouse_id32'):
+            warehouse_ids = Warehouse.objects.filter(
+                id32=request.query_params['warehouse_id32']).values_list('id', flat=True)
+        rows = get_inventory_valuation(
+            warehouse_ids, by_product=request.query_params.get('by_product', '').lower() in ['true', '1'])
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
+    @action(detail=True, methods=['get'])
+    def pick_wave(self, request, id32=None):
+        """
+        One pick list for the open stock movements leaving the warehouse, summed per
+        product, unit and location in serpentine route order, with the quantity to put
+        aside for each movement. Limit the wave with `stock_movement_id32s`
+        (comma-separated) or `max_movements`.
+        """
+        warehouse = self.get_object()
+        stock_movement_id32s = [id32 for id32 in request.query_params.get(
+            'stock_movement_id32s', '').split(',') if id32]
+        try:
+            max_movements = int(request.query_params.get('max_movements') or 0)
+        except ValueError:
+            return Response({"error": _("max_movements must be a number.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_pick_wave(warehouse, stock_movement_id32s, max_movements))
+
+    def get_slotting(self, params):
+        try:
+            days = int(params.get('days') or 90)
+            max_swaps = int(params['max_swaps']) if params.get('max_swaps') else None
+        except (TypeError, ValueError):
+            return None
+        return recommend_slotting(self.get_object(), days=max(days, 1), dispatch_area=params.get('dispatch_area'),
+                                  max_swaps=max_swaps)
+
+    @action(detail=True, methods=['get'])
+    def slotting(self, request, id32=None):
+        """
+        Pick velocity and ABC class of the products of the warehouse over the last `days`
+        (90 by default), with the slot swaps that bring fast movers closer to
+        `dispatch_area` and the expected travel before and after them. Cap the swaps with
+        `max_swaps`.
+        """
+        result = self.get_slotting(request.query_params)
+        if result is None:
+            return Response({"error": _("days and max_swaps must be numbers.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    @action(detail=True, methods=['post'])
+    def apply_slotting(self, request, id32=None):
+        """
+        Recomputes the slotting recommendation with the same parameters as the report and
+        applies its swaps to the product locations.
+        """
+        result = self.get_slotting(request.data)
+        if result is None:
+            return Response({"error": _("days and max_swaps must be numbers.")}, status=status.HTTP_400_BAD_REQUEST)
+        updated = apply_slotting(result['swaps'], request.user)
+        return Response({'locations_updated': updated, 'swaps': result['swaps'],
+                         'expected_travel': result['expected_travel'],
+                         'proposed_travel': result['proposed_travel']})
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone as dt_timezone
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from libs.async_views import AsyncAPIView
+from libs.storage import FILE_STORAGE
+from ..models import Product, WarehouseStock
+
+
+class ProductCatalogueView(AsyncAPIView):
+    """
+    Product catalogue for the mobile apps, paginated like the product list endpoint.
+
+    Query parameters:
+    - search: Part of the product name.
+    - product_type, sku, is_active: Same filters as the product list endpoint.
+    - updated_since: Unix timestamp. Turns the catalogue into a sync feed: products
+      changed after it, oldest change first, including soft-deleted ones with
+      `is_deleted` set so the client can drop them.
+    """
+    permission_required = ('inventory.view_product',)
+    fields = ['id32', 'name', 'sku', 'base_price', 'sell_price', 'quantity',
+              'product_type', 'is_active', 'picture__file', 'updated_at', 'deleted_at']
+
+    async def get(self, request):
+        updated_since = request.GET.get('updated_since')
+        if updated_since:
+            try:
+                since = datetime.fromtimestamp(int(updated_since), tz=dt_timezone.utc)
+            except (ValueError, OverflowError):
+                return JsonResponse({'error': _('updated_since must be a unix timestamp')}, status=400)
+            queryset = Product.all_objects.filter(updated_at__gt=since).order_by('updated_at', 'id')
+        else:
+            queryset = Product.objects.order_by('-id')
+
+        search = request.GET.get('search')
+        if search:
+            queryset = queryset.filter(name__icontains=search)
+        for field in ['product_type', 'sku']:
+            if request.GET.get(field):
+                queryset = queryset.filter(**{field: request.GET[field]})
+        if request.GET.get('is_active') in ['true', 'false']:
+            queryset = queryset.filter(is_active=request.GET['is_active'] == 'true')
+
+        return await self.paginate(request, queryset.values(*self.fields), self.serialize)
+
+    @staticmethod
+    def serialize(row):
+        picture = row.pop('picture__file')
+        row['picture'] = FILE_STORAGE.url(picture) if picture else None
+        row['is_deleted'] = row.pop('deleted_at') is not None
+        return row
+
+
+class StockLookupView(AsyncAPIView):
+    """
+    Stock on hand per warehouse, product and unit, in the same shape as the distinct
+    warehouse stock endpoint.
+
+    Query parameters:
+    - product_id32: Limit the lookup to a product. Either this or warehouse_id32 is required.
+    - warehouse_id32: Limit the lookup to a warehouse.
+    """
+    permission_required = ('inventory.view_warehousestock',)
+
+    async def get(self, request):
+        product_id32 = request.GET.get('product_id32')
+        warehouse_id32 = request.GET.get('warehouse_id32')
+        if not product_id32 and not warehouse_id32:
+            return JsonResponse(
+                {'error': _('product_id32 or warehouse_id32 is required')}, status=400)
+
+        queryset = WarehouseStock.objects.filter(quantity__gt=0)
+        if product_id32:
+            queryset = queryset.filter(product__id32=product_id32)
+        if warehouse_id32:
+            queryset = queryset.filter(warehouse__id32=warehouse_id32)
+        queryset = queryset.values(
+            'warehouse__id32', 'warehouse__name', 'product__id32', 'product__name',
+            'unit__id32', 'unit__name', 'unit__symbol'
+        ).annotate(total_quantity=Sum('quantity')).order_by('warehouse__name', 'product__name')
+        return JsonResponse([row async for row in queryset], safe=False)
@@ -8,6 +8,7 @@ from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from libs.filter import CreatedAtFilterMixin
+from libs.mixins import LeanListMixin
 from libs.pagination import CustomPagination
 from ..models import StockMovement, StockMovementItem
 from ..serializers.stock_movement import (StockMovementListSerializer, 
@@ -104,7 +105,7 @@ class StockMovementFilter(CreatedAtFilterMixin):
         return queryset.filter(id__in=stock_movement_ids).order_by('created_at')
 
 
-class StockMovementViewSet(viewsets.ModelViewSet):
+class StockMovementViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = StockMovement.objects.all()
     permission_classes = [permissions.IsAuthenticated,
                           permissions.DjangoModelPermissions]
@@ -151,7 +152,7 @@ class StockMovementViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class StockMovementItemViewSet(viewsets.ModelViewSet):
+class StockMovementItemViewSet(LeanListMixin, viewsets.ModelViewSet):
     queryset = StockMovementItem.objects.all()
     lookup_field = 'id32'
     permission_classes = [permissions.IsAuthenticated,
@@ -1,10 +1,14 @@
-from rest_framework import viewsets, permissions, filters
+from datetime import date
+from django.utils.translation import gettext_lazy as _
+from rest_framework import viewsets, permissions, filters, status
 from django_filters import rest_framework as django_filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from libs.mixins import LeanListMixin, ReplicaReadMixin
 from libs.pagination import CustomPagination
 from django.db.models import Sum
-from ..models import WarehouseStock
+from ..helpers.stock_ledger import describe_stock, get_stock_as_of
+from ..models import Product, Warehouse, WarehouseStock
 from ..serializers.stock import WarehouseStockSerializer, DistinctWarehouseStockSerializer
 
 
@@ -26,7 +30,7 @@ class WarehouseStockFilter(django_filters.FilterSet):
                   'expires_before_or_on', 'expires_after']
 
 
-class WarehouseStockViewSet(viewsets.ModelViewSet):
+class WarehouseStockViewSet(LeanListMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = WarehouseStock.objects.filter(quantity__gt=0)
     serializer_class = WarehouseStockSerializer
     filter_backends = (filters.OrderingFilter,
@@ -38,6 +42,7 @@ class WarehouseStockViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
     lookup_field = 'id32'
     search_fields = ['warehouse__name', 'product__name']
+    replica_actions = ['distinct', 'as_of']
 
     def get_serializer_class(self):
         if self.action == 'distinct':
@@ -61,3 +66,28 @@ class WarehouseStockViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], name='Warehouse Stock As Of')
+    def as_of(self, request, *args, **kwargs):
+        """
+        Stock per warehouse, product and unit at the end of `date` (YYYY-MM-DD), from
+        the latest stock snapshot and the stock ledger entries after it. Filter with
+        `warehouse_id32` and `product_id32`.
+        """
+        try:
+            as_of = date.fromisoformat(request.query_params['date'])
+        except (KeyError, ValueError):
+            return Response({"error": _("date must be in 'YYYY-MM-DD' format.")}, status=status.HTTP_400_BAD_REQUEST)
+        warehouse_ids = product_ids = None
+        if request.query_params.get('warehouse_id32'):
+            warehouse_ids = list(Warehouse.objects.filter(
+                id32=request.query_params['warehouse_id32']).values_list('id', flat=True))
+        if request.query_params.get('product_id32'):
+            product_ids = list(Product.objects.filter(
+                id32=request.query_params['product_id32']).values_list('id', flat=True))
+
+        rows = describe_stock(get_stock_as_of(as_of, warehouse_ids, product_ids))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
@@ -0,0 +1,81 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .middleware import CustomTokenAuthentication, set_current_user
+from .pagination import CustomPagination
+
+
+class AsyncAPIView(View):
+    """
+    Base class for read-only JSON endpoints served as native async views.
+
+    DRF views are synchronous, so under ASGI every request holds a worker thread for
+    its whole duration. Subclasses implement `async def get` with the async ORM, so a
+    single worker can serve many slow mobile connections at once. Authentication and
+    permissions follow the DRF viewsets: token authentication, then every permission
+    in `permission_required` (e.g. 'inventory.view_product').
+    """
+    http_method_names = ['get', 'options']
+    permission_required = ()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            authenticated = await sync_to_async(CustomTokenAuthentication().authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({'detail': e.detail}, status=401)
+        if not authenticated:
+            return JsonResponse(
+                {'detail': _('Authentication credentials were not provided.')}, status=401)
+        user, _token = authenticated
+        if not await sync_to_async(user.has_perms)(self.permission_required):
+            return JsonResponse(
+                {'detail': _('You do not have permission to perform this action.')}, status=403)
+        request.user = user
+        set_current_user(user)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def paginate(self, request, queryset, serialize):
+        """
+        Returns a page of the queryset in the same shape as CustomPagination.
+
+        Parameters:
+        - request: The HttpRequest, read for the `page` and `page_size` parameters.
+        - queryset: An ordered queryset.
+        - serialize: Function turning one queryset row into a JSON-ready dict.
+
+        Returns:
+        JsonResponse: The page, or a 404 response for a page out of range.
+        """
+        paginator = CustomPagination
+        try:
+            page_size = min(int(request.GET.get(paginator.page_size_query_param, paginator.page_size)),
+                            paginator.max_page_size)
+            page = int(request.GET.get(paginator.page_query_param, 1))
+        except ValueError:
+            return JsonResponse({'detail': _('Invalid page.')}, status=404)
+        page_size = max(page_size, 1)
+        count = await queryset.acount()
+        total_pages = max((count + page_size - 1) // page_size, 1)
+        if page < 1 or page > total_pages:
+            return JsonResponse({'detail': _('Invalid page.')}, status=404)
+
+        offset = (page - 1) * page_size
+        results = [serialize(row) async for row in queryset[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+        previous_link = None
+        if page > 1:
+            previous_link = replace_query_param(url, paginator.page_query_param, page - 1) \
+                if page > 2 else remove_query_param(url, paginator.page_query_param)
+        return JsonResponse({
+            'links': {
+                'next': replace_query_param(url, paginator.page_query_param, page + 1)
+                if page < total_pages else None,
+                'previous': previous_link,
+            },
+            'count': count,
+            'total_pages': total_pages,
+            'results': results,
+        })
@@ -0,0 +1,84 @@
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import router, transaction
+from django.utils import timezone
+
+APPROVED = 'approved'
+UNAPPROVED = 'unapproved'
+PUBLISHED = 'published'
+UNPUBLISHED = 'unpublished'
+DELETED = 'deleted'
+UNDELETED = 'undeleted'
+
+# Lifecycle actions that are only kept in the audit log when COMPACT_AUDIT is on.
+# Approval and deletion stay inline because business logic and the default manager
+# read them.
+COLD_ACTIONS = (PUBLISHED, UNPUBLISHED)
+
+
+def is_compact_audit():
+    """
+    Returns True when cold audit columns are no longer written inline.
+    """
+    return getattr(settings, 'COMPACT_AUDIT', False)
+
+
+class PendingEvents(list):
+    """
+    Audit events recorded inside one transaction (or savepoint), written with a single
+    bulk insert when it commits. The buffer is only referenced by Django's on_commit
+    queue, so it is released with the queue on commit and on rollback.
+    """
+
+    def __init__(self, using, savepoint_ids):
+        super().__init__()
+        self.using = using
+        self.savepoint_ids = savepoint_ids
+
+    def __call__(self):
+        AuditEvent = apps.get_model('common', 'AuditEvent')
+        AuditEvent.objects.using(self.using).bulk_create(self)
+        self.clear()
+
+
+def get_pending_events(using):
+    """
+    Returns the pending events buffer of the current savepoint of `using`, registering
+    its flush with transaction.on_commit the first time.
+    """
+    connection = transaction.get_connection(using)
+    savepoint_ids = tuple(connection.savepoint_ids)
+    for _sids, callback, _robust in reversed(connection.run_on_commit):
+        if isinstance(callback, PendingEvents) and callback.savepoint_ids == savepoint_ids:
+            return callback
+    pending = PendingEvents(using, savepoint_ids)
+    transaction.on_commit(pending, using=using)
+    return pending
+
+
+def record_event(instance, action, user=None):
+    """
+    Appends a lifecycle event of a model instance to the audit log.
+
+    Inside a transaction the event is buffered and bulk inserted on commit, with the
+    other events of the same transaction; in autocommit mode it is written at once.
+
+    Parameters:
+    - instance: A saved model instance.
+    - action: One of the AuditEvent actions, e.g. APPROVED.
+    - user: The user who performed the action.
+    """
+    AuditEvent = apps.get_model('common', 'AuditEvent')
+    event = AuditEvent(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        action=action,
+        user=user,
+        created_at=timezone.now(),
+    )
+    using = router.db_for_write(AuditEvent)
+    if transaction.get_connection(using).in_atomic_block:
+        get_pending_events(using).append(event)
+    else:
+        event.save(using=using)
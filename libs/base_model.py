@@ -4,14 +4,57 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.sites.models import Site
 from django.conf import settings
+from .audit import (APPROVED, UNAPPROVED, PUBLISHED, UNPUBLISHED, DELETED, UNDELETED,
+                    COLD_ACTIONS, is_compact_audit, record_event)
 from .base32 import base32_encode
-from .middleware import _thread_locals
+from .middleware import get_current_user
 
 User = settings.AUTH_USER_MODEL
 CREATED_BY_RELATED_NAME = '%(app_label)s_%(class)s_created_by'
 
+# Audit columns no list endpoint reads. They are deferred by `lean()` and, apart from
+# the NOT NULL created_at_timestamp, not written when COMPACT_AUDIT is on.
+COLD_AUDIT_FIELDS = (
+    'nonce',
+    'created_at_timestamp',
+    'owned_at', 'owned_at_timestamp',
+    'updated_at_timestamp',
+    'published_at', 'published_at_timestamp', 'published_by',
+    'unpublished_at', 'unpublished_at_timestamp', 'unpublished_by',
+    'approved_at_timestamp',
+    'unapproved_at_timestamp',
+    'deleted_at_timestamp', 'deleted_by',
+)
+
+
+class BaseQuerySet(models.QuerySet):
+    def lean(self):
+        """
+        Defers the cold audit columns, for list endpoints on wide, hot tables.
+        """
+        return self.defer(*COLD_AUDIT_FIELDS)
+
+    def update_with_audit(self, user=None, **kwargs):
+        """
+        `update` that also stamps updated_at and updated_at_timestamp, like
+        `_BaseAbstract.save`, so change feeds reading updated_at see the rows.
+
+        Parameters:
+        - user: User recorded as updater; defaults to the current request user.
+        - kwargs: Passed through to `update`.
+
+        Returns:
+        - The number of rows matched.
+        """
+        now = timezone.now()
+        kwargs.setdefault('updated_at', now)
+        kwargs.setdefault('updated_at_timestamp', int(now.timestamp()))
+        if 'updated_by_id' not in kwargs:
+            kwargs.setdefault('updated_by', user or get_current_user())
+        return self.update(**kwargs)
+
 
-class SoftDeletableManager(models.Manager):
+class SoftDeletableManager(models.Manager.from_queryset(BaseQuerySet)):
     """
     Manager that filters out soft-deleted records by default.
     """
@@ -22,8 +65,49 @@ class SoftDeletableManager(models.Manager):
         """
         return super().get_queryset().filter(deleted_at__isnull=True)
 
+    def bulk_create_with_audit(self, objs, user=None, batch_size=None):
+        """
+        Bulk-insert records while filling the fields that `_BaseAbstract.save`
+        normally sets (created/updated user and timestamp, site and id32).
+
+        Signals are not sent, same as `bulk_create`.
 
-class AllObjectsManager(models.Manager):
+        Parameters:
+        - objs: Unsaved model instances.
+        - user: User recorded as creator; defaults to the current request user.
+        - batch_size: Passed through to `bulk_create`.
+
+        Returns:
+        - The created instances with their primary keys and id32 set.
+        """
+        objs = list(objs)
+        if not objs:
+            return objs
+        user = user or get_current_user()
+        site = Site.objects.get_current()
+        now = timezone.now()
+        timestamp = int(now.timestamp())
+        for obj in objs:
+            if obj.created_at is None:
+                obj.created_at = now
+                obj.created_at_timestamp = timestamp
+                if not obj.created_by_id:
+                    obj.created_by = user
+            obj.updated_at = now
+            obj.updated_at_timestamp = timestamp
+            obj.updated_by = user
+            if not obj.site_id:
+                obj.site = site
+        created = self.bulk_create(objs, batch_size=batch_size)
+        missing_id32 = [obj for obj in created if not obj.id32]
+        for obj in missing_id32:
+            obj.id32 = base32_encode(obj.id)
+        if missing_id32:
+            self.bulk_update(missing_id32, ['id32'], batch_size=batch_size)
+        return created
+
+
+class AllObjectsManager(models.Manager.from_queryset(BaseQuerySet)):
     """
     Manager that includes soft-deleted records.
     """
@@ -99,8 +183,8 @@ class _BaseAbstract(models.Model):
 
     @property
     def _current_user(self):
-        """Retrieve the current user from thread-local storage."""
-        return getattr(_thread_locals, 'user', None)
+        """Retrieve the current user of the request being handled."""
+        return get_current_user()
 
     # =========================
     # Helper Methods
@@ -108,11 +192,14 @@ class _BaseAbstract(models.Model):
     def _set_timestamp(self, field_name):
         now = timezone.now()
         setattr(self, field_name, now)
-        setattr(self, f"{field_name}_timestamp", int(now.timestamp()))
+        if field_name == 'created_at' or not is_compact_audit():
+            setattr(self, f"{field_name}_timestamp", int(now.timestamp()))
 
     def _set_user_action(self, action, user):
-        if user:
-            self._set_timestamp(f"{action}_at")
+        if not user or (action in COLD_ACTIONS and is_compact_audit()):
+            return
+        self._set_timestamp(f"{action}_at")
+        if action != DELETED or not is_compact_audit():
             setattr(self, f"{action}_by", user)
 
     def _nullify_user_action(self, action):
@@ -141,31 +228,35 @@ class _BaseAbstract(models.Model):
         super(_BaseAbstract, self).save(*args, **kwargs)
 
     def approve(self, user=None):
-        self._set_user_action(
-            'approved',  user if user else self._current_user)
-        self._nullify_user_action('unapproved')
+        user = user if user else self._current_user
+        self._set_user_action(APPROVED, user)
+        self._nullify_user_action(UNAPPROVED)
         self.save()
+        record_event(self, APPROVED, user)
 
     def unapprove(self, user=None):
-        self._set_user_action(
-            'unapproved',  user if user else self._current_user)
-        self._nullify_user_action('approved')
+        user = user if user else self._current_user
+        self._set_user_action(UNAPPROVED, user)
+        self._nullify_user_action(APPROVED)
         self.save()
+        record_event(self, UNAPPROVED, user)
 
     def reject(self, user=None):
         self.unapprove(user)
 
     def publish(self, user=None):
-        self._set_user_action(
-            'published', user if user else self._current_user)
-        self._nullify_user_action('unpublished')
+        user = user if user else self._current_user
+        self._set_user_action(PUBLISHED, user)
+        self._nullify_user_action(UNPUBLISHED)
         self.save()
+        record_event(self, PUBLISHED, user)
 
     def unpublish(self, user=None):
-        self._set_user_action(
-            'unpublished', user if user else self._current_user)
-        self._nullify_user_action('published')
+        user = user if user else self._current_user
+        self._set_user_action(UNPUBLISHED, user)
+        self._nullify_user_action(PUBLISHED)
         self.save()
+        record_event(self, UNPUBLISHED, user)
 
         # Soft delete method
     def delete(self, user=None, *args, **kwargs):
@@ -173,19 +264,23 @@ class _BaseAbstract(models.Model):
         Overridden delete method to perform a soft delete. Instead of removing 
         the instance from the database, it sets deleted_at and deleted_by fields.
         """
+        user = user if user else self._current_user
         # Mark when the record was deleted
-        self._set_user_action('deleted', user if user else self._current_user)
+        self._set_user_action(DELETED, user)
 
         # Instead of hard deleting the record, we update the fields
         self.save()
+        record_event(self, DELETED, user)
 
     def permanent_delete(self, *args, **kwargs):
         super(_BaseAbstract, self).delete(*args, **kwargs)
 
     def undelete(self, user=None):
-        self._nullify_user_action('deleted')
-        self._set_user_action('updated', user if user else self._current_user)
+        user = user if user else self._current_user
+        self._nullify_user_action(DELETED)
+        self._set_user_action('updated', user)
         self.save()
+        record_event(self, UNDELETED, user)
 
     # =========================
     # Property Methods
@@ -0,0 +1,125 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_read_alias = ContextVar('read_alias', default=None)
+_lag_lock = threading.Lock()
+_lag_checks = {}
+
+# Postgres standby lag in seconds. A standby that replayed everything it received is
+# not lagging, even if the primary has been idle since the last replayed transaction.
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def get_replica_alias():
+    """
+    Returns the configured replica alias, or None when it is not in DATABASES.
+    """
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def get_replica_lag(alias):
+    """
+    Returns the replication lag of a replica in seconds, or None when it cannot be
+    reached. The result is kept for REPLICA_LAG_CHECK_INTERVAL seconds per process,
+    so the check costs one query per interval instead of one per request.
+    """
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _lag_lock:
+        checked = _lag_checks.get(alias)
+    if checked and now - checked[0] < interval:
+        return checked[1]
+
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(REPLICA_LAG_SQL)
+                lag = float(cursor.fetchone()[0])
+            else:
+                # Other backends (e.g. a second SQLite file when testing locally)
+                # have no replication to measure.
+                cursor.execute('SELECT 1')
+                lag = 0.0
+    except DatabaseError:
+        lag = None
+    with _lag_lock:
+        _lag_checks[alias] = (now, lag)
+    return lag
+
+
+def get_sticky_key(user_id):
+    return f'db_router:sticky:{user_id}'
+
+
+def mark_primary_sticky(user):
+    """
+    Sends the reads of a user to the primary for REPLICA_STICKY_SECONDS, so a report
+    opened right after a write does not miss it while the replica catches up.
+    """
+    if get_replica_alias() and user is not None and user.is_authenticated:
+        cache.set(get_sticky_key(user.pk), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 15))
+
+
+def choose_read_alias(user=None):
+    """
+    Returns the database alias reporting reads of a user should use: the replica
+    unless it is not configured, unreachable or lagging more than REPLICA_MAX_LAG
+    seconds, or the user wrote recently.
+    """
+    alias = get_replica_alias()
+    if not alias:
+        return DEFAULT_DB_ALIAS
+    if user is not None and user.is_authenticated and cache.get(get_sticky_key(user.pk)):
+        return DEFAULT_DB_ALIAS
+    lag = get_replica_lag(alias)
+    if lag is None or lag > getattr(settings, 'REPLICA_MAX_LAG', 30):
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+@contextmanager
+def read_from(alias):
+    """
+    Routes the ORM reads inside the block to `alias`. Writes still go to the primary.
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads to the alias chosen with `read_from` (the
+    primary by default) and every write to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance read from the replica still writes to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
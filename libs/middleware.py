@@ -1,24 +1,54 @@
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
 from rest_framework.authentication import TokenAuthentication
-import threading
+from rest_framework.permissions import SAFE_METHODS
+from .db_router import mark_primary_sticky
+from .token_cache import cache_token, get_cached_token
+
+_current_user = ContextVar('current_user', default=None)
+
+
+def get_current_user():
+    """
+    Returns the user of the request being handled by the current thread or task.
+    """
+    return _current_user.get()
+
+
+def set_current_user(user):
+    """
+    Sets the current user for the current thread or task.
+
+    Returns:
+    Token: Pass it to `_current_user.reset` to restore the previous user.
+    """
+    return _current_user.set(user)
 
-_thread_locals = threading.local()
 
 class SetCurrentUserMiddleware:
     """
-    Middleware to set the current user in thread-local storage.
+    Middleware to set the current user in a context variable.
     
     This middleware extracts the user from the request object 
-    and sets it into thread-local storage. This allows other parts 
+    and sets it into a context variable. This allows other parts 
     of the application to access the current user outside of views 
-    and without passing the request object.
+    and without passing the request object. Context variables are
+    local to a thread under WSGI and to a task under ASGI, so
+    concurrent async requests do not see each other's user.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
         """
-        Set the current user from the request into thread-local storage.
+        Set the current user from the request into a context variable
+        for the duration of the request.
         
         Args:
         - request (HttpRequest): The request object for this view.
@@ -26,24 +56,74 @@ class SetCurrentUserMiddleware:
         Returns:
         HttpResponse: The response object for this view.
         """
-        _thread_locals.user = request.user
-        return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = set_current_user(request.user)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_user.reset(token)
+
+    async def __acall__(self, request):
+        token = set_current_user(request.user)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_user.reset(token)
+
+
+class StickyPrimaryMiddleware:
+    """
+    Middleware that keeps a user's reads on the primary database for a short
+    while after they write, so replica-backed reports include their own changes
+    while the replica catches up. See libs.db_router.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_primary_sticky(getattr(request, 'user', None))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            await sync_to_async(mark_primary_sticky)(getattr(request, 'user', None))
+        return response
 
 
 class CustomTokenAuthentication(TokenAuthentication):
     """
     Custom Token Authentication to set the authenticated user 
-    into thread-local storage.
+    as the current user.
     
     This extends the standard TokenAuthentication of the DRF 
     to extract the authenticated user from the token and sets it 
-    into thread-local storage, ensuring applications can access 
+    as the current user, ensuring applications can access 
     the user even outside the request-response lifecycle.
+
+    Validated tokens are kept in a per-process TTL cache (see libs.token_cache)
+    together with the user id and permission set, so repeated requests with the
+    same token load the user with one query and skip the permission queries. Each
+    request gets its own User instance. That query also checks the token still
+    exists and the user is active, so a revoked token is refused by every worker at
+    once. Entries are dropped when the token is deleted or the user, their groups or
+    permissions change, in every worker when CACHES is a shared backend and otherwise
+    within TOKEN_CACHE_TTL seconds.
     """
 
     def authenticate_credentials(self, key):
         """
-        Authenticate the token and set the user into thread-local storage.
+        Authenticate the token and set the user as the current user.
 
         Args:
         - key (str): The token key.
@@ -51,6 +131,16 @@ class CustomTokenAuthentication(TokenAuthentication):
         Returns:
         tuple: A tuple containing user and token.
         """
-        user, token = super().authenticate_credentials(key)
-        _thread_locals.user = user
+        cached = get_cached_token(key)
+        user = None
+        if cached:
+            user_id, created, permissions = cached
+            user = get_user_model().objects.filter(pk=user_id, is_active=True, auth_token__key=key).first()
+        if user:
+            user._perm_cache = set(permissions)
+            token = self.get_model()(key=key, user=user, created=created)
+        else:
+            user, token = super().authenticate_credentials(key)
+            cache_token(key, user, token)
+        set_current_user(user)
         return user, token
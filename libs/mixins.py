@@ -0,0 +1,42 @@
+from rest_framework.permissions import SAFE_METHODS
+from .db_router import choose_read_alias, read_from
+
+
+class LeanListMixin:
+    """
+    ViewSet mixin that defers the cold audit columns on the list action.
+
+    The queryset must come from a `SoftDeletableManager` or `AllObjectsManager`, and the
+    list serializer must not read any of `COLD_AUDIT_FIELDS`, otherwise each row loads
+    them again one query at a time.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.lean()
+        return queryset
+
+
+class ReplicaReadMixin:
+    """
+    View mixin that runs the read-only actions listed in `replica_actions` against
+    the read replica, as chosen by `libs.db_router.choose_read_alias`.
+
+    Views without actions (plain APIView) list HTTP method names instead, e.g. ['get'].
+    """
+    replica_actions = []
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        action = getattr(self, 'action', None) or request.method.lower()
+        if request.method in SAFE_METHODS and action in self.replica_actions:
+            self._replica_read = read_from(choose_read_alias(request.user))
+            self._replica_read.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica_read = getattr(self, '_replica_read', None)
+        if replica_read:
+            self._replica_read = None
+            replica_read.__exit__(None, None, None)
+        return super().finalize_response(request, response, *args, **kwargs)
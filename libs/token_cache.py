@@ -0,0 +1,130 @@
+import threading
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db.transaction import on_commit
+
+# Versions kept in the shared Django cache. Every cached token records the versions
+# it was cached under and is dropped by any process once one of them is bumped.
+TOKEN_VERSION_KEY = 'auth:token_version'
+USER_TOKEN_VERSION_KEY = 'auth:token_version:{user_id}'
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_token_cache():
+    """
+    Returns the per-process token cache, a bounded LRU whose entries expire after
+    TOKEN_CACHE_TTL seconds. Returns None when TOKEN_CACHE_TTL is 0.
+    """
+    global _cache
+    ttl = getattr(settings, 'TOKEN_CACHE_TTL', 300)
+    if not ttl:
+        return None
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = TTLCache(
+                    maxsize=getattr(settings, 'TOKEN_CACHE_MAXSIZE', 10000), ttl=ttl)
+    return _cache
+
+
+def get_versions(user_id):
+    """
+    Returns the shared (global, user) token versions, read with one cache call.
+    """
+    user_key = USER_TOKEN_VERSION_KEY.format(user_id=user_id)
+    versions = shared_cache.get_many([TOKEN_VERSION_KEY, user_key])
+    return versions.get(TOKEN_VERSION_KEY, 0), versions.get(user_key, 0)
+
+
+def bump_version(key):
+    """
+    Bumps a shared token version once the transaction commits, so no process caches
+    the old state again under the new version.
+    """
+    def bump():
+        try:
+            shared_cache.incr(key)
+        except ValueError:
+            shared_cache.set(key, 1, None)
+    on_commit(bump)
+
+
+def get_cached_token(key):
+    """
+    Returns a (user_id, created, permissions) tuple for a cached token key, or None.
+
+    Only ids and values are cached, so every request loads its own User instance and
+    nothing a request changes on it leaks into other requests. The permission set was
+    computed when the token was cached; an entry whose shared versions were bumped
+    since is dropped.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return None
+    with _lock:
+        cached = cache.get(key)
+    if cached is None:
+        return None
+    user_id, created, permissions, versions = cached
+    if versions != get_versions(user_id):
+        with _lock:
+            cache.pop(key, None)
+        return None
+    return user_id, created, permissions
+
+
+def cache_token(key, user, token):
+    """
+    Caches a validated token with its user id, the user's permission set and the
+    shared versions read before the permissions.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return
+    versions = get_versions(user.pk)
+    permissions = frozenset(user.get_all_permissions())
+    with _lock:
+        cache[key] = (user.pk, token.created, permissions, versions)
+
+
+def invalidate_token(key, user_id):
+    """
+    Removes a token from the cache of this process and bumps the token version of its
+    user, so the other processes drop their tokens of that user.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return
+    with _lock:
+        cache.pop(key, None)
+    bump_version(USER_TOKEN_VERSION_KEY.format(user_id=user_id))
+
+
+def invalidate_user(user_id):
+    """
+    Removes every cached token of a user from the cache of this process and bumps the
+    user's token version for the other processes.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return
+    with _lock:
+        for key in [key for key, (cached_user_id, *_rest) in cache.items() if cached_user_id == user_id]:
+            cache.pop(key, None)
+    bump_version(USER_TOKEN_VERSION_KEY.format(user_id=user_id))
+
+
+def clear_token_cache():
+    """
+    Empties the cache of this process and bumps the global token version for the other
+    processes, e.g. after group permissions change.
+    """
+    cache = get_token_cache()
+    if cache is None:
+        return
+    with _lock:
+        cache.clear()
+    bump_version(TOKEN_VERSION_KEY)
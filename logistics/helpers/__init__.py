@@ -2,6 +2,7 @@
 from libs.utils import add_one_day
 from sales.models import Customer
 from ..models import Job, Drop
+from .route import order_drops
 
 def create_job_from_trip(instance):
     trip_date = instance.date
@@ -17,10 +18,11 @@ def create_job_from_trip(instance):
 
 def create_drops_from_visits(job, customer_visits):
     """
-    Helper function to create Drop instances from CustomerVisits.
+    Helper function to create Drop instances from CustomerVisits, numbered in route
+    order from the vehicle's warehouse and inserted in bulk.
     """
-    for visit in customer_visits:
-        Drop.objects.create(
+    drops = [
+        Drop(
             job=job,
             location_name=f"{visit.customer.name} - {visit.customer.store_name}",
             address=visit.customer.address,
@@ -28,4 +30,7 @@ def create_drops_from_visits(job, customer_visits):
             retrieve_payment=True if visit.customer.payment_type == Customer.COD else False,
             order=visit.order,
             sales_visit=visit
-        )
\ No newline at end of file
+        )
+        for visit in customer_visits.select_related('customer')
+    ]
+    Drop.objects.bulk_create_with_audit(order_drops(job, drops))
@@ -0,0 +1,308 @@
+from decimal import Decimal
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from libs.constants import WAITING
+from inventory.helpers.unit import UnitTree
+from sales.models import OrderItem
+from ..models import Drop, Job, Vehicle
+from .route import get_route_length, haversine_matrix, solve_route
+
+AVERAGE_SPEED_KMH = 30
+SERVICE_MINUTES = 10
+SWEEP_STARTS = 8
+
+
+def get_pending_drops(date):
+    """
+    Returns the drops of a day not started yet, on jobs not started yet.
+    """
+    return list(Drop.objects.filter(job__date=date, job__status=WAITING, status=WAITING).select_related(
+        'job', 'job__vehicle', 'sales_visit').order_by('job_id', 'order', 'id'))
+
+
+def get_drop_loads(drops):
+    """
+    Returns the load of each drop from the order items of its sales order, read with
+    one query: the number of item units and their weight in kg. Products without a
+    weight weigh nothing.
+
+    Returns:
+    - A dict of drop id to an (items, weight) tuple.
+    """
+    orders = {drop.sales_visit.sales_order_id: drop.id for drop in drops
+              if drop.sales_visit and drop.sales_visit.sales_order_id}
+    loads = {drop.id: (0, Decimal(0)) for drop in drops}
+    units = UnitTree()
+    for order_id, unit_id, quantity, weight in OrderItem.objects.filter(order_id__in=orders).values_list(
+            'order_id', 'unit_id', 'quantity', 'product__weight'):
+        items, total_weight = loads[orders[order_id]]
+        if weight and unit_id:
+            total_weight += quantity * units.conversion_to_top_level(unit_id) * weight
+        loads[orders[order_id]] = (items + quantity, total_weight)
+    return loads
+
+
+def get_route_minutes(length, stops, average_speed, service_minutes):
+    return length / average_speed * 60 + stops * service_minutes
+
+
+class DispatchProblem:
+    """
+    Distances between the vehicle depots and the drops, with the limits of each
+    vehicle. Node i < len(vehicles) is the depot of vehicle i; node len(vehicles) + j
+    is drop j. A vehicle without a warehouse location gets a depot at distance zero
+    from everything, so its route is an open path.
+    """
+
+    def __init__(self, vehicles, drops, loads, average_speed=AVERAGE_SPEED_KMH, service_minutes=SERVICE_MINUTES):
+        self.vehicles = vehicles
+        self.drops = drops
+        self.average_speed = average_speed
+        self.service_minutes = service_minutes
+        depots = [vehicle.warehouse.location if vehicle.warehouse else None for vehicle in vehicles]
+        located = [depot for depot in depots if depot is not None]
+        center = (np.mean([depot.x for depot in located]), np.mean([depot.y for depot in located])) if located else \
+            (np.mean([drop.location.x for drop in drops]), np.mean([drop.location.y for drop in drops]))
+        coordinates = [(depot.x, depot.y) if depot is not None else center for depot in depots] + [
+            (drop.location.x, drop.location.y) for drop in drops]
+        self.distances = haversine_matrix(coordinates)
+        for index, depot in enumerate(depots):
+            if depot is None:
+                self.distances[index, :] = self.distances[:, index] = 0
+        self.angles = np.arctan2([drop.location.y - center[1] for drop in drops],
+                                 [drop.location.x - center[0] for drop in drops])
+        self.items = np.array([loads[drop.id][0] for drop in drops], dtype=np.float64)
+        self.weights = np.array([float(loads[drop.id][1]) for drop in drops])
+        self.capacity_items = [np.inf if vehicle.capacity_items is None else vehicle.capacity_items
+                               for vehicle in vehicles]
+        self.capacity_weight = [np.inf if vehicle.capacity_weight is None else float(vehicle.capacity_weight)
+                                for vehicle in vehicles]
+        self.shift_minutes = [np.inf if vehicle.shift_minutes is None else vehicle.shift_minutes
+                              for vehicle in vehicles]
+
+    def node(self, drop_index):
+        return len(self.vehicles) + drop_index
+
+    def length(self, tour):
+        return get_route_length(np.array(tour), self.distances) if len(tour) > 1 else 0.0
+
+    def minutes(self, length, stops):
+        return get_route_minutes(length, stops, self.average_speed, self.service_minutes)
+
+    def sweep(self, sequence, fleet):
+        """
+        Fills the vehicles of `fleet` in turn with the drops of `sequence`, each drop
+        inserted where it lengthens the tour the least, moving to the next vehicle when
+        a drop would break the capacity or the shift of the current one.
+
+        Returns:
+        - A (tours, unassigned drop indexes, total length) tuple, one tour per vehicle
+          of the fleet, starting with its depot node.
+        """
+        tours = [[vehicle] for vehicle in fleet]
+        lengths = [0.0] * len(fleet)
+        items = [0.0] * len(fleet)
+        weights = [0.0] * len(fleet)
+        unassigned = []
+        current = 0
+        for drop in sequence:
+            node = self.node(drop)
+            while current < len(fleet):
+                vehicle = fleet[current]
+                tour = np.array(tours[current])
+                left, right = tour, np.roll(tour, -1)
+                extra = self.distances[left, node] + self.distances[node, right] - self.distances[left, right]
+                position = int(np.argmin(extra))
+                length = lengths[current] + float(extra[position])
+                if items[current] + self.items[drop] <= self.capacity_items[vehicle] and \
+                        weights[current] + self.weights[drop] <= self.capacity_weight[vehicle] and \
+                        self.minutes(length, len(tour)) <= self.shift_minutes[vehicle]:
+                    tours[current].insert(position + 1, node)
+                    lengths[current] = length
+                    items[current] += self.items[drop]
+                    weights[current] += self.weights[drop]
+                    break
+                if len(tour) == 1:
+                    # The drop does not fit an empty vehicle, keep the vehicle for the next drops.
+                    unassigned.append(drop)
+                    break
+                current += 1
+            else:
+                unassigned.append(drop)
+        return tours, unassigned, sum(lengths)
+
+    def solve(self, fleet_size, time_limit=1.0):
+        """
+        Sweeps the drops by angle around the depots from SWEEP_STARTS starting angles
+        over the first `fleet_size` vehicles, largest first, keeps the sweep leaving the
+        fewest drops unassigned in the shortest total distance, then shortens each of
+        its tours with 2-opt and Or-opt.
+
+        Returns:
+        - A (tours, unassigned drop indexes) tuple, tours as lists of drop indexes in
+          visiting order, aligned with the vehicles.
+        """
+        fleet = sorted(range(fleet_size), key=lambda vehicle: (
+            -self.capacity_items[vehicle], -self.capacity_weight[vehicle], -self.shift_minutes[vehicle], vehicle))
+        order = np.argsort(self.angles, kind='stable')
+        best = None
+        for start in sorted({len(order) * step // SWEEP_STARTS for step in range(SWEEP_STARTS)}):
+            tours, unassigned, length = self.sweep(np.roll(order, -start), fleet)
+            if best is None or (len(unassigned), length) < (len(best[1]), best[2]):
+                best = (tours, unassigned, length)
+
+        tours, unassigned, _length = best
+        routes = [[] for _vehicle in self.vehicles]
+        for vehicle, tour in zip(fleet, tours):
+            if len(tour) < 2:
+                continue
+            tour = np.array(tour)
+            route = solve_route(self.distances[np.ix_(tour, tour)], time_limit / len(self.vehicles))
+            routes[vehicle] = [int(tour[node]) - len(self.vehicles) for node in route]
+        return routes, unassigned
+
+
+def get_current_distance(problem):
+    """
+    Total length of the routes the pending drops are on now: per vehicle, its drops in
+    job and drop order from its depot. Drops of jobs without a vehicle are left out.
+    """
+    vehicle_index = {vehicle.id: index for index, vehicle in enumerate(problem.vehicles)}
+    tours = {}
+    for index, drop in enumerate(problem.drops):
+        if drop.job.vehicle_id not in vehicle_index:
+            continue
+        tours.setdefault(drop.job.vehicle_id, [vehicle_index[drop.job.vehicle_id]]).append(problem.node(index))
+    return sum(problem.length(tour) for tour in tours.values())
+
+
+def plan_dispatch(date, vehicle_ids=None, average_speed=AVERAGE_SPEED_KMH, service_minutes=SERVICE_MINUTES,
+                  time_limit=1.0):
+    """
+    Spreads the pending drops of a day over the vehicles that have a driver, within
+    each vehicle's item and weight capacity and shift length, with a sweep heuristic,
+    and orders each vehicle's drops into a short round trip from its warehouse.
+
+    Parameters:
+    - date: The job date.
+    - vehicle_ids: Optional vehicles to plan with, all vehicles with a driver by default.
+    - average_speed: Average driving speed in km/h, for the shift length.
+    - service_minutes: Minutes spent at each drop, for the shift length.
+    - time_limit: Seconds the route search may take.
+
+    Returns:
+    - A dict with the routes (vehicle, drops in visiting order, load, minutes and
+      distance), the drops left unassigned, the planned total distance and the total
+      distance of the current assignment, in km.
+    """
+    drops = get_pending_drops(date)
+    located = [drop for drop in drops if drop.location is not None]
+    vehicles = Vehicle.objects.filter(driver__isnull=False).select_related('driver', 'warehouse').order_by('id')
+    if vehicle_ids is not None:
+        vehicles = vehicles.filter(id__in=vehicle_ids)
+    vehicles = list(vehicles)
+    available = len(vehicles)
+    known = {vehicle.id for vehicle in vehicles}
+    # Includes retired (soft-deleted) vehicles still holding jobs of the day.
+    vehicles += Vehicle.all_objects.filter(id__in={drop.job.vehicle_id for drop in located} - known).select_related(
+        'driver', 'warehouse')
+    plan = {'date': date, 'routes': [], 'unassigned': [drop for drop in drops if drop.location is None],
+            'total_distance': 0.0, 'current_distance': 0.0}
+    if not located:
+        return plan
+
+    loads = get_drop_loads(located)
+    problem = DispatchProblem(vehicles, located, loads, average_speed, service_minutes)
+    # Vehicles after the available ones only carry the current assignment.
+    routes, unassigned = problem.solve(available, time_limit)
+
+    for index, route in enumerate(routes):
+        if not route:
+            continue
+        length = problem.length([index] + [problem.node(drop) for drop in route])
+        plan['routes'].append({
+            'vehicle': vehicles[index],
+            'drops': [located[drop] for drop in route],
+            'items': int(problem.items[route].sum()),
+            'weight': round(float(problem.weights[route].sum()), 2),
+            'minutes': round(problem.minutes(length, len(route)), 1),
+            'distance': round(length, 3),
+        })
+        plan['total_distance'] += length
+    plan['unassigned'] += [located[drop] for drop in unassigned]
+    plan['total_distance'] = round(plan['total_distance'], 3)
+    plan['current_distance'] = round(get_current_distance(problem), 3)
+    return plan
+
+
+def describe_dispatch_plan(plan):
+    """
+    Turns the result of plan_dispatch into id32s and names.
+    """
+    return {
+        'date': plan['date'],
+        'total_distance': plan['total_distance'],
+        'current_distance': plan['current_distance'],
+        'routes': [{
+            'vehicle_id32': route['vehicle'].id32,
+            'vehicle_name': route['vehicle'].name,
+            'driver_id32': route['vehicle'].driver.id32 if route['vehicle'].driver else None,
+            'driver_name': route['vehicle'].driver.name if route['vehicle'].driver else None,
+            'items': route['items'],
+            'weight': route['weight'],
+            'minutes': route['minutes'],
+            'distance': route['distance'],
+            'drops': [{'id32': drop.id32, 'location_name': drop.location_name, 'order': order}
+                      for order, drop in enumerate(route['drops'], start=1)],
+        } for route in plan['routes']],
+        'unassigned': [{'id32': drop.id32, 'location_name': drop.location_name} for drop in plan['unassigned']],
+    }
+
+
+@transaction.atomic
+def apply_dispatch_plan(plan, user=None):
+    """
+    Moves the planned drops to one waiting job per vehicle and trip of the day, reusing
+    the existing ones and creating the missing ones with one bulk insert. The drops
+    are written with one bulk update and the waiting jobs left without drops are
+    soft deleted one by one, so their delete audit and signals run. Jobs are created without their post_save signals, so
+    no drops are generated for them from the trip visits.
+
+    Returns:
+    - A dict with the number of jobs created and deleted and drops moved.
+    """
+    routes = [route for route in plan['routes'] if route['drops']]
+    drops = [drop for route in routes for drop in route['drops']]
+    old_job_ids = {drop.job_id for drop in drops}
+    jobs = {}
+    for job in Job.objects.filter(date=plan['date'], status=WAITING, vehicle_id__in={
+            route['vehicle'].id for route in routes}).order_by('id'):
+        jobs.setdefault((job.vehicle_id, job.trip_id), job)
+
+    new_jobs = {}
+    for route in routes:
+        vehicle = route['vehicle']
+        for drop in route['drops']:
+            key = (vehicle.id, drop.job.trip_id)
+            if key not in jobs and key not in new_jobs:
+                new_jobs[key] = Job(vehicle=vehicle, trip_id=drop.job.trip_id, date=plan['date'],
+                                    assigned_driver=vehicle.driver)
+    Job.objects.bulk_create_with_audit(new_jobs.values(), user)
+    jobs.update(new_jobs)
+
+    now = timezone.now()
+    for route in routes:
+        for order, drop in enumerate(route['drops'], start=1):
+            drop.job = jobs[(route['vehicle'].id, drop.job.trip_id)]
+            drop.order = order
+            drop.updated_by = user
+            drop.updated_at = now
+            drop.updated_at_timestamp = int(now.timestamp())
+    Drop.objects.bulk_update(drops, ['job', 'order', 'updated_by', 'updated_at', 'updated_at_timestamp'])
+
+    emptied = list(Job.objects.filter(id__in=old_job_ids, status=WAITING).exclude(
+        id__in=Drop.objects.filter(job_id__in=old_job_ids).values('job_id')))
+    for job in emptied:
+        job.delete(user)
+    return {'jobs_created': len(new_jobs), 'jobs_deleted': len(emptied), 'drops_moved': len(drops)}
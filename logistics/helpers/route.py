@@ -0,0 +1,202 @@
+import time
+import numpy as np
+from sales.models import CustomerVisit, TripCustomer
+from ..models import Drop
+
+EARTH_RADIUS_KM = 6371.0088
+IMPROVEMENT = 1e-9
+
+
+def haversine_matrix(coordinates):
+    """
+    Great-circle distances in kilometers between every pair of points.
+
+    Parameters:
+    - coordinates: Sequence of (longitude, latitude) pairs in degrees.
+
+    Returns:
+    - An (n x n) array of distances.
+    """
+    radians = np.radians(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+    longitude, latitude = radians[:, 0], radians[:, 1]
+    half_chord = np.sin((latitude[:, None] - latitude[None, :]) / 2) ** 2 + \
+        np.cos(latitude)[:, None] * np.cos(latitude)[None, :] * \
+        np.sin((longitude[:, None] - longitude[None, :]) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(half_chord, 0, 1)))
+
+
+def get_route_length(route, distances):
+    return float(distances[route, np.roll(route, -1)].sum())
+
+
+def nearest_neighbour(distances):
+    """
+    Builds a tour from node 0 by always driving to the nearest node not visited yet.
+    """
+    visited = np.zeros(len(distances), dtype=bool)
+    visited[0] = True
+    route = [0]
+    for _step in range(len(distances) - 1):
+        nearest = int(np.argmin(np.where(visited, np.inf, distances[route[-1]])))
+        visited[nearest] = True
+        route.append(nearest)
+    return np.array(route)
+
+
+def two_opt(route, distances, deadline):
+    """
+    Reverses the part of the tour between two edges whenever that shortens it. For
+    each first edge, every second edge is scored at once.
+
+    Returns:
+    - Whether the tour was shortened.
+    """
+    size = len(route)
+    improved = False
+    for i in range(1, size - 1):
+        if time.monotonic() > deadline:
+            break
+        before, first = route[i - 1], route[i]
+        last = route[i + 1:]
+        after = np.append(route[i + 2:], route[0])
+        delta = distances[before, last] + distances[first, after] - distances[before, first] - distances[last, after]
+        best = int(np.argmin(delta))
+        if delta[best] < -IMPROVEMENT:
+            j = i + 1 + best
+            route[i:j + 1] = route[i:j + 1][::-1]
+            improved = True
+    return improved
+
+
+def or_opt(route, distances, deadline, max_segment=3):
+    """
+    Moves runs of one to `max_segment` stops, reversed or not, to the place in the tour
+    where they cost the least, whenever that shortens it. Every place is scored at once.
+
+    Returns:
+    - Whether the tour was shortened.
+    """
+    size = len(route)
+    improved = False
+    for length in range(1, max_segment + 1):
+        i = 1
+        while i + length <= size:
+            if time.monotonic() > deadline:
+                return improved
+            head, tail = route[i], route[i + length - 1]
+            before, after = route[i - 1], route[(i + length) % size]
+            removal = distances[before, head] + distances[tail, after] - distances[before, after]
+            rest = np.concatenate([route[:i], route[i + length:]])
+            left, right = rest, np.roll(rest, -1)
+            forward = distances[left, head] + distances[tail, right] - distances[left, right]
+            backward = distances[left, tail] + distances[head, right] - distances[left, right]
+            best = int(np.argmin(np.minimum(forward, backward)))
+            if min(forward[best], backward[best]) < removal - IMPROVEMENT:
+                segment = route[i:i + length]
+                if backward[best] < forward[best]:
+                    segment = segment[::-1]
+                route[:] = np.concatenate([rest[:best + 1], segment, rest[best + 1:]])
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def solve_route(distances, time_limit=1.0):
+    """
+    Orders a closed tour starting and ending at node 0: nearest neighbour, then 2-opt
+    and Or-opt in turn until neither shortens the tour or `time_limit` seconds pass.
+
+    Returns:
+    - The nodes other than 0 in visiting order.
+    """
+    if len(distances) <= 2:
+        return list(range(1, len(distances)))
+    deadline = time.monotonic() + time_limit
+    route = nearest_neighbour(distances)
+    while time.monotonic() < deadline:
+        improved = two_opt(route, distances, deadline)
+        improved = or_opt(route, distances, deadline) or improved
+        if not improved:
+            break
+    return [int(node) for node in route[1:]]
+
+
+def get_route_order(locations, depot=None, time_limit=1.0):
+    """
+    Orders stops into the shortest round trip from the depot found within
+    `time_limit`. Without a depot the route may start and end at any stop. Stops
+    without a location keep their relative order after the others.
+
+    Parameters:
+    - locations: Point of each stop, or None.
+    - depot: Point the vehicle leaves from and returns to, e.g. its warehouse.
+
+    Returns:
+    - The stop indexes in visiting order.
+    """
+    located = [index for index, location in enumerate(locations) if location is not None]
+    coordinates = [(0, 0) if depot is None else (depot.x, depot.y)] + [
+        (locations[index].x, locations[index].y) for index in located]
+    distances = haversine_matrix(coordinates)
+    if depot is None:
+        # A depot at distance zero from every stop turns the round trip into an open path.
+        distances[0, :] = distances[:, 0] = 0
+    order = [located[node - 1] for node in solve_route(distances, time_limit)]
+    return order + [index for index, location in enumerate(locations) if location is None]
+
+
+def get_depot(vehicle):
+    warehouse = vehicle.warehouse if vehicle else None
+    return warehouse.location if warehouse else None
+
+
+def order_drops(job, drops):
+    """
+    Numbers unsaved drops of a job in route order from the job vehicle's warehouse.
+    """
+    for order, index in enumerate(get_route_order([drop.location for drop in drops], get_depot(job.vehicle))):
+        drops[index].order = order + 1
+    return drops
+
+
+def optimise_trip_route(trip, update_template=False, time_limit=1.0):
+    """
+    Reorders the customer visits of a trip into the shortest round trip from the
+    vehicle's warehouse, and the drops of its jobs to match. Each model is written
+    with one bulk update.
+
+    Parameters:
+    - trip: The Trip.
+    - update_template: Also reorder the customers of the trip template, the ones not
+      visited by the trip after the others.
+    - time_limit: Seconds the route search may take.
+
+    Returns:
+    - The CustomerVisit objects in their new order.
+    """
+    visits = list(CustomerVisit.objects.filter(trip=trip).select_related('customer').order_by('order', 'id'))
+    route = [visits[index] for index in get_route_order(
+        [visit.customer.location for visit in visits], get_depot(trip.vehicle), time_limit)]
+    changed = []
+    for order, visit in enumerate(route, start=1):
+        if visit.order != order:
+            visit.order = order
+            changed.append(visit)
+    CustomerVisit.objects.bulk_update(changed, ['order'])
+
+    visit_orders = {visit.id: visit.order for visit in route}
+    drops = list(Drop.objects.filter(job__trip=trip, sales_visit_id__in=visit_orders))
+    for drop in drops:
+        drop.order = visit_orders[drop.sales_visit_id]
+    Drop.objects.bulk_update(drops, ['order'])
+
+    if update_template:
+        customer_orders = {visit.customer_id: visit.order for visit in route}
+        customers = sorted(TripCustomer.objects.filter(template_id=trip.template_id), key=lambda customer: (
+            customer.customer_id not in customer_orders, customer_orders.get(customer.customer_id, 0),
+            customer.order))
+        for order, customer in enumerate(customers, start=1):
+            customer.order = order
+        TripCustomer.objects.bulk_update(customers, ['order'])
+    return route
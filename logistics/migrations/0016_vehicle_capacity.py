@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0015_alter_job_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='capacity_items',
+            field=models.PositiveIntegerField(blank=True, help_text='Enter the number of order item units the vehicle carries, leave empty for no limit', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='capacity_weight',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Enter the weight in kg the vehicle carries, leave empty for no limit', max_digits=19, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='shift_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Enter the minutes the vehicle may drive and serve drops in a day, leave empty for no limit', null=True),
+        ),
+    ]
@@ -25,6 +25,12 @@ class Vehicle(BaseModelGeneric):
         max_length=20, help_text=_("Enter the license plate"))
     warehouse = models.ForeignKey(
         Warehouse, blank=True, null=True, on_delete=models.SET_NULL)
+    capacity_items = models.PositiveIntegerField(blank=True, null=True, help_text=_(
+        "Enter the number of order item units the vehicle carries, leave empty for no limit"))
+    capacity_weight = models.DecimalField(blank=True, null=True, max_digits=19, decimal_places=2, help_text=_(
+        "Enter the weight in kg the vehicle carries, leave empty for no limit"))
+    shift_minutes = models.PositiveIntegerField(blank=True, null=True, help_text=_(
+        "Enter the minutes the vehicle may drive and serve drops in a day, leave empty for no limit"))
 
     def __str__(self):
         return _("Vehicle #{vehicle_id} - {vehicle_name} ({license_plate})").format(vehicle_id=self.id32, vehicle_name=self.name, license_plate=self.license_plate)
@@ -22,7 +22,8 @@ class VehicleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Vehicle
-        fields = ['id32', 'name', 'driver_id32', 'driver', 'license_plate', 'warehouse_id32', 'warehouse']
+        fields = ['id32', 'name', 'driver_id32', 'driver', 'license_plate', 'warehouse_id32', 'warehouse',
+                  'capacity_items', 'capacity_weight', 'shift_minutes']
         read_only_fields = ['id32', 'driver', 'warehouse']
 
     def to_representation(self, instance):
@@ -1,10 +1,15 @@
+import datetime
 from django_filters import rest_framework as django_filters
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from libs.pagination import CustomPagination
 from libs.filter import CreatedAtFilterMixin
+from ..helpers.dispatch import (AVERAGE_SPEED_KMH, SERVICE_MINUTES, apply_dispatch_plan, describe_dispatch_plan,
+                                plan_dispatch)
 from ..models import Vehicle, Driver, Job, Drop, STATUS_CHOICES
 from ..serializers import VehicleSerializer, DriverSerializer
 from ..serializers.job import JobDetailSerializer, JobListSerializer, DropDetailSerializer, DropUpdateSerializer
@@ -67,6 +72,45 @@ class JobViewSet(viewsets.ModelViewSet):
             return JobDetailSerializer
         return super().get_serializer_class()
 
+    def get_dispatch_plan(self, params):
+        try:
+            date = datetime.date.fromisoformat(params.get('date', ''))
+            average_speed = float(params.get('average_speed') or AVERAGE_SPEED_KMH)
+            service_minutes = float(params.get('service_minutes') or SERVICE_MINUTES)
+        except (TypeError, ValueError):
+            return None
+        vehicle_ids = None
+        if params.get('vehicle_id32s'):
+            vehicle_ids = Vehicle.objects.filter(id32__in=params['vehicle_id32s'].split(',')).values_list('id', flat=True)
+        return plan_dispatch(date, vehicle_ids, max(average_speed, 1), max(service_minutes, 0))
+
+    @action(detail=False, methods=['get'])
+    def dispatch_plan(self, request):
+        """
+        Spreads the pending drops of `date` over the vehicles with a driver (or
+        `vehicle_id32s`, comma-separated) within their capacity and shift, and compares
+        the planned total distance with the current assignment. The shift length uses
+        `average_speed` in km/h and `service_minutes` per drop.
+        """
+        plan = self.get_dispatch_plan(request.query_params)
+        if plan is None:
+            return Response({"error": _("date must be YYYY-MM-DD, average_speed and service_minutes numbers.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(describe_dispatch_plan(plan))
+
+    @action(detail=False, methods=['post'])
+    def apply_dispatch_plan(self, request):
+        """
+        Recomputes the dispatch plan with the same parameters as `dispatch_plan` and
+        moves the drops to the planned vehicles' jobs.
+        """
+        plan = self.get_dispatch_plan(request.data)
+        if plan is None:
+            return Response({"error": _("date must be YYYY-MM-DD, average_speed and service_minutes numbers.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = apply_dispatch_plan(plan, request.user)
+        return Response(dict(result, **describe_dispatch_plan(plan)))
+
 class DropViewSet(viewsets.GenericViewSet,
                   viewsets.mixins.RetrieveModelMixin,
                   viewsets.mixins.UpdateModelMixin):
@@ -0,0 +1,264 @@
+import math
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q, Sum
+from django.utils.translation import gettext_lazy as _
+from inventory.helpers.stock import get_stock_balances
+from inventory.helpers.unit import UnitTree
+from inventory.models import Product, StockMovement, Unit
+from purchasing.helpers.replenishment import get_last_po_items, get_suppliers
+from purchasing.models import PurchaseOrderItem, Supplier
+from ..models import BillOfMaterials, BOMComponent, BOMProduct, ProductionOrder
+
+
+def to_smallest_unit(quantity, unit_id, product, units):
+    """
+    Converts a quantity in unit_id to the product's smallest unit. Quantities whose unit
+    is not in the smallest unit's tree are returned unchanged.
+    """
+    if not product or not product.smallest_unit_id or not unit_id:
+        return Decimal(quantity)
+    conversion = units.conversion_to_ancestor(unit_id, product.smallest_unit_id)
+    return Decimal(quantity) * conversion if conversion is not None else Decimal(quantity)
+
+
+def load_bom_structure(units):
+    """
+    Loads every bill of materials with two queries.
+
+    A product made by several BOMs uses the first one, as the production order
+    serializer does. Quantities are converted to each product's smallest unit.
+
+    Returns:
+    - A dict mapping product id to {'bom_id', 'unit_id', 'output_quantity', 'components'},
+      where components is a list of (component product id, quantity per BOM batch).
+    """
+    bom_products = list(BOMProduct.objects.order_by('id').values_list(
+        'bom_id', 'item_id', 'quantity', 'unit_id'))
+    bom_components = list(BOMComponent.objects.order_by('id').values_list(
+        'bom_id', 'item_id', 'quantity', 'unit_id'))
+    product_ids = {row[1] for row in bom_products} | {row[1] for row in bom_components}
+    products = Product.objects.in_bulk(product_ids)
+
+    components = {}
+    for bom_id, item_id, quantity, unit_id in bom_components:
+        components.setdefault(bom_id, []).append(
+            (item_id, to_smallest_unit(quantity, unit_id, products.get(item_id), units)))
+
+    structure = {}
+    for bom_id, item_id, quantity, unit_id in bom_products:
+        if item_id in structure:
+            continue
+        structure[item_id] = {
+            'bom_id': bom_id,
+            'unit_id': unit_id,
+            'output_quantity': to_smallest_unit(quantity, unit_id, products.get(item_id), units),
+            'components': components.get(bom_id, []),
+        }
+    return structure
+
+
+def get_low_level_codes(product_ids, structure):
+    """
+    Computes the low-level code (deepest BOM level a product appears at) of every product
+    reachable from product_ids. Sub-trees already visited at the same or a deeper level
+    are not walked again.
+
+    Raises:
+    - ValidationError: When a BOM contains itself, directly or through its components.
+    """
+    codes = {}
+
+    def visit(product_id, level, path):
+        if product_id in path:
+            raise ValidationError(
+                {"bom": _("Bill of materials of product #{product_id} is recursive").format(product_id=product_id)})
+        if codes.get(product_id, -1) >= level:
+            return
+        codes[product_id] = level
+        bom = structure.get(product_id)
+        if not bom:
+            return
+        for component_id, _quantity in bom['components']:
+            visit(component_id, level + 1, path | {product_id})
+
+    for product_id in product_ids:
+        visit(product_id, 0, frozenset())
+    return codes
+
+
+def get_production_orders():
+    """
+    Splits production orders by progress.
+
+    Returns:
+    - A tuple of (unstarted, in_progress). Unstarted orders have no work order yet, so
+      their materials are still needed. In-progress orders have work orders that are not
+      all finished; their materials were moved already and their output is incoming.
+    """
+    orders = ProductionOrder.objects.annotate(
+        work_orders=Count('workorder', filter=Q(workorder__deleted_at__isnull=True)),
+        unfinished_work_orders=Count('workorder', filter=Q(
+            workorder__deleted_at__isnull=True, workorder__end_time__isnull=True)),
+    ).filter(Q(work_orders=0) | Q(unfinished_work_orders__gt=0))
+    unstarted, in_progress = [], []
+    for order in orders:
+        (unstarted if order.work_orders == 0 else in_progress).append(order)
+    return unstarted, in_progress
+
+
+def get_scheduled_receipts(in_progress_orders, structure, products, units):
+    """
+    Returns incoming quantity per product in its smallest unit: output of in-progress
+    production orders plus approved purchase order items that have not been put away.
+    """
+    receipts = {}
+    for order in in_progress_orders:
+        bom = structure.get(order.product_id)
+        quantity = to_smallest_unit(
+            order.quantity, bom['unit_id'] if bom else None, products.get(order.product_id), units)
+        receipts[order.product_id] = receipts.get(order.product_id, 0) + quantity
+
+    po_items = PurchaseOrderItem.objects.filter(
+        purchase_order__approved_at__isnull=False,
+    ).exclude(
+        purchase_order__stock_movement__status__in=[StockMovement.PUT, StockMovement.CANCELED],
+    ).values('product_id', 'unit_id').annotate(total=Sum('quantity')).order_by()
+    for row in po_items:
+        product = products.get(row['product_id'])
+        if not product:
+            continue
+        quantity = to_smallest_unit(row['total'], row['unit_id'], product, units)
+        receipts[row['product_id']] = receipts.get(row['product_id'], 0) + quantity
+    return receipts
+
+
+def run_mrp():
+    """
+    Runs material requirements planning for the whole plant in one batch.
+
+    Gross requirements of unstarted production orders are exploded through multi-level
+    BOMs, level by level in low-level code order, and netted against on-hand stock of all
+    warehouses and scheduled receipts. Net requirements of products with a BOM become
+    planned work orders in whole BOM batches; the components they consume are added to the
+    next levels. Net requirements of products without a BOM become purchase requirements.
+    Requirements are not time-phased; each line carries the earliest date it is needed.
+
+    Returns:
+    - A dict with 'planned_work_orders' and 'purchase_requirements' lists. Work order
+      quantities are in the BOM product unit, purchase quantities in the purchasing unit.
+    """
+    units = UnitTree()
+    structure = load_bom_structure(units)
+    unstarted, in_progress = get_production_orders()
+
+    codes = get_low_level_codes({order.product_id for order in unstarted}, structure)
+    product_ids = set(codes) | {order.product_id for order in in_progress}
+    products = Product.objects.in_bulk(product_ids)
+    balances, _products, _units = get_stock_balances(product_ids=product_ids)
+    on_hand = {}
+    for (_warehouse_id, product_id), quantity in balances.items():
+        on_hand[product_id] = on_hand.get(product_id, 0) + quantity
+    receipts = get_scheduled_receipts(in_progress, structure, products, units)
+
+    gross = {}
+    need_dates = {}
+    for order in unstarted:
+        bom = structure.get(order.product_id)
+        if not bom:
+            continue
+        quantity = to_smallest_unit(
+            order.quantity, bom['unit_id'], products.get(order.product_id), units)
+        gross[order.product_id] = gross.get(order.product_id, 0) + quantity
+        need_dates[order.product_id] = min(
+            need_dates.get(order.product_id, order.start_date), order.start_date)
+
+    planned_work_orders = []
+    purchase_requirements = []
+    for product_id in sorted(codes, key=lambda product_id: codes[product_id]):
+        requirement = gross.get(product_id, 0)
+        if requirement <= 0:
+            continue
+        available = on_hand.get(product_id, 0) + receipts.get(product_id, 0)
+        net = requirement - available
+        if net <= 0:
+            continue
+        product = products.get(product_id)
+        line = {
+            'product_id': product_id,
+            'product_name': product.name if product else None,
+            'level': codes[product_id],
+            'gross_requirement': requirement,
+            'on_hand': on_hand.get(product_id, 0),
+            'scheduled_receipts': receipts.get(product_id, 0),
+            'net_requirement': net,
+            'need_date': need_dates.get(product_id),
+        }
+        bom = structure.get(product_id)
+        if bom and bom['output_quantity'] > 0:
+            batches = math.ceil(net / bom['output_quantity'])
+            line.update({'bom_id': bom['bom_id'], 'unit_id': bom['unit_id'], 'batches': batches,
+                         'quantity': batches * bom['output_quantity'] / to_smallest_unit(
+                             1, bom['unit_id'], product, units)})
+            planned_work_orders.append(line)
+            for component_id, component_quantity in bom['components']:
+                gross[component_id] = gross.get(component_id, 0) + batches * component_quantity
+                if line['need_date']:
+                    need_dates[component_id] = min(
+                        need_dates.get(component_id, line['need_date']), line['need_date'])
+        else:
+            conversion = 1
+            if product and product.purchasing_unit_id:
+                conversion = units.conversion_to_ancestor(
+                    product.purchasing_unit_id, product.smallest_unit_id) or 1
+            line.update({'unit_id': product.purchasing_unit_id if product else None,
+                         'quantity': math.ceil(net / conversion)})
+            purchase_requirements.append(line)
+
+    purchase_product_ids = {line['product_id'] for line in purchase_requirements}
+    suppliers = get_suppliers(purchase_product_ids, get_last_po_items(purchase_product_ids))
+    for line in purchase_requirements:
+        line['supplier_id'] = suppliers.get(line['product_id'])
+
+    return {
+        'planned_work_orders': planned_work_orders,
+        'purchase_requirements': purchase_requirements,
+    }
+
+
+def serialize_mrp(result):
+    """
+    Returns the result of run_mrp with product, BOM, unit and supplier id32s and names
+    instead of primary keys, loading each model in bulk.
+    """
+    lines = result['planned_work_orders'] + result['purchase_requirements']
+    products = Product.objects.in_bulk({line['product_id'] for line in lines})
+    boms = BillOfMaterials.objects.in_bulk({line['bom_id'] for line in result['planned_work_orders']})
+    units = Unit.objects.in_bulk({line['unit_id'] for line in lines if line['unit_id']})
+    suppliers = Supplier.objects.in_bulk(
+        {line['supplier_id'] for line in result['purchase_requirements'] if line['supplier_id']})
+
+    def serialize_line(line):
+        product = products.get(line['product_id'])
+        unit = units.get(line['unit_id'])
+        serialized = {
+            'product_id32': product.id32 if product else None,
+            'product_name': line['product_name'],
+            'unit_id32': unit.id32 if unit else None,
+            'unit_symbol': unit.symbol if unit else None,
+        }
+        if 'bom_id' in line:
+            bom = boms.get(line['bom_id'])
+            serialized.update({'bom_id32': bom.id32 if bom else None, 'bom_name': bom.name if bom else None})
+        if 'supplier_id' in line:
+            supplier = suppliers.get(line['supplier_id'])
+            serialized.update({'supplier_id32': supplier.id32 if supplier else None,
+                               'supplier_name': supplier.name if supplier else None})
+        serialized.update({key: value for key, value in line.items() if key not in (
+            'product_id', 'product_name', 'bom_id', 'unit_id', 'supplier_id')})
+        return serialized
+
+    return {
+        'planned_work_orders': [serialize_line(line) for line in result['planned_work_orders']],
+        'purchase_requirements': [serialize_line(line) for line in result['purchase_requirements']],
+    }
@@ -0,0 +1,164 @@
+from decimal import Decimal, ROUND_CEILING
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils.translation import gettext_lazy as _
+from inventory.helpers.stock import get_warehouse_batches, plan_stock_explosion, save_stock_batches
+from inventory.helpers.unit import UnitTree
+from inventory.helpers.valuation import consume_cost_layers
+from inventory.models import Product, StockLedgerEntry, Unit
+from ..models import BOMComponent, BOMProduct
+
+
+def get_production_order_requirements(production_order):
+    """
+    Returns the components a production order consumes as (product_id, unit_id, quantity)
+    tuples: BOM component quantity times the production order quantity.
+    """
+    bom_product = BOMProduct.objects.filter(
+        item_id=production_order.product_id).order_by('id').first()
+    if not bom_product:
+        return []
+    quantity = production_order.quantity
+    return [
+        (component.item_id, component.unit_id, component.quantity * quantity)
+        for component in BOMComponent.objects.filter(bom_id=bom_product.bom_id)
+    ]
+
+
+def allocate_components(batches, requirements, units):
+    """
+    Takes the requirements out of the loaded batches in memory, breaking bigger units
+    down when the required unit runs short. Nothing is written.
+
+    Parameters:
+    - batches: Product id to WarehouseStock batches, from get_warehouse_batches.
+    - requirements: List of (product_id, unit_id, quantity).
+    - units: UnitTree used for the unit hierarchy and conversions.
+
+    Returns:
+    - A tuple of (touched, shortages). touched lists the batches to save, shortages lists
+      one dict per (product, unit) that could not be fully taken, with the required and
+      missing quantities in that unit.
+    """
+    touched = []
+    shortages = {}
+    for product_id, unit_id, quantity in requirements:
+        product_batches = batches.setdefault(product_id, [])
+        quantity_needed = int(Decimal(quantity).to_integral_value(rounding=ROUND_CEILING))
+        for step in plan_stock_explosion(product_batches, unit_id, quantity_needed, units):
+            touched += [step['source'], step['target']]
+        missing = quantity_needed
+        for stock in product_batches:
+            if missing <= 0:
+                break
+            if stock.unit_id != unit_id or stock.quantity <= 0:
+                continue
+            taken = min(missing, stock.quantity)
+            stock.quantity -= taken
+            missing -= taken
+            touched.append(stock)
+        if missing > 0:
+            shortage = shortages.setdefault((product_id, unit_id), {
+                'product_id': product_id, 'unit_id': unit_id, 'required': 0, 'missing': 0})
+            shortage['required'] += quantity_needed
+            shortage['missing'] += missing
+    return touched, list(shortages.values())
+
+
+def describe_shortages(shortages, warehouse):
+    """
+    Returns one translated message per shortage, loading product and unit names in bulk.
+    """
+    products = Product.objects.in_bulk({shortage['product_id'] for shortage in shortages})
+    unit_names = Unit.objects.in_bulk({shortage['unit_id'] for shortage in shortages})
+    return [
+        _("{product} is out of stock in {warehouse}: {required}{unit} needed, {missing}{unit} missing").format(
+            product=products.get(shortage['product_id']),
+            warehouse=warehouse,
+            required=shortage['required'],
+            missing=shortage['missing'],
+            unit=unit_names[shortage['unit_id']].symbol if shortage['unit_id'] in unit_names else '',
+        )
+        for shortage in shortages
+    ]
+
+
+def get_component_shortages(warehouse, requirements):
+    """
+    Dry-run of reserve_components: returns the shortage report without locking or
+    writing anything.
+    """
+    batches = get_warehouse_batches(
+        warehouse, {product_id for product_id, _unit_id, _quantity in requirements})
+    _touched, shortages = allocate_components(batches, requirements, UnitTree())
+    return shortages
+
+
+def serialize_shortages(shortages):
+    """
+    Returns the shortages with product and unit id32s and names instead of primary
+    keys, loading products and units in bulk.
+    """
+    products = Product.objects.in_bulk({shortage['product_id'] for shortage in shortages})
+    units = Unit.objects.in_bulk({shortage['unit_id'] for shortage in shortages})
+    serialized = []
+    for shortage in shortages:
+        product = products.get(shortage['product_id'])
+        unit = units.get(shortage['unit_id'])
+        serialized.append({
+            'product_id32': product.id32 if product else None,
+            'product_name': product.name if product else None,
+            'unit_id32': unit.id32 if unit else None,
+            'unit_symbol': unit.symbol if unit else None,
+            'required': shortage['required'],
+            'missing': shortage['missing'],
+        })
+    return serialized
+
+
+@transaction.atomic
+def reserve_components(warehouse, requirements, user=None, update_product_quantity=False, ref=None):
+    """
+    Validates and deducts all components from a work-center warehouse in one transaction.
+
+    All component batches are loaded and row-locked with one query and allocated in
+    memory, so a failure reports every missing component at once and nothing is written.
+    Otherwise all touched batches are written in bulk.
+
+    Parameters:
+    - warehouse: The work-center Warehouse instance.
+    - requirements: List of (product_id, unit_id, quantity).
+    - user: User recorded as updater of the stock.
+    - update_product_quantity: Also deduct Product.quantity, in the smallest unit.
+    - ref: Document recorded in the stock ledger, e.g. the ProductionTracking.
+
+    Returns:
+    - The list of touched WarehouseStock batches.
+
+    Raises:
+    - ValidationError: With one message per short component.
+    """
+    units = UnitTree()
+    batches = get_warehouse_batches(
+        warehouse, {product_id for product_id, _unit_id, _quantity in requirements}, lock=True)
+    touched, shortages = allocate_components(batches, requirements, units)
+    if shortages:
+        raise ValidationError(
+            {"component_items": describe_shortages(shortages, warehouse)})
+
+    save_stock_batches(touched, user, StockLedgerEntry.CONSUMPTION, ref)
+    consume_cost_layers(warehouse.id, [
+        (product_id, Decimal(quantity) * units.conversion_to_top_level(unit_id), ref)
+        for product_id, unit_id, quantity in requirements])
+    if update_product_quantity and requirements:
+        product_deltas = {}
+        for product_id, unit_id, quantity in requirements:
+            product_deltas[product_id] = product_deltas.get(product_id, 0) + \
+                Decimal(quantity) * units.conversion_to_top_level(unit_id)
+        Product.objects.filter(pk__in=product_deltas).update_with_audit(user, quantity=Case(
+            *[When(pk=product_id, then=F('quantity') - delta)
+              for product_id, delta in product_deltas.items()],
+            default=F('quantity'),
+        ))
+    return touched
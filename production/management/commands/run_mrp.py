@@ -0,0 +1,27 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from production.helpers.mrp import run_mrp, serialize_mrp
+
+
+class Command(BaseCommand):
+    help = 'Run material requirements planning over all open production orders and print planned work orders and purchase requirements.'
+
+    def handle(self, *args, **options):
+        try:
+            result = serialize_mrp(run_mrp())
+        except ValidationError as e:
+            raise CommandError(e.messages)
+
+        self.stdout.write('Planned work orders:')
+        for line in result['planned_work_orders']:
+            self.stdout.write(
+                '  level={level} product={product_name} quantity={quantity} batches={batches} '
+                'net={net_requirement} need_date={need_date}'.format(**line))
+        self.stdout.write('Purchase requirements:')
+        for line in result['purchase_requirements']:
+            self.stdout.write(
+                '  level={level} product={product_name} quantity={quantity} supplier={supplier_name} '
+                'net={net_requirement} need_date={need_date}'.format(**line))
+        self.stdout.write(self.style.SUCCESS(
+            '{0} planned work order(s), {1} purchase requirement(s)'.format(
+                len(result['planned_work_orders']), len(result['purchase_requirements']))))
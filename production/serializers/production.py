@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from inventory.models import Product, Warehouse
 from hr.models import Employee
 from ..models import ProductionOrder, WorkOrder, ProductionTracking, BOMComponent, BillOfMaterials, ProducedItem, ComponentItem
 from .mixins import ComponentMixin
+from ..helpers.reservation import reserve_components
 
 class ProductionOrderSerializer(serializers.ModelSerializer):
     components = serializers.SerializerMethodField()
@@ -49,7 +51,8 @@ class WorkOrderSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            return super().create(validated_data)
+            with transaction.atomic():
+                return super().create(validated_data)
         except ValidationError as e:
             raise serializers.ValidationError(e.message_dict)
 
@@ -102,14 +105,24 @@ class ProductionTrackingSerializer(serializers.ModelSerializer):
         # Pop related data from validated_data
         produced_items = validated_data.pop('produceditem_set', [])
         component_items = validated_data.pop('componentitem_set', [])
-        # Create the ProductionTracking instance
-        production = ProductionTracking.objects.create(**validated_data)
-
-        # Create related BOMProduct and BOMComponent instances
-        for item in produced_items:
-            ProducedItem.objects.create(production=production, **item)
-        for item in component_items:
-            ComponentItem.objects.create(production=production, **item)
+        try:
+            with transaction.atomic():
+                # Create the ProductionTracking instance
+                production = ProductionTracking.objects.create(**validated_data)
+
+                # Reserve all component stock at once, then create the related items
+                components = [ComponentItem(production=production, **item) for item in component_items]
+                reserve_components(
+                    production.work_center_warehouse,
+                    [(component.item_id, component.unit_id, component.quantity) for component in components],
+                    ref=production)
+                for item in produced_items:
+                    ProducedItem.objects.create(production=production, **item)
+                for component in components:
+                    component.is_reserved = True
+                    component.save()
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
 
         return production
 
@@ -6,9 +6,11 @@ from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
-from inventory.models import StockMovement, Warehouse, WarehouseStock, StockMovementItem
+from inventory.helpers.stock_movement import add_stock
+from inventory.models import StockLedgerEntry, StockMovement, Warehouse, WarehouseStock, StockMovementItem
 from inventory.serializers import warehouse
 from ..models import *
+from ..helpers.reservation import get_production_order_requirements, reserve_components
 
 
 @receiver(pre_save, sender=ProductionOrder)
@@ -16,8 +18,8 @@ def validate_production_order(sender, instance, **kwargs):
     product = instance.product
 
     # Check if the product has a BillOfMaterials
-    bom_product = BOMProduct.objects.filter(product=product)
-    bom = bom_product.first().bom
+    bom_product = BOMProduct.objects.filter(item=product).order_by('id').first()
+    bom = bom_product.bom if bom_product else None
     if not bom:
         raise ValidationError(
             {"product": _("Product must have a BillOfMaterials to create a ProductionOrder")})
@@ -28,57 +30,21 @@ def validate_production_order(sender, instance, **kwargs):
             "Product must have at least one BOMComponent to create a ProductionOrder")})
 
 
-def get_work_order_component_quantity(component, work_order):
-    # Calculate the required quantity based on the BOM and work order quantity
-    return component.quantity * work_order.production_order.quantity
-
-
-def get_stock(warehouse, component):
-    try:
-        return WarehouseStock.objects.get(warehouse=warehouse, product=component.component)
-    except WarehouseStock.DoesNotExist:
-        raise ValidationError({"work_center_warehouse": _(
-            f'Warehouse stock has not been set for this component (#{component.component})')})
-
-
-@receiver(post_save, sender=WorkOrder)
-def move_materials_to_workcenter(sender, instance, created, **kwargs):
-    if created:
-        # Fetch the BOM components for the associated product of the production order
-        bom_product = BOMProduct.objects.filter(
-            product=instance.production_order.product)
-        bom = bom_product.first().bom
-        bom_components = BOMComponent.objects.filter(bom=bom)
-
-        # Iterate over the BOM components and deduct stocks
-        for component in bom_components:
-            quantity = get_work_order_component_quantity(component, instance)
-            product = component.component
-            product.quantity -= quantity
-            product.updated_by = instance.created_by
-            product.save()
-
-            stock = get_stock(instance.work_center_warehouse, component)
-            stock.quantity -= quantity
-            stock.updated_by = instance.created_by
-            stock.save()
-
-
 @receiver(pre_save, sender=WorkOrder)
 def check_workorder_before_started(sender, instance, **kwargs):
+    """
+    Reserve every BOM component of a new work order from the work center warehouse,
+    in one transaction, or reject it with the list of all missing components.
+    """
     if not instance.pk:
-        product = instance.production_order.product
-        warehouse = instance.work_center_warehouse
-        bom_product = BOMProduct.objects.filter(product=product)
-        bom = bom_product.first().bom
-        bom_components = BOMComponent.objects.filter(bom=bom)
-        # Iterate over the BOM components and check for stocks
-        for component in bom_components:
-            quantity = get_work_order_component_quantity(component, instance)
-            stock = get_stock(warehouse, component)
-            if stock.quantity < quantity:
-                raise ValidationError({"product": _(
-                    f'Stock {component.component} is lower than quantity needed to produce {product}')})
+        if not instance.work_center_warehouse_id:
+            raise ValidationError({"work_center_warehouse": _(
+                'Work center warehouse is required to reserve the components')})
+        reserve_components(
+            instance.work_center_warehouse,
+            get_production_order_requirements(instance.production_order),
+            user=instance._current_user,
+            update_product_quantity=True)
 
 
 @receiver(pre_save, sender=ProductionTracking)
@@ -110,35 +76,17 @@ def set_tracking_time(sender, instance, **kwargs):
 
 @receiver(pre_save, sender=ComponentItem)
 def check_component_stock(sender, instance, **kwargs):
-    stock_qs = WarehouseStock.objects.filter(
-        warehouse=instance.production.work_center_warehouse,
-        product=instance.item,
-        unit=instance.unit)
-    stocks = stock_qs.values(
-        'product__name', 'unit__symbol'
-    ).annotate(total_quantity=models.Sum('quantity'))
-    if not stocks.exists():
-        instance.production.delete()
-        raise ValidationError({"component_items": _(
-            f'Warehouse stock has not been set for this (#{instance.item}) & (#{instance.production.work_center_warehouse})')})
-    if stocks[0].get('total_quantity') < instance.quantity:
-        instance.production.delete()
-        raise ValidationError({"component_items": _(
-            f'This product (#{instance.item}) is out of stock')})
-    instance.stock_qs = stock_qs
-
-
-@receiver(post_save, sender=ComponentItem)
-def deduct_component_stock(sender, instance, created, **kwargs):
-    if created:
-        quantity_remaining = instance.quantity
-        for stock in instance.stock_qs:
-            quantity = quantity_remaining if quantity_remaining <= stock.quantity else stock.quantity
-            stock.quantity -= quantity
-            stock.save()
-            quantity_remaining -= quantity
-            if quantity_remaining <= 0:
-                break
+    """
+    Reserve the component stock of a new ComponentItem. Items created through
+    ProductionTrackingSerializer are reserved together beforehand and flagged with
+    `is_reserved`.
+    """
+    if instance.pk or getattr(instance, 'is_reserved', False):
+        return
+    reserve_components(
+        instance.production.work_center_warehouse,
+        [(instance.item_id, instance.unit_id, instance.quantity)],
+        user=instance._current_user)
 
 
 @receiver(post_save, sender=ProducedItem)
@@ -148,8 +96,7 @@ def add_produced_item_stock(sender, instance, created, **kwargs):
         product=instance.item,
         unit=instance.unit,
         expire_date=instance.expire_date)
-    stock.quantity += instance.quantity
-    stock.save()
+    add_stock(stock, instance.quantity, StockLedgerEntry.PRODUCTION, instance)
 
 
 @receiver(post_save, sender=ProductionTracking)
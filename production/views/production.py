@@ -1,10 +1,17 @@
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
 from django_filters import rest_framework as django_filters
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from libs.pagination import CustomPagination
 from libs.filter import CreatedAtFilterMixin
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 from ..models import ProductionOrder, WorkOrder, ProductionTracking
 from ..serializers.production import ProductionOrderSerializer, WorkOrderSerializer, ProductionTrackingSerializer
+from ..helpers.mrp import run_mrp, serialize_mrp
+from ..helpers.reservation import get_component_shortages, get_production_order_requirements, serialize_shortages
+from inventory.models import Warehouse
 
 class ProductionOrderViewSet(viewsets.ModelViewSet):
     queryset = ProductionOrder.objects.all()
@@ -16,6 +23,44 @@ class ProductionOrderViewSet(viewsets.ModelViewSet):
     search_fields = ['product__name']
     lookup_field = 'id32'
 
+    @action(detail=False, methods=['get'])
+    def mrp(self, request):
+        """
+        Run MRP over all open production orders and return planned work orders and
+        purchase requirements.
+        """
+        try:
+            result = run_mrp()
+        except ValidationError as e:
+            return Response({'error': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serialize_mrp(result))
+
+    @action(detail=True, methods=['get'])
+    def component_availability(self, request, id32=None):
+        """
+        Report every component of this production order that is short in the given
+        work center warehouse (?warehouse=<id32>), without reserving anything. Without
+        the parameter, the warehouse of the latest work order is used.
+        """
+        production_order = self.get_object()
+        warehouse_id32 = request.query_params.get('warehouse')
+        if warehouse_id32:
+            warehouse = Warehouse.objects.filter(id32=warehouse_id32).first()
+        else:
+            work_order = WorkOrder.objects.filter(
+                production_order=production_order, work_center_warehouse__isnull=False
+            ).select_related('work_center_warehouse').order_by('-created_at').first()
+            warehouse = work_order.work_center_warehouse if work_order else None
+        if not warehouse:
+            return Response({'error': _('A valid warehouse id32 is required.')}, status=status.HTTP_400_BAD_REQUEST)
+        shortages = get_component_shortages(
+            warehouse, get_production_order_requirements(production_order))
+        return Response({
+            'warehouse_id32': warehouse.id32,
+            'available': not shortages,
+            'shortages': serialize_shortages(shortages),
+        })
+
 class WorkOrderViewSet(viewsets.ModelViewSet):
     queryset = WorkOrder.objects.all()
     serializer_class = WorkOrderSerializer
@@ -0,0 +1,28 @@
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from ..models import PurchaseOrder, PurchaseOrderItem
+
+
+def recalculate_purchase_order_totals(purchase_order_ids):
+    """
+    Recomputes the stored subtotal and total of purchase orders from their items
+    with a single UPDATE statement.
+
+    Parameters:
+    - purchase_order_ids: Primary keys of the PurchaseOrder objects to recompute.
+    """
+    purchase_order_ids = list(purchase_order_ids)
+    if not purchase_order_ids:
+        return
+    amount = DecimalField(max_digits=19, decimal_places=2)
+
+    def item_subtotal():
+        items = PurchaseOrderItem.objects.filter(purchase_order=OuterRef('pk')).values(
+            'purchase_order').annotate(
+            amount=Sum(F('po_price') * F('quantity'), output_field=amount)).values('amount')
+        return Coalesce(Subquery(items), Value(0), output_field=amount)
+
+    PurchaseOrder.all_objects.filter(pk__in=purchase_order_ids).update(
+        subtotal=item_subtotal(),
+        total=item_subtotal() - F('discount_amount') + F('tax_amount'),
+    )
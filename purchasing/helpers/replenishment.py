@@ -0,0 +1,197 @@
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+from inventory.helpers.stock import get_stock_balances
+from inventory.helpers.unit import UnitTree
+from inventory.models import Product
+from ..models import PurchaseOrder, PurchaseOrderItem, SupplierProduct
+from .purchase_order import recalculate_purchase_order_totals
+
+
+def get_last_po_items(product_ids):
+    """
+    Returns the most recent PurchaseOrderItem values per product, keyed by product id.
+    """
+    items = PurchaseOrderItem.objects.filter(product_id__in=product_ids).order_by(
+        'product_id', '-id').distinct('product_id').values(
+        'product_id', 'quantity', 'po_price', 'actual_price', 'purchase_order__supplier_id')
+    return {item['product_id']: item for item in items}
+
+
+def get_suppliers(product_ids, last_po_items):
+    """
+    Resolves the supplier for many products at once. The priority is the product's
+    default supplier, then the supplier of the last purchase order item for the product,
+    then the first SupplierProduct registered for the product.
+
+    Parameters:
+    - product_ids: The product ids to find a supplier for.
+    - last_po_items: Mapping returned by get_last_po_items.
+
+    Returns:
+    - A dict mapping product id to supplier id. Products without a supplier are omitted.
+    """
+    default_suppliers = {}
+    fallback_suppliers = {}
+    supplier_products = SupplierProduct.objects.filter(
+        product_id__in=product_ids).order_by('-id').values_list(
+        'product_id', 'supplier_id', 'is_default_supplier')
+    for product_id, supplier_id, is_default in supplier_products:
+        if is_default:
+            default_suppliers.setdefault(product_id, supplier_id)
+        # Keeps overwriting so the oldest link wins, like `.last()` on a '-id' ordering.
+        fallback_suppliers[product_id] = supplier_id
+
+    suppliers = {}
+    for product_id in product_ids:
+        last_po_item = last_po_items.get(product_id)
+        supplier_id = default_suppliers.get(product_id) \
+            or (last_po_item and last_po_item['purchase_order__supplier_id']) \
+            or fallback_suppliers.get(product_id)
+        if supplier_id:
+            suppliers[product_id] = supplier_id
+    return suppliers
+
+
+def plan_replenishment(warehouse_ids=None):
+    """
+    Computes which products need to be reordered, in one pass over the stock balances.
+
+    A product is reordered for a warehouse when its on-hand quantity is at or below
+    `minimum_quantity` purchasing units. The purchase quantity and price follow the last
+    purchase order item for the product, falling back to `minimum_quantity` and 0.
+
+    Parameters:
+    - warehouse_ids: Optional list of warehouse ids to limit the plan to.
+
+    Returns:
+    - A list of dicts, one per (supplier, warehouse, product) line to order.
+    """
+    balances, products, units = get_stock_balances(warehouse_ids)
+
+    needs = []
+    for (warehouse_id, product_id), quantity in balances.items():
+        product = products[product_id]
+        if not product.purchasing_unit_id:
+            continue
+        conversion = units.conversion_to_ancestor(
+            product.purchasing_unit_id, product.smallest_unit_id)
+        if conversion is None:
+            continue
+        threshold = product.minimum_quantity * conversion
+        if quantity <= threshold:
+            needs.append((warehouse_id, product_id, quantity, threshold))
+
+    product_ids = {product_id for _, product_id, _, _ in needs}
+    last_po_items = get_last_po_items(product_ids)
+    suppliers = get_suppliers(product_ids, last_po_items)
+
+    plan = []
+    for warehouse_id, product_id, quantity, threshold in needs:
+        supplier_id = suppliers.get(product_id)
+        last_po_item = last_po_items.get(product_id)
+        product = products[product_id]
+        plan.append({
+            'supplier_id': supplier_id,
+            'warehouse_id': warehouse_id,
+            'product_id': product_id,
+            'product_name': product.name,
+            'unit_id': product.purchasing_unit_id,
+            'stock_quantity': quantity,
+            'threshold': threshold,
+            'purchase_quantity': last_po_item['quantity'] if last_po_item else product.minimum_quantity,
+            'po_price': (last_po_item['actual_price'] or last_po_item['po_price']) if last_po_item else 0,
+        })
+    return plan
+
+
+@transaction.atomic
+def apply_replenishment_plan(plan, user):
+    """
+    Upserts draft purchase orders and their items for a plan from plan_replenishment.
+
+    Drafts are matched on (supplier, destination warehouse) among unapproved purchase
+    orders. Existing draft items are set to the planned quantity and price, so running
+    the planner twice does not double the order. Product.quantity is adjusted the same
+    way the PurchaseOrderItem signals would, since bulk writes do not send signals.
+
+    Parameters:
+    - plan: The list returned by plan_replenishment.
+    - user: The user recorded as creator of the new purchase orders and items.
+
+    Returns:
+    - A dict with the number of purchase orders and items created and updated.
+    """
+    lines = [line for line in plan if line['supplier_id']]
+    result = {'purchase_orders_created': 0, 'items_created': 0, 'items_updated': 0}
+    if not lines:
+        return result
+
+    keys = {(line['supplier_id'], line['warehouse_id']) for line in lines}
+    drafts = {}
+    for po in PurchaseOrder.objects.filter(
+            approved_at__isnull=True,
+            supplier_id__in={supplier_id for supplier_id, _ in keys},
+            destination_warehouse_id__in={warehouse_id for _, warehouse_id in keys}):
+        drafts.setdefault((po.supplier_id, po.destination_warehouse_id), po)
+
+    today = timezone.now().date()
+    new_pos = [
+        PurchaseOrder(supplier_id=supplier_id, destination_warehouse_id=warehouse_id, order_date=today)
+        for supplier_id, warehouse_id in keys if (supplier_id, warehouse_id) not in drafts
+    ]
+    for po in PurchaseOrder.objects.bulk_create_with_audit(new_pos, user):
+        drafts[(po.supplier_id, po.destination_warehouse_id)] = po
+    result['purchase_orders_created'] = len(new_pos)
+
+    existing_items = {}
+    for item in PurchaseOrderItem.objects.filter(
+            purchase_order__in=drafts.values(),
+            product_id__in={line['product_id'] for line in lines}):
+        existing_items.setdefault((item.purchase_order_id, item.product_id), item)
+
+    units = UnitTree()
+    product_deltas = {}
+    new_items = []
+    changed_items = []
+    for line in lines:
+        po = drafts[(line['supplier_id'], line['warehouse_id'])]
+        item = existing_items.get((po.id, line['product_id']))
+        quantity = line['purchase_quantity']
+        if item:
+            delta = quantity - item.quantity
+            item.quantity = quantity
+            item.po_price = line['po_price']
+            item.unit_id = line['unit_id']
+            changed_items.append(item)
+        else:
+            delta = quantity
+            item = PurchaseOrderItem(
+                purchase_order=po,
+                product_id=line['product_id'],
+                unit_id=line['unit_id'],
+                quantity=quantity,
+                po_price=line['po_price'],
+            )
+            new_items.append(item)
+        if delta:
+            product_deltas[line['product_id']] = product_deltas.get(line['product_id'], 0) + \
+                delta * units.conversion_to_top_level(line['unit_id'])
+
+    PurchaseOrderItem.objects.bulk_create_with_audit(new_items, user)
+    if changed_items:
+        for item in changed_items:
+            item.updated_by = user
+        PurchaseOrderItem.objects.bulk_update(
+            changed_items, ['quantity', 'po_price', 'unit', 'updated_by'])
+    result['items_created'] = len(new_items)
+    result['items_updated'] = len(changed_items)
+    recalculate_purchase_order_totals(po.pk for po in drafts.values())
+
+    if product_deltas:
+        Product.objects.filter(pk__in=product_deltas).update_with_audit(quantity=Case(
+            *[When(pk=product_id, then=F('quantity') + delta)
+              for product_id, delta in product_deltas.items()],
+            default=F('quantity'),
+        ))
+    return result
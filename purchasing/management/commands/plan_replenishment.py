@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Warehouse
+from purchasing.helpers.replenishment import plan_replenishment, apply_replenishment_plan
+
+
+class Command(BaseCommand):
+    help = 'Plan replenishment for stock at or below minimum quantity and upsert draft purchase orders. Meant to run nightly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only print the plan, do not create or update purchase orders')
+        parser.add_argument('--warehouse', action='append', default=[],
+                            help='Limit the plan to a warehouse id32 (repeatable)')
+        parser.add_argument('--username',
+                            help='User recorded as creator of the draft purchase orders')
+
+    def handle(self, *args, **options):
+        warehouse_ids = None
+        if options['warehouse']:
+            warehouse_ids = list(Warehouse.objects.filter(
+                id32__in=options['warehouse']).values_list('id', flat=True))
+            if len(warehouse_ids) != len(set(options['warehouse'])):
+                raise CommandError('One or more warehouses do not exist')
+
+        plan = plan_replenishment(warehouse_ids)
+        for line in plan:
+            self.stdout.write(
+                'warehouse={warehouse_id} supplier={supplier_id} product={product_name} '
+                'stock={stock_quantity} threshold={threshold} order={purchase_quantity} '
+                'price={po_price}'.format(**line))
+        unsupplied = sum(1 for line in plan if not line['supplier_id'])
+        self.stdout.write(f'{len(plan)} line(s) planned, {unsupplied} without supplier')
+
+        if options['dry_run']:
+            return
+
+        user = None
+        if options['username']:
+            try:
+                user = get_user_model().objects.get(username=options['username'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['username']} does not exist")
+        else:
+            user = get_user_model().objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('Provide --username to record as purchase order creator')
+
+        result = apply_replenishment_plan(plan, user)
+        self.stdout.write(self.style.SUCCESS(
+            '{purchase_orders_created} purchase order(s) created, {items_created} item(s) created, '
+            '{items_updated} item(s) updated'.format(**result)))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:15
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_purchase_order_totals(apps, schema_editor):
+    PurchaseOrder = apps.get_model('purchasing', 'PurchaseOrder')
+    PurchaseOrderItem = apps.get_model('purchasing', 'PurchaseOrderItem')
+    amount = DecimalField(max_digits=19, decimal_places=2)
+
+    item_subtotal = PurchaseOrderItem.objects.filter(
+        purchase_order=OuterRef('pk'), deleted_at__isnull=True).values('purchase_order').annotate(
+        amount=Sum(F('po_price') * F('quantity'), output_field=amount)).values('amount')
+    PurchaseOrder.objects.update(subtotal=Coalesce(Subquery(item_subtotal), Value(0), output_field=amount))
+    PurchaseOrder.objects.update(total=F('subtotal') - F('discount_amount') + F('tax_amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchasing', '0010_purchaseorder_discount_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Sum of the item subtotals, kept by recalculate_purchase_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Subtotal after discount plus tax, kept by recalculate_purchase_order_totals', max_digits=19),
+        ),
+        migrations.RunPython(backfill_purchase_order_totals, migrations.RunPython.noop),
+    ]
@@ -112,24 +112,27 @@ class PurchaseOrder(BaseModelGeneric):
         default=0,
         help_text=_("Enter the tax amount for purchase order")
     )
+    subtotal = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text=_("Sum of the item subtotals, kept by recalculate_purchase_order_totals")
+    )
+    total = models.DecimalField(
+        max_digits=19,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text=_("Subtotal after discount plus tax, kept by recalculate_purchase_order_totals")
+    )
 
     def __str__(self):
         return _("Purchase Order #{id32}").format(id32=self.id32)
     
-    @property
-    def subtotal(self):
-        amount = 0
-        for item in self.purchaseorderitem_set.all():
-            amount += item.subtotal
-        return amount
-    
     @property
     def subtotal_after_discount(self):
         return self.subtotal - self.discount_amount
-    
-    @property
-    def total(self):
-        return self.subtotal_after_discount + self.tax_amount
 
     class Meta:
         ordering = ['-id']
@@ -5,6 +5,7 @@ from rest_framework import serializers
 from libs.utils import validate_file_by_id32, handle_file_fields
 from inventory.models import Product, Warehouse, Unit
 from ..models import PurchaseOrder, PurchaseOrderItem, Supplier, InvalidPOItem
+from ..helpers.purchase_order import recalculate_purchase_order_totals
 
 # PurchaseOrderItem Serializer
 
@@ -149,4 +150,7 @@ class PurchaseOrderDetailSerializer(serializers.ModelSerializer):
                 if item_id not in updated_ids:
                     PurchaseOrderItem.objects.filter(id=item_id).delete()
 
+            recalculate_purchase_order_totals([instance.pk])
+            instance.refresh_from_db(fields=['subtotal', 'total'])
+
         return instance
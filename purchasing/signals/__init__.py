@@ -1,14 +1,15 @@
 
 from math import prod
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.db import models
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
-from inventory.models import StockMovement, Product, StockMovementItem, Warehouse, WarehouseStock
+from inventory.models import StockMovement, Product, StockMovementItem, Warehouse
 from inventory.serializers import warehouse
 from purchasing.serializers import purchase_order
 from ..models import SupplierProduct, PurchaseOrderItem, Supplier, PurchaseOrder
+from ..helpers.purchase_order import recalculate_purchase_order_totals
 
 
 @receiver(pre_save, sender=SupplierProduct)
@@ -34,7 +35,7 @@ def update_product_quantity(sender, instance, **kwargs):
         quantity_diff = instance.quantity - old_quantity
         purchasing_unit = instance.product.purchasing_unit
         product_quantity = quantity_diff * purchasing_unit.conversion_to_top_level()
-        Product.objects.filter(pk=instance.product.pk).update(quantity=models.F(
+        Product.objects.filter(pk=instance.product.pk).update_with_audit(quantity=models.F(
             'quantity') + product_quantity, updated_by_id=instance.updated_by_id)
         if quantity_diff != 0 and instance.purchase_order.stock_movement:
             item_price = instance.actual_price if instance.actual_price else instance.po_price
@@ -110,118 +111,18 @@ def create_stock_movement_item(sender, instance, created, **kwargs):
 
 @receiver(pre_delete, sender=PurchaseOrderItem)
 def restore_product_quantity(sender, instance, **kwargs):
-    Product.objects.filter(pk=instance.product.pk).update(
+    Product.objects.filter(pk=instance.product.pk).update_with_audit(
         quantity=models.F('quantity') - instance.quantity)
 
 
-@receiver(post_save, sender=WarehouseStock)
-def create_auto_po(sender, instance, created, **kwargs):
-    """
-    Automatically creates a purchase order (PO) when a WarehouseStock instance is saved, based on the stock quantity 
-    falling below the product's minimum quantity threshold. It considers the product's purchasing unit and supplier 
-    preferences to generate the PO.
-
-    Parameters:
-    - sender: The model class that sent the signal.
-    - instance: The actual instance being saved.
-    - created: Boolean; True if a new record was created.
-    - **kwargs: Keyword arguments.
-    """
-    product = instance.product
-    warehouse_stocks = WarehouseStock.objects.filter(
-        product=product,
-        warehouse=instance.warehouse,
-        quantity__gt=0)
-    
-    if not product.smallest_unit:
-        return
-
-    qty = 0
-    for stock in warehouse_stocks:
-        qty += stock.quantity * \
-            stock.unit.conversion_to_ancestor(product.smallest_unit.id)
-
-    if qty <= product.minimum_quantity * product.purchasing_unit.conversion_to_ancestor(product.smallest_unit.id):
-
-        # Determine purchase quantity and supplier
-        last_po_item = PurchaseOrderItem.objects.filter(
-            product=product).order_by('-id').first()
-        purchase_quantity = last_po_item.quantity if last_po_item else product.minimum_quantity
-        supplier = get_supplier(product, last_po_item)
-
-        if supplier:
-            po = get_or_create_purchase_order(supplier, instance.warehouse)
-            po_price = last_po_item.actual_price if last_po_item and last_po_item.actual_price else last_po_item.po_price if last_po_item else 0
-            create_or_update_po_item(po, product, purchase_quantity, po_price)
-
-
-def get_supplier(product, last_po_item):
-    """
-    Determines the supplier for a new purchase order. It prioritizes the default supplier for the product, falls back 
-    to the supplier of the last purchase order item for the product, and finally selects the most recent supplier for 
-    the product if no default or last PO item supplier is available.
-
-    Parameters:
-    - product: The product instance to find a supplier for.
-    - last_po_item: The last purchase order item instance for the product, if any.
-
-    Returns:
-    - The chosen supplier instance or None if no suitable supplier is found.
-    """
-    default_supplier = SupplierProduct.objects.filter(
-        product=product, is_default_supplier=True).first()
-    if default_supplier:
-        return default_supplier.supplier
-    if last_po_item:
-        return last_po_item.purchase_order.supplier
-    return SupplierProduct.objects.filter(product=product).last().supplier if SupplierProduct.objects.filter(product=product).exists() else None
-
-
-def get_or_create_purchase_order(supplier, warehouse):
-    """
-    Retrieves an existing unapproved purchase order for the given supplier and warehouse or creates a new one if no 
-    existing order matches the criteria.
-
-    Parameters:
-    - supplier: The supplier instance for the purchase order.
-    - warehouse: The warehouse instance where the stock is kept.
-
-    Returns:
-    - A purchase order instance.
-    """
-    po = PurchaseOrder.objects.filter(
-        approved_at__isnull=True,
-        supplier=supplier,
-        destination_warehouse=warehouse
-    ).first()
-    if not po:
-        po = PurchaseOrder.objects.create(
-            supplier=supplier,
-            order_date=timezone.now(),
-            destination_warehouse=warehouse,
-        )
-    return po
-
-
-def create_or_update_po_item(purchase_order, product, quantity, price):
-    """
-    Creates a new purchase order item linked to a specific purchase order and product, or updates an existing item 
-    if one already exists for the given purchase order and product. It sets the quantity and purchase price based on 
-    the provided arguments.
-
-    Parameters:
-    - purchase_order: The purchase order instance the item belongs to.
-    - product: The product instance for the purchase order item.
-    - quantity: The quantity of the product to order.
-    - price: The purchase price for the product.
-    """
-    po_item, created = PurchaseOrderItem.objects.get_or_create(
-        purchase_order=purchase_order,
-        product=product,
-        defaults={'unit': product.purchasing_unit,
-                  'quantity': quantity, 'po_price': price}
-    )
-    if not created:
-        po_item.quantity += quantity  # Update quantity if PO item already exists
-        po_item.po_price = price  # Update price if different
-        po_item.save()
+@receiver(post_save, sender=PurchaseOrderItem)
+@receiver(post_delete, sender=PurchaseOrderItem)
+def update_purchase_order_totals(sender, instance, **kwargs):
+    recalculate_purchase_order_totals([instance.purchase_order_id])
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def refresh_purchase_order_totals(sender, instance, **kwargs):
+    # A full save writes the totals held in memory, which may predate item changes.
+    recalculate_purchase_order_totals([instance.pk])
+    instance.refresh_from_db(fields=['subtotal', 'total'])
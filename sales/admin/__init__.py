@@ -75,7 +75,7 @@ class InvoiceAdmin(BaseAdmin):
     raw_id_fields = ['order']
 
     def total_amount(self, instance):
-        return instance.order.total
+        return instance.total
 
 
 @admin.register(SalesPayment)
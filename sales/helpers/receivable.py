@@ -0,0 +1,171 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Case, Count, DateField, DecimalField, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from libs.constants import VAT_DEFAULT
+from libs.utils import get_config_value
+from ..models import Customer, CustomerReceivable, Invoice
+
+AMOUNT = DecimalField(max_digits=19, decimal_places=2)
+# (key, minimum days past due, maximum days past due)
+AGING_BUCKETS = [
+    ('current', None, -1),
+    ('0_30', 0, 30),
+    ('31_60', 31, 60),
+    ('61_90', 61, 90),
+    ('over_90', 91, None),
+]
+
+
+def get_open_invoices(order_ids):
+    """
+    Returns the open (unpaid) invoices of the given sales orders.
+
+    Parameters:
+    - order_ids: Primary keys of SalesOrder objects.
+
+    Returns:
+    - A dict of order id to a (customer id, invoice total) tuple.
+    """
+    rows = Invoice.objects.filter(
+        order_id__in=order_ids, order__is_paid=False, order__deleted_at__isnull=True
+    ).values_list('order_id', 'order__customer_id', 'total')
+    return {order_id: (customer_id, total) for order_id, customer_id, total in rows}
+
+
+def apply_receivable_changes(before, after):
+    """
+    Moves the customer receivables from one snapshot of open invoices to another, with
+    one INSERT for missing ledger rows and one UPDATE whatever the number of customers.
+
+    Parameters:
+    - before: Result of get_open_invoices before the change.
+    - after: Result of get_open_invoices after the change.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for open_invoices, sign in [(before, -1), (after, 1)]:
+        for customer_id, total in open_invoices.values():
+            deltas[customer_id][0] += sign * total
+            deltas[customer_id][1] += sign
+    deltas = {customer_id: delta for customer_id, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    CustomerReceivable.objects.bulk_create(
+        [CustomerReceivable(customer_id=customer_id) for customer_id in deltas], ignore_conflicts=True)
+    CustomerReceivable.objects.filter(customer_id__in=deltas).update(
+        balance=F('balance') + Case(
+            *[When(customer_id=customer_id, then=Value(amount)) for customer_id, (amount, _count) in deltas.items()],
+            default=Value(0), output_field=AMOUNT),
+        open_invoices=F('open_invoices') + Case(
+            *[When(customer_id=customer_id, then=Value(count)) for customer_id, (_amount, count) in deltas.items()],
+            default=Value(0), output_field=IntegerField()),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_customer_receivables():
+    """
+    Recomputes every customer receivable from the open invoices in one grouped query.
+
+    Returns:
+    - The number of customers with open invoices.
+    """
+    rows = Invoice.objects.filter(order__is_paid=False, order__deleted_at__isnull=True).values(
+        'order__customer_id').annotate(balance=Sum('total'), open_invoices=Count('id')).order_by()
+    CustomerReceivable.objects.all().delete()
+    return len(CustomerReceivable.objects.bulk_create([
+        CustomerReceivable(customer_id=row['order__customer_id'], balance=row['balance'],
+                           open_invoices=row['open_invoices'])
+        for row in rows
+    ]))
+
+
+def get_credit_status(customer, amount=0):
+    """
+    Returns the receivable of a customer against its credit limits, reading a single
+    ledger row.
+
+    Parameters:
+    - customer: The Customer.
+    - amount: Amount of a new invoice to check on top of the open ones.
+
+    Returns:
+    - A dict with the balance, open invoice count, limits, the available amount and
+      whether a new invoice of `amount` stays within the limits. A limit of 0 or
+      empty means no limit.
+    """
+    balance, open_invoices = CustomerReceivable.objects.filter(customer_id=customer.pk).values_list(
+        'balance', 'open_invoices').first() or (Decimal(0), 0)
+    limit_amount = customer.credit_limit_amount or None
+    limit_qty = customer.credit_limit_qty or None
+    within_limit = (limit_amount is None or balance + Decimal(amount) <= limit_amount) and \
+        (limit_qty is None or open_invoices + 1 <= limit_qty)
+    return {
+        'balance': balance,
+        'open_invoices': open_invoices,
+        'credit_limit_amount': limit_amount,
+        'credit_limit_qty': limit_qty,
+        'available_amount': limit_amount - balance if limit_amount is not None else None,
+        'within_limit': within_limit,
+    }
+
+
+def check_credit_limit(sales_order):
+    """
+    Raises a ValidationError when submitting the order would take a credit customer
+    over its credit limit amount or number of open invoices.
+    """
+    customer = sales_order.customer
+    if customer.payment_type != Customer.CREDIT:
+        return
+    vat = Decimal(str(get_config_value('vat_percent', VAT_DEFAULT)))
+    amount = (sales_order.subtotal * (1 + vat)).quantize(Decimal('0.01'))
+    status = get_credit_status(customer, amount)
+    if not status['within_limit']:
+        raise ValidationError({'customer': _(
+            "The order of {amount} exceeds the credit limit of {customer}: "
+            "{balance} owed on {open_invoices} open invoice(s).").format(
+            amount=amount, customer=customer, balance=status['balance'],
+            open_invoices=status['open_invoices'])})
+
+
+def get_receivable_aging(customer_ids=None, as_of=None):
+    """
+    Buckets the open invoices of customers by days past due, where an invoice is due
+    `Customer.due_date` days after its invoice date. Runs one grouped query.
+
+    Parameters:
+    - customer_ids: Limit the aging to these customers, all customers when None.
+    - as_of: Date the days past due are counted to, today by default.
+
+    Returns:
+    - A list of dicts with the customer id32 and name, the total per bucket (keys
+      of AGING_BUCKETS) and the total balance.
+    """
+    as_of = as_of or timezone.now().date()
+    invoices = Invoice.objects.filter(order__is_paid=False, order__deleted_at__isnull=True)
+    if customer_ids is not None:
+        invoices = invoices.filter(order__customer_id__in=customer_ids)
+    invoices = invoices.annotate(due=ExpressionWrapper(
+        F('invoice_date') + Coalesce('order__customer__due_date', 0), output_field=DateField()))
+
+    buckets = {}
+    for key, min_days, max_days in AGING_BUCKETS:
+        condition = Q()
+        if min_days is not None:
+            condition &= Q(due__lte=as_of - timedelta(days=min_days))
+        if max_days is not None:
+            condition &= Q(due__gte=as_of - timedelta(days=max_days))
+        buckets[key] = Coalesce(Sum(Case(When(condition, then='total'), output_field=AMOUNT)), Value(0),
+                                output_field=AMOUNT)
+    rows = invoices.values('order__customer__id32', 'order__customer__name').annotate(
+        **buckets, balance=Sum('total')).order_by('order__customer__name')
+    return [
+        {'customer_id32': row.pop('order__customer__id32'), 'customer_name': row.pop('order__customer__name'), **row}
+        for row in rows
+    ]
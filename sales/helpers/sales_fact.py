@@ -0,0 +1,143 @@
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce
+from ..models import DailySalesFact, Invoice, OrderItem, SalesOrder
+
+EXCLUDED_ORDER_STATUSES = [SalesOrder.REJECTED, SalesOrder.CANCELED]
+AMOUNT = DecimalField(max_digits=19, decimal_places=2)
+
+
+def get_fact_rows(item_filter):
+    """
+    Aggregates invoiced order items into DailySalesFact rows.
+
+    Parameters:
+    - item_filter: Q object on OrderItem limiting the items to aggregate.
+
+    Returns:
+    - A list of unsaved DailySalesFact instances.
+    """
+    rows = OrderItem.objects.filter(
+        item_filter,
+        order__invoice__isnull=False,
+        order__invoice__deleted_at__isnull=True,
+        order__deleted_at__isnull=True,
+    ).exclude(order__status__in=EXCLUDED_ORDER_STATUSES).annotate(
+        fact_salesperson=Coalesce('order__visit__trip__salesperson', 'order__created_by'),
+        line_gross=ExpressionWrapper(F('price') * F('quantity'), output_field=AMOUNT),
+    ).values(
+        'order__invoice__invoice_date', 'product_id', 'order__customer_id',
+        'fact_salesperson', 'order__warehouse_id', 'order__is_paid',
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_gross=Sum('line_gross'),
+        total_vat=Sum(ExpressionWrapper(
+            F('line_gross') * F('order__invoice__vat'), output_field=AMOUNT)),
+    ).order_by()
+    return [
+        DailySalesFact(
+            date=row['order__invoice__invoice_date'],
+            product_id=row['product_id'],
+            customer_id=row['order__customer_id'],
+            salesperson_id=row['fact_salesperson'],
+            warehouse_id=row['order__warehouse_id'],
+            is_paid=row['order__is_paid'],
+            quantity=row['total_quantity'],
+            gross=row['total_gross'],
+            vat=row['total_vat'],
+        )
+        for row in rows
+    ]
+
+
+@transaction.atomic
+def refresh_daily_sales_facts(keys):
+    """
+    Recomputes the facts of the given (date, customer id) groups from the order items.
+
+    Parameters:
+    - keys: Iterable of (invoice date, customer id) tuples.
+
+    Returns:
+    - The number of fact rows written.
+    """
+    customers_by_date = {}
+    for date, customer_id in keys:
+        customers_by_date.setdefault(date, set()).add(customer_id)
+    if not customers_by_date:
+        return 0
+
+    fact_filter = reduce(or_, [Q(date=date, customer_id__in=customer_ids)
+                               for date, customer_ids in customers_by_date.items()])
+    item_filter = reduce(or_, [Q(order__invoice__invoice_date=date, order__customer_id__in=customer_ids)
+                               for date, customer_ids in customers_by_date.items()])
+    DailySalesFact.objects.filter(fact_filter).delete()
+    return len(DailySalesFact.objects.bulk_create(get_fact_rows(item_filter)))
+
+
+@transaction.atomic
+def rebuild_daily_sales_facts(start_date, end_date, batch_size=2000):
+    """
+    Replaces all facts dated between start_date and end_date, inclusive.
+
+    Returns:
+    - The number of fact rows written.
+    """
+    DailySalesFact.objects.filter(date__range=(start_date, end_date)).delete()
+    facts = get_fact_rows(Q(order__invoice__invoice_date__range=(start_date, end_date)))
+    return len(DailySalesFact.objects.bulk_create(facts, batch_size=batch_size))
+
+
+class PendingFactRefresh:
+    """
+    Fact groups touched inside one transaction, refreshed once when it commits.
+    Orders are resolved to their current (date, customer) group at that time;
+    `keys` holds groups the orders left, e.g. after a customer change. The buffer is
+    only referenced by Django's on_commit queue, so it is released with the queue on
+    commit and on rollback.
+    """
+
+    def __init__(self):
+        self.order_ids = set()
+        self.keys = set()
+
+    def __call__(self):
+        keys = set(self.keys)
+        keys.update(Invoice.objects.filter(order_id__in=self.order_ids).values_list(
+            'invoice_date', 'order__customer_id'))
+        self.order_ids.clear()
+        self.keys.clear()
+        refresh_daily_sales_facts(keys)
+
+
+def get_pending_refresh():
+    """
+    Returns the pending fact refresh of the current transaction, registering it with
+    transaction.on_commit the first time. A refresh dropped with a rolled back
+    savepoint is no longer in the queue and is replaced by a new one; groups kept from
+    a rolled back savepoint are only refreshed once more. In autocommit mode a new,
+    unregistered refresh is returned.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return PendingFactRefresh()
+    for _sids, callback, _robust in reversed(connection.run_on_commit):
+        if isinstance(callback, PendingFactRefresh):
+            return callback
+    pending = PendingFactRefresh()
+    transaction.on_commit(pending)
+    return pending
+
+
+def schedule_fact_refresh(order_ids=(), keys=()):
+    """
+    Marks orders and (date, customer id) groups for a fact refresh when the current
+    transaction commits, or right away in autocommit mode.
+    """
+    pending = get_pending_refresh()
+    pending.order_ids.update(order_ids)
+    pending.keys.update(keys)
+    if not transaction.get_connection().in_atomic_block:
+        pending()
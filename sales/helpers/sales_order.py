@@ -1,12 +1,15 @@
-import math
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Sum
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
 from django.utils import timezone
 from libs.constants import COMPLETED, SKIPPED
-from inventory.models import StockMovement, StockMovementItem, Warehouse, Unit, WarehouseStock
+from inventory.helpers.stock import plan_stock_explosion, apply_stock_explosion
+from inventory.models import StockMovement, StockMovementItem, Warehouse
 from hr.models import Attendance
 from sales.views import customer
-from ..models import CustomerVisit, SalesOrder, Customer, Trip
+from ..models import CustomerVisit, SalesOrder, Customer, Trip, Invoice, OrderItem
+from .receivable import get_open_invoices, apply_receivable_changes
+from .trip import apply_trip_load
 
 
 def canvasing_create_stock_movement(instance):
@@ -186,20 +189,13 @@ def handle_canvasing_trip(visit_instance):
 def handle_taking_order_trip(visit_instance):
     """
     Handles specific actions for TAKING_ORDER type trips.
-    Sort the stock movement item for checker to arrange item placement in the vehicle
-    :param visit_instance: The CustomerVisit instance with a CANVASING type trip.
+    Sequences the stock movement items last in, first out by drop, for the checker to
+    arrange item placement in the vehicle.
+    :param visit_instance: The CustomerVisit instance with a TAKING_ORDER type trip.
     """
     trip = visit_instance.trip
     if trip.type == Trip.TAKING_ORDER:
-        sm = StockMovement.objects.filter(
-            creator_type=ContentType.objects.get_for_model(Trip),
-            creator_id=trip.id
-        ).last()
-        if not sm:
-            return
-        for order, item in enumerate(sm.items.order_by('-id')):
-            item.order = order+1
-            item.save()
+        apply_trip_load(trip)
 
 
 def get_previous_stock_movement_destination(warehouse_type, warehouse_id):
@@ -232,96 +228,58 @@ def set_salesperson_able_to_checkout(visit_instance):
         attendance.save()
 
 
-def explode_stock_based_on_order_item(warehouse_stocks, item):
+def explode_stock_based_on_order_items(order_items, batches, units):
     """
-    Check and manage stock levels for a specific order item.
-    Explode stock recursively if necessary.
+    Break bigger unit stock down so every order item has enough stock in its own unit.
+    The whole break-down is planned in memory and written in one bulk operation.
 
     Args:
-    - warehouse_stocks (QuerySet): The queryset of WarehouseStock objects.
-    - item (OrderItem): The order item to check stock against.
-    """
-    # Aggregate the total stock quantity for the given unit
-    stocks = warehouse_stocks.filter(unit=item.unit).values(
-        'product', 'unit').annotate(quantity=Sum('quantity'))
-    stock_quantity = stocks[0]['quantity'] if stocks else 0
-
-    # Explode stock if the quantity needed exceeds current stock
-    if item.quantity > stock_quantity:
-        explode_stock_recursively(item.quantity, item.unit, warehouse_stocks)
-
-
-def explode_stock_recursively(quantity_needed, unit, warehouse_stocks):
-    """
-    Recursively explode stock to meet the required quantity.
+    - order_items (list): The OrderItem objects to explode stock for.
+    - batches (dict): Product id to WarehouseStock batches, from get_warehouse_batches.
+    - units (UnitTree): The unit hierarchy.
 
-    Args:
-    - quantity_needed (int): The required quantity.
-    - unit (Unit): The unit of measure for the required quantity.
-    - warehouse_stocks (QuerySet): The queryset of WarehouseStock objects.
+    Returns:
+    - list: The applied explosion steps, for auditing.
     """
-    # Get child stocks one level deeper than the current unit
-    child_stocks = warehouse_stocks.filter(
-        quantity__gt=0, unit__level=unit.level + 1)
-
-    # Aggregate the total quantity for child stocks
-    stock_quantities = child_stocks.values(
-        'product', 'unit').annotate(quantity=Sum('quantity'))
-
-    # Get the immediate child unit of the current unit
-    child_unit = Unit.objects.filter(parent=unit).first()
-    if not child_unit:
-        return  # Exit if no child unit found
+    plan = []
+    for item in order_items:
+        plan += plan_stock_explosion(
+            batches.get(item.product_id, []), item.unit_id, item.quantity, units)
+    return apply_stock_explosion(plan)
 
-    # Calculate the required quantity in terms of the child unit
-    child_quantity_needed = math.ceil(
-        quantity_needed / child_unit.conversion_to_ancestor(unit.id))
-    available_quantity = stock_quantities[0]['quantity'] if stock_quantities else 0
 
-    # Recursively explode stock if available quantity is insufficient
-    if available_quantity < child_quantity_needed:
-        explode_stock_recursively(
-            child_quantity_needed - available_quantity, child_unit, warehouse_stocks)
-
-    # Iterate through child stocks and explode as needed
-    for stock in child_stocks:
-        quantity_to_explode = min(child_quantity_needed, stock.quantity)
-        commit_stock_explode(stock, quantity_to_explode)
-        child_quantity_needed -= quantity_to_explode
-        if child_quantity_needed <= 0:
-            break  # Exit loop if needed quantity is met or exceeded
-
-
-def commit_stock_explode(stock, quantity):
+def recalculate_order_totals(order_ids):
     """
-    Commit the explosion of stock, adjusting quantities of parent and child stocks.
+    Recomputes the stored subtotal, VAT amount and total of sales orders and their
+    invoices from the order items. Runs three UPDATE statements whatever the number
+    of orders, so callers can batch every order they touched. Customer receivables
+    follow the new invoice totals.
 
     Args:
-    - stock (WarehouseStock): The stock to explode.
-    - quantity (int): The quantity to explode.
-    """
-    # Get or create the parent stock for the current stock
-
-    parent_stock = WarehouseStock.objects.filter(
-        warehouse=stock.warehouse,
-        product=stock.product,
-        unit=stock.unit.parent,
-        expire_date=stock.expire_date
-    ).last()
-    if not parent_stock:
-        parent_stock = WarehouseStock.objects.create(
-            warehouse=stock.warehouse,
-            product=stock.product,
-            unit=stock.unit.parent,
-            expire_date=stock.expire_date
-        )
-
-    # Convert the quantity to parent unit and update the parent stock
-    converted_quantity = quantity * \
-        stock.unit.conversion_to_ancestor(stock.unit.parent.id)
-    parent_stock.quantity += converted_quantity
-    parent_stock.save()
+    - order_ids (iterable): Primary keys of the SalesOrder objects to recompute.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+    amount = DecimalField(max_digits=19, decimal_places=2)
+    open_invoices = get_open_invoices(order_ids)
+
+    item_subtotal = OrderItem.objects.filter(order=OuterRef('pk')).values('order').annotate(
+        amount=Sum(F('price') * F('quantity'), output_field=amount)).values('amount')
+    SalesOrder.all_objects.filter(pk__in=order_ids).update(
+        subtotal=Coalesce(Subquery(item_subtotal), Value(0), output_field=amount))
+
+    order_subtotal = SalesOrder.all_objects.filter(pk=OuterRef('order_id')).values('subtotal')
+    Invoice.all_objects.filter(order_id__in=order_ids).update(
+        subtotal=Subquery(order_subtotal),
+        vat_amount=Round(Subquery(order_subtotal) * F('vat'), 2, output_field=amount),
+        total=Subquery(order_subtotal) + Round(Subquery(order_subtotal) * F('vat'), 2, output_field=amount),
+    )
 
-    # Deduct the exploded quantity from the child stock
-    stock.quantity -= quantity
-    stock.save()
+    invoice_vat = Invoice.all_objects.filter(order_id=OuterRef('pk')).values('vat_amount')
+    SalesOrder.all_objects.filter(pk__in=order_ids).update(
+        vat_amount=Coalesce(Subquery(invoice_vat), Value(0), output_field=amount),
+        total=F('subtotal') + Coalesce(Subquery(invoice_vat), Value(0), output_field=amount),
+    )
+    if open_invoices:
+        apply_receivable_changes(open_invoices, get_open_invoices(open_invoices))
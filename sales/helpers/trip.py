@@ -3,6 +3,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db.models import Sum
 from django.utils import timezone
 from inventory.models import StockMovement, StockMovementItem, Warehouse
+from logistics.models import Drop
 from ..models import CustomerVisit, Trip
 from ..models import Trip, CustomerVisit
 
@@ -90,4 +91,71 @@ def _create_stock_movement_items_for_trip(stock_movement, origin_warehouse):
             stock_movement=stock_movement,
             unit_id=stock.get('unit'),
             quantity=stock.get('total_quantity')
-        )
\ No newline at end of file
+        )
+
+
+def get_trip_stock_movement(trip):
+    """Return the stock movement loading the vehicle of a taking order trip."""
+    return StockMovement.objects.filter(
+        creator_type=ContentType.objects.get_for_model(Trip),
+        creator_id=trip.id
+    ).last()
+
+
+def get_drop_sequence(trip):
+    """
+    Return a dict of customer id to the position of its stop on the delivery route:
+    the order of its drop in the trip's latest job, or the order of its visit when the
+    trip has no drop for the customer yet.
+    """
+    sequence = dict(CustomerVisit.objects.filter(trip=trip).values_list('customer_id', 'order'))
+    sequence.update(Drop.objects.filter(job__trip=trip, sales_visit__isnull=False).order_by(
+        'job_id', 'order').values_list('sales_visit__customer_id', 'order'))
+    return sequence
+
+
+def plan_trip_load(trip, stock_movement):
+    """
+    Plan the load sequence of a trip's stock movement: last in, first out by drop, so
+    the items of the last stop go in first and the items of the first stop end up at
+    the door. Items without a stop on the route are loaded before all others, and the
+    items of one stop are kept together, sorted by product.
+
+    Returns:
+    - A list of dicts with the load sequence, the drop order (None without a stop), the
+      customer and the StockMovementItem, in load order.
+    """
+    sequence = get_drop_sequence(trip)
+    items = stock_movement.items.select_related('product', 'unit', 'destination_customer')
+
+    def load_key(item):
+        drop_order = sequence.get(item.destination_customer_id)
+        return (drop_order is not None, -(drop_order or 0), item.product.name if item.product else '', item.id)
+
+    return [{
+        'sequence': index + 1,
+        'drop_order': sequence.get(item.destination_customer_id),
+        'customer': item.destination_customer,
+        'item': item,
+    } for index, item in enumerate(sorted(items, key=load_key))]
+
+
+def apply_trip_load(trip):
+    """
+    Write the planned load sequence to StockMovementItem.order with one bulk update,
+    which skips the item signals since only the sequence changes.
+
+    Returns:
+    - The load plan, see plan_trip_load, or an empty list when the trip has no stock movement.
+    """
+    stock_movement = get_trip_stock_movement(trip)
+    if not stock_movement:
+        return []
+    plan = plan_trip_load(trip, stock_movement)
+    changed = []
+    for row in plan:
+        if row['item'].order != row['sequence']:
+            row['item'].order = row['sequence']
+            changed.append(row['item'])
+    StockMovementItem.objects.bulk_update(changed, ['order'])
+    return plan
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from sales.helpers.sales_fact import rebuild_daily_sales_facts
+from sales.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales facts from invoiced order items, one block of days per transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help='First invoice date to rebuild (YYYY-MM-DD), defaults to the first invoice')
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help='Last invoice date to rebuild (YYYY-MM-DD), defaults to the last invoice')
+        parser.add_argument('--days', type=int, default=31,
+                            help='Number of days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        bounds = Invoice.objects.aggregate(first=Min('invoice_date'), last=Max('invoice_date'))
+        start = options['start'] or bounds['first']
+        end = options['end'] or bounds['last']
+        if not start or not end:
+            self.stdout.write('No invoices to backfill')
+            return
+        if start > end:
+            raise CommandError('--start must not be after --end')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        total = 0
+        block_start = start
+        while block_start <= end:
+            block_end = min(block_start + timedelta(days=options['days'] - 1), end)
+            written = rebuild_daily_sales_facts(block_start, block_end)
+            self.stdout.write(f'{block_start} - {block_end}: {written} fact(s)')
+            total += written
+            block_start = block_end + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'{total} daily sales fact(s) written'))
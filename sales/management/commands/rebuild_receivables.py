@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sales.helpers.receivable import rebuild_customer_receivables
+
+
+class Command(BaseCommand):
+    help = 'Recompute the customer receivables from the open invoices.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_customer_receivables()
+        self.stdout.write(self.style.SUCCESS(f'{written} customer receivable(s) written'))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:01
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('sales', '0038_remove_salesorder_stock_movement_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='customervisit',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['trip', 'status'], name='sales_visit_trip_status_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0027_hot_path_indexes'),
+        ('sales', '0039_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, help_text='Invoice date')),
+                ('is_paid', models.BooleanField(default=False, help_text='Whether the orders are paid')),
+                ('quantity', models.BigIntegerField(default=0, help_text='Sum of the order item quantities')),
+                ('gross', models.DecimalField(decimal_places=2, default=0, help_text='Sum of price times quantity, excluding VAT', max_digits=19)),
+                ('vat', models.DecimalField(decimal_places=2, default=0, help_text='VAT on the gross amount', max_digits=19)),
+                ('customer', models.ForeignKey(help_text='Customer of the invoiced orders', on_delete=django.db.models.deletion.CASCADE, to='sales.customer')),
+                ('product', models.ForeignKey(help_text='Product sold', on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('salesperson', models.ForeignKey(blank=True, help_text='Salesperson of the visit trip, or the order creator', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_facts', to=settings.AUTH_USER_MODEL)),
+                ('warehouse', models.ForeignKey(blank=True, help_text='Warehouse the orders were served from', null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Fact',
+                'verbose_name_plural': 'Daily Sales Facts',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['product', 'date'], name='sales_fact_product_date_idx'), models.Index(fields=['customer', 'date'], name='sales_fact_customer_date_idx')],
+            },
+        ),
+    ]
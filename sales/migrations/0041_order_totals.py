@@ -0,0 +1,71 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:15
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def backfill_order_totals(apps, schema_editor):
+    SalesOrder = apps.get_model('sales', 'SalesOrder')
+    Invoice = apps.get_model('sales', 'Invoice')
+    OrderItem = apps.get_model('sales', 'OrderItem')
+    amount = DecimalField(max_digits=19, decimal_places=2)
+
+    item_subtotal = OrderItem.objects.filter(
+        order=OuterRef('pk'), deleted_at__isnull=True).values('order').annotate(
+        amount=Sum(F('price') * F('quantity'), output_field=amount)).values('amount')
+    SalesOrder.objects.update(subtotal=Coalesce(Subquery(item_subtotal), Value(0), output_field=amount))
+
+    order_subtotal = SalesOrder.objects.filter(pk=OuterRef('order_id')).values('subtotal')
+    Invoice.objects.update(
+        subtotal=Subquery(order_subtotal),
+        vat_amount=Round(Subquery(order_subtotal) * F('vat'), 2, output_field=amount),
+        total=Subquery(order_subtotal) + Round(Subquery(order_subtotal) * F('vat'), 2, output_field=amount),
+    )
+
+    invoice_vat = Invoice.objects.filter(order_id=OuterRef('pk')).values('vat_amount')
+    SalesOrder.objects.update(
+        vat_amount=Coalesce(Subquery(invoice_vat), Value(0), output_field=amount),
+        total=F('subtotal') + Coalesce(Subquery(invoice_vat), Value(0), output_field=amount),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0040_dailysalesfact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Subtotal of the order, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Subtotal plus VAT, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='vat_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='VAT on the subtotal, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Sum of price times quantity of the order items, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Subtotal plus VAT, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='vat_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='VAT of the invoice, kept by recalculate_order_totals', max_digits=19),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
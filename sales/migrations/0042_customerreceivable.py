@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def backfill_customer_receivables(apps, schema_editor):
+    Invoice = apps.get_model('sales', 'Invoice')
+    CustomerReceivable = apps.get_model('sales', 'CustomerReceivable')
+    rows = Invoice.objects.filter(
+        deleted_at__isnull=True, order__is_paid=False, order__deleted_at__isnull=True
+    ).values('order__customer_id').annotate(balance=Sum('total'), open_invoices=Count('id')).order_by()
+    CustomerReceivable.objects.bulk_create([
+        CustomerReceivable(customer_id=row['order__customer_id'], balance=row['balance'],
+                           open_invoices=row['open_invoices'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0041_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerReceivable',
+            fields=[
+                ('customer', models.OneToOneField(help_text='Customer owing the amount', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='receivable', serialize=False, to='sales.customer')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, help_text='Total of the open invoices', max_digits=19)),
+                ('open_invoices', models.IntegerField(default=0, help_text='Number of open invoices')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Customer Receivable',
+                'verbose_name_plural': 'Customer Receivables',
+            },
+        ),
+        migrations.RunPython(backfill_customer_receivables, migrations.RunPython.noop),
+    ]
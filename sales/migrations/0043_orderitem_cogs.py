@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0042_customerreceivable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='cogs',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Cost of the goods sold, from the FIFO cost layers consumed when dispatched', max_digits=19, null=True),
+        ),
+    ]
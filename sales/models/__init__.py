@@ -15,6 +15,53 @@ APPROVED_AT = 'Approved at'
 APPROVED_AT_HELP_TEXT = 'Specify the date and time of approval'
 ORDER_OF_CUSTOMER_VISIT = 'Order of customer visit in the trip'
 ENTER_THE = 'Enter the '
+STORED_TOTALS = ('subtotal', 'vat_amount', 'total')
+
+
+class TrackedFieldsMixin:
+    """
+    Keeps the values of `tracked_fields` as loaded or last saved, so signal receivers
+    can skip their queries when none of the fields they depend on changed.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_tracked_fields()
+
+    def _remember_tracked_fields(self):
+        if all(field in self.__dict__ for field in self.tracked_fields):
+            self._tracked_values = {field: self.__dict__[field] for field in self.tracked_fields}
+
+    def has_changed(self, *fields):
+        """
+        Whether one of the fields differs from its loaded value. New and partially
+        loaded instances count as changed.
+        """
+        loaded = getattr(self, '_tracked_values', None)
+        return loaded is None or any(loaded[field] != getattr(self, field) for field in fields)
+
+    def loaded_value(self, field):
+        loaded = getattr(self, '_tracked_values', None)
+        return loaded[field] if loaded is not None else getattr(self, field)
+
+
+def exclude_stored_totals(instance, kwargs):
+    """
+    Leaves the stored totals of a saved order or invoice to recalculate_order_totals,
+    so an instance loaded before its items changed never writes stale totals back.
+    """
+    if not instance._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+        kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in STORED_TOTALS and field.attname in instance.__dict__]
+    return kwargs
 
 
 class StoreType(BaseModelGeneric):
@@ -123,7 +170,7 @@ class Customer(BaseModelGeneric):
         verbose_name_plural = _('Customers')
 
 
-class SalesOrder(BaseModelGeneric):
+class SalesOrder(TrackedFieldsMixin, BaseModelGeneric):
     # Order Status Choices with Descriptions
     DRAFT = 'draft'
     SUBMITTED = 'submitted'
@@ -195,6 +242,20 @@ class SalesOrder(BaseModelGeneric):
     visit = models.ForeignKey(
         'CustomerVisit', blank=True, null=True, on_delete=models.SET_NULL)
     is_paid = models.BooleanField(default=False)
+    subtotal = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('Sum of price times quantity of the order items, kept by recalculate_order_totals'))
+    vat_amount = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('VAT of the invoice, kept by recalculate_order_totals'))
+    total = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('Subtotal plus VAT, kept by recalculate_order_totals'))
+
+    tracked_fields = ('customer_id', 'status', 'is_paid', 'warehouse_id', 'visit_id', 'deleted_at')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **exclude_stored_totals(self, kwargs))
 
     def __str__(self):
         return _('Order #{id32} - {customer}').format(id32=self.id32, customer=self.customer)
@@ -208,32 +269,16 @@ class SalesOrder(BaseModelGeneric):
     def delivery_status(self):
         return self.stock_movements.values_list('status', flat=True) if self.stock_movements.exists() else None
 
-    @property
-    def invoice(self):
-        return Invoice.objects.filter(oerder=self).last()
-
     @property
     def customer_visits(self):
         return self.customervisit_set.all().order_by('-created_at')
 
-    @property
-    def subtotal(self):
-       return self.invoice.subtotal
-    
     @property
     def vat_percent(self):
         return self.invoice.vat_percent
 
-    @property
-    def vat_amount(self):
-        return self.invoice.vat_amount
-
-    @property
-    def total(self):
-        return self.invoice.total
-
 
-class OrderItem(BaseModelGeneric):
+class OrderItem(TrackedFieldsMixin, BaseModelGeneric):
     order = models.ForeignKey(
         SalesOrder,
         on_delete=models.CASCADE,
@@ -255,8 +300,13 @@ class OrderItem(BaseModelGeneric):
     )
     unit = models.ForeignKey(
         Unit, blank=True, null=True, on_delete=models.SET_NULL)
+    cogs = models.DecimalField(
+        max_digits=19, decimal_places=2, blank=True, null=True, editable=False,
+        help_text=_('Cost of the goods sold, from the FIFO cost layers consumed when dispatched'))
     # Add any other fields specific to your order item model
 
+    tracked_fields = ('order_id', 'product_id', 'price', 'quantity', 'deleted_at')
+
     def __str__(self):
         return _('Order Item #{id32} - [#{product_id32}]{product} ({quantity}{unit})').format(
             id32=self.id32,
@@ -280,7 +330,7 @@ class OrderItem(BaseModelGeneric):
         verbose_name_plural = _('Order Items')
 
 
-class Invoice(BaseModelGeneric):
+class Invoice(TrackedFieldsMixin, BaseModelGeneric):
     order = models.OneToOneField(
         SalesOrder,
         on_delete=models.CASCADE,
@@ -312,18 +362,29 @@ class Invoice(BaseModelGeneric):
         help_text=_('Value Added Tax percentage in decimal'))
     attachment = models.ForeignKey(
         File, related_name='%(app_label)s_%(class)s_attachment', blank=True, null=True, on_delete=models.SET_NULL)
+    subtotal = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('Subtotal of the order, kept by recalculate_order_totals'))
+    vat_amount = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('VAT on the subtotal, kept by recalculate_order_totals'))
+    total = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, editable=False,
+        help_text=_('Subtotal plus VAT, kept by recalculate_order_totals'))
 
     class Meta:
         ordering = ['-id']
         verbose_name = _('Invoice')
         verbose_name_plural = _('Invoices')
 
+    tracked_fields = ('order_id', 'invoice_date', 'vat', 'deleted_at')
+
     def save(self, *args, **kwargs):
         # Check if vat is None and set default value
         if self.vat is None:
             self.vat = get_config_value('vat_percent', VAT_DEFAULT)
 
-        super(Invoice, self).save(*args, **kwargs)
+        super(Invoice, self).save(*args, **exclude_stored_totals(self, kwargs))
 
     def __str__(self):
         return _('Invoice #{id32} - {order}').format(id32=self.id32, order=self.order)
@@ -337,25 +398,10 @@ class Invoice(BaseModelGeneric):
         payment = SalesPayment.objects.filter(invoice=self).last()
         return payment.status if payment else None
 
-    @property
-    def subtotal(self):
-        amount = 0
-        for item in self.order.order_items.all():
-            amount += item.price * item.quantity
-        return amount
-
     @property
     def vat_percent(self):
         return self.vat * 100
 
-    @property
-    def vat_amount(self):
-        return Decimal(self.vat) * Decimal(self.subtotal)
-
-    @property
-    def total(self):
-        return self.subtotal + self.vat_amount
-
     @property
     def payments(self):
         return self.salespayment_set.all().order_by('-created_at')
@@ -559,6 +605,10 @@ class CustomerVisit(BaseModelGeneric):
         ordering = ['order']
         verbose_name = _('Customer Visit')
         verbose_name_plural = _('Customer Visits')
+        indexes = [
+            models.Index(fields=['trip', 'status'],
+                         condition=models.Q(deleted_at__isnull=True), name='sales_visit_trip_status_idx'),
+        ]
 
     def __str__(self):
         return f'{self.trip} - {self.customer.name}'
@@ -592,3 +642,63 @@ class CustomerVisitReport(BaseModelGeneric):
         ordering = ['-id']
         verbose_name = _('Customer Visit Report')
         verbose_name_plural = _('Customer Visit Reports')
+
+
+class DailySalesFact(models.Model):
+    """
+    Daily rollup of invoiced order items, one row per invoice date, product, customer,
+    salesperson, warehouse and payment state. Maintained by the sales signals through
+    `sales.helpers.sales_fact` and rebuilt with the `backfill_sales_facts` command.
+    """
+    date = models.DateField(db_index=True, help_text=_('Invoice date'))
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, help_text=_('Product sold'))
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, help_text=_('Customer of the invoiced orders'))
+    salesperson = models.ForeignKey(
+        User, blank=True, null=True, on_delete=models.SET_NULL, related_name='sales_facts',
+        help_text=_('Salesperson of the visit trip, or the order creator'))
+    warehouse = models.ForeignKey(
+        Warehouse, blank=True, null=True, on_delete=models.SET_NULL,
+        help_text=_('Warehouse the orders were served from'))
+    is_paid = models.BooleanField(default=False, help_text=_('Whether the orders are paid'))
+    quantity = models.BigIntegerField(default=0, help_text=_('Sum of the order item quantities'))
+    gross = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0,
+        help_text=_('Sum of price times quantity, excluding VAT'))
+    vat = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, help_text=_('VAT on the gross amount'))
+
+    def __str__(self):
+        return f'{self.date} {self.product_id} {self.customer_id}: {self.gross}'
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = _('Daily Sales Fact')
+        verbose_name_plural = _('Daily Sales Facts')
+        indexes = [
+            models.Index(fields=['product', 'date'], name='sales_fact_product_date_idx'),
+            models.Index(fields=['customer', 'date'], name='sales_fact_customer_date_idx'),
+        ]
+
+
+class CustomerReceivable(models.Model):
+    """
+    Accounts receivable of a customer: the total of its open (unpaid) invoices. Kept
+    incrementally by the sales signals through `sales.helpers.receivable`, so credit
+    checks read one row instead of the customer's invoice history.
+    """
+    customer = models.OneToOneField(
+        Customer, primary_key=True, on_delete=models.CASCADE, related_name='receivable',
+        help_text=_('Customer owing the amount'))
+    balance = models.DecimalField(
+        max_digits=19, decimal_places=2, default=0, help_text=_('Total of the open invoices'))
+    open_invoices = models.IntegerField(default=0, help_text=_('Number of open invoices'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.customer_id}: {self.balance}'
+
+    class Meta:
+        verbose_name = _('Customer Receivable')
+        verbose_name_plural = _('Customer Receivables')
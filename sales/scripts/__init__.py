@@ -56,3 +56,12 @@ def generate_invoice_pdf_for_instances(instances):
         filename = f"Invoices_{invoice_id32s}.pdf"
         return save_pdf_to_file(pdf_content, filename)
     return None
+
+
+def generate_load_sheet_pdf(trip, stock_movement, plan):
+    context = {'tenant_info': get_tenant_info(), 'trip': trip, 'stock_movement': stock_movement, 'plan': plan}
+    pdf_content = render_to_pdf('document/load_sheet.html', context)
+    if pdf_content:
+        filename = f"LoadSheet_{trip.id32}_{stock_movement.id32}.pdf"
+        return save_pdf_to_file(pdf_content, filename)
+    return None
@@ -1,4 +1,3 @@
-from django.db.models import F, Sum
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from common.serializers import UserListSerializer
@@ -7,6 +6,7 @@ from inventory.models import Product, Unit, Warehouse, StockMovement
 from .customer import CustomerLiteSerializer
 from .trip import CustomerVisitStatusSerializer
 from ..models import SalesOrder, OrderItem, Customer, Invoice, SalesPayment
+from ..helpers.sales_order import recalculate_order_totals
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -178,7 +178,8 @@ class SalesOrderListSerializer(serializers.ModelSerializer):
         source='customer.name',
         read_only=True
     )
-    total_amount = serializers.SerializerMethodField()
+    total_amount = serializers.DecimalField(
+        max_digits=19, decimal_places=2, source='subtotal', read_only=True)
     trip_id32s = serializers.SerializerMethodField()
 
     class Meta:
@@ -187,19 +188,12 @@ class SalesOrderListSerializer(serializers.ModelSerializer):
                   'approved_by', 'total_amount', 'status', 'trip_id32s']
         read_only_fields = ['id32', 'approved_by', 'customer']
 
-    def get_total_amount(self, obj):
-        total_amount = obj.order_items.aggregate(
-            total_price=Sum(F('price') * F('quantity'))).get('total_price')
-        total_amount = 0 if not total_amount else total_amount
-        return total_amount
-    
     def get_trip_id32s(self, obj):
         return obj.customervisit_set.values_list('trip__id32', flat=True)
 
 
 class SalesOrderDetailSerializer(SalesOrderListSerializer):
     order_items = OrderItemSerializer(many=True)
-    total_amount = serializers.SerializerMethodField()
     approved_by = UserListSerializer(read_only=True)
     customer = CustomerLiteSerializer(read_only=True)
     invoice = InvoiceSerializer(read_only=True)
@@ -245,7 +239,6 @@ class SalesOrderDetailSerializer(SalesOrderListSerializer):
 
 class SalesOrderSerializer(SalesOrderListSerializer):
     order_items = OrderItemSerializer(many=True)
-    total_amount = serializers.SerializerMethodField()
     customer_id32 = serializers.CharField(
         write_only=True)  # Add the customer_id32 field
     warehouse_id32 = serializers.CharField(write_only=True, required=False)
@@ -302,6 +295,7 @@ class SalesOrderSerializer(SalesOrderListSerializer):
             OrderItem.objects.create(
                 order=sales_order, **item_data)
 
+        sales_order.refresh_from_db(fields=['subtotal', 'vat_amount', 'total'])
         return sales_order
 
     def update(self, instance, validated_data):
@@ -349,6 +343,9 @@ class SalesOrderSerializer(SalesOrderListSerializer):
                 OrderItem.objects.create(
                     order=instance, **item_data)
 
+        # Items updated through the queryset send no signals.
+        recalculate_order_totals([instance.pk])
+        instance.refresh_from_db(fields=['subtotal', 'vat_amount', 'total'])
         return instance
 
 
@@ -1,5 +1,5 @@
 from pdb import post_mortem
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -7,12 +7,17 @@ from django.db import models
 from django.dispatch import receiver
 from libs.constants import WAITING, ON_PROGRESS, COMPLETED, SKIPPED
 from libs.utils import add_one_day
-from inventory.models import Product, StockMovementItem, WarehouseStock
+from inventory.helpers.stock import get_warehouse_batches
+from inventory.helpers.unit import UnitTree
+from inventory.models import Product, StockMovementItem
 from ..helpers.sales_order import (canvasing_create_stock_movement,
                                    taking_order_create_stock_movement, handle_unapproved_sales_order,
                                    all_visits_completed_or_skipped, update_trip_status_to_completed,
                                    handle_canvasing_trip, handle_taking_order_trip,
-                                   set_salesperson_able_to_checkout, explode_stock_based_on_order_item)
+                                   set_salesperson_able_to_checkout, explode_stock_based_on_order_items,
+                                   recalculate_order_totals)
+from ..helpers.sales_fact import schedule_fact_refresh
+from ..helpers.receivable import get_open_invoices, apply_receivable_changes, check_credit_limit
 from ..helpers.trip import (create_collector_trip,
                             create_customer_visits_for_collector_trip,
                             create_return_stock_movement)
@@ -57,6 +62,82 @@ from ..models import (
 # 19. create_next_trip_on_trip_complete: Create a ne Trip when a Trip changes status to 'COMPLETED'.
 # 20. create_return_stock_movement_on_canvasing_complete: Create a stock movement to return items remaining in the trip's vehicle.
 
+# ~ Receivables ~
+# 21. remember_open_invoice: Keeps the open invoice of an order before the invoice or the order changes.
+# 22. update_customer_receivable: Moves the customer receivable by the change in open invoices.
+# 23. ensure_credit_limit_on_submit: Refuses to submit an order that takes its customer over the credit limit.
+
+# ~ Order Totals ~
+# 24. update_order_totals_on_order_item: Recomputes the stored totals of an order and its invoice when its items change.
+# 25. update_order_totals_on_invoice: Recomputes the stored totals of an invoice and its order when its VAT or order changes.
+# 26. update_order_totals_on_invoice_delete: Clears the VAT of an order whose invoice is deleted.
+
+# ~ Sales Facts ~
+# 27. refresh_sales_fact_on_order_item: Refreshes the daily sales facts of an order when its items change.
+# 28. remember_sales_fact_key_of_invoice: Keeps the fact group (invoice date, customer) of an invoice before it changes.
+# 29. refresh_sales_fact_on_invoice: Refreshes the daily sales facts of an invoice and of the group it left.
+# 30. remember_sales_fact_key_of_sales_order: Keeps the fact group of an invoiced order before it changes.
+# 31. refresh_sales_fact_on_sales_order: Refreshes the daily sales facts of an invoiced order and of the group it left.
+
+
+# Receivables ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# A hard deleted order takes its invoice along, which the Invoice receivers account for.
+# Saves that cannot open, close or move an open invoice are skipped; a change of its
+# total is applied by recalculate_order_totals.
+RECEIVABLE_FIELDS = {Invoice: ('order_id', 'deleted_at'), SalesOrder: ('customer_id', 'is_paid', 'deleted_at')}
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_delete, sender=Invoice)
+@receiver(pre_save, sender=SalesOrder)
+def remember_open_invoice(sender, instance, signal, **kwargs):
+    instance.open_invoice_before = None
+    if signal is pre_save and not instance.has_changed(*RECEIVABLE_FIELDS[sender]):
+        return
+    if sender is Invoice:
+        order_ids = {instance.order_id, instance.loaded_value('order_id')}
+    else:
+        order_ids = {instance.pk} if instance.pk else set()
+    instance.open_invoice_before = (order_ids, get_open_invoices(order_ids) if order_ids else {})
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=SalesOrder)
+def update_customer_receivable(sender, instance, **kwargs):
+    remembered = getattr(instance, 'open_invoice_before', None)
+    if remembered is None:
+        return
+    order_ids, before = remembered
+    instance.open_invoice_before = None
+    order_ids = order_ids | {instance.order_id if sender is Invoice else instance.pk}
+    apply_receivable_changes(before, get_open_invoices(order_ids))
+
+
+# Order totals ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Registered before the invoice PDF and accounting receivers, so they read fresh totals.
+# A SalesOrder save never writes its stored totals (see exclude_stored_totals), so it
+# does not need them recomputed.
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals_on_order_item(sender, instance, signal, **kwargs):
+    if signal is post_save and not instance.has_changed('order_id', 'price', 'quantity', 'deleted_at'):
+        return
+    recalculate_order_totals({instance.order_id, instance.loaded_value('order_id')})
+
+
+@receiver(post_save, sender=Invoice)
+def update_order_totals_on_invoice(sender, instance, **kwargs):
+    if not instance.has_changed('order_id', 'vat'):
+        return
+    recalculate_order_totals({instance.order_id, instance.loaded_value('order_id')})
+    instance.refresh_from_db(fields=['subtotal', 'vat_amount', 'total'])
+
+
+@receiver(post_delete, sender=Invoice)
+def update_order_totals_on_invoice_delete(sender, instance, **kwargs):
+    recalculate_order_totals([instance.order_id])
+
 
 @receiver(pre_save, sender=OrderItem)
 def update_product_quantity(sender, instance, **kwargs):
@@ -68,7 +149,7 @@ def update_product_quantity(sender, instance, **kwargs):
         order_item = OrderItem.objects.get(pk=instance.pk)
         old_quantity = order_item.quantity
         quantity_diff = instance.quantity - old_quantity
-        Product.objects.filter(pk=instance.product.pk).update(quantity=models.F(
+        Product.objects.filter(pk=instance.product.pk).update_with_audit(quantity=models.F(
             'quantity') - quantity_diff, updated_by_id=instance.updated_by_id)
         if quantity_diff != 0 and instance.order.stock_movement:
             smi, created = StockMovementItem.objects.get_or_create(
@@ -150,7 +231,7 @@ def restore_product_quantity(sender, instance, **kwargs):
     """
     Restores the product's quantity when an OrderItem is deleted.
     """
-    Product.objects.filter(pk=instance.product.pk).update(
+    Product.objects.filter(pk=instance.product.pk).update_with_audit(
         quantity=models.F('quantity') + instance.quantity)
 
 
@@ -535,20 +616,21 @@ def check_canvasing_requirements(instance):
             _('CustomerVisit status cannot be set to COMPLETED if sales_order, item_delivery_evidence and signature are null.')
         )
 
-    for item in instance.sales_order.order_items.all():
-        warehouse_stocks = WarehouseStock.objects.filter(
-            product=item.product,
-            warehouse=instance.trip.vehicle.warehouse
-        )
+    order_items = list(instance.sales_order.order_items.all())
+    units = UnitTree()
+    batches = get_warehouse_batches(
+        instance.trip.vehicle.warehouse, [item.product_id for item in order_items])
+    for item in order_items:
         stock = 0
-        for ws in warehouse_stocks:
-            stock += ws.smallest_unit_quantity
+        for ws in batches.get(item.product_id, []):
+            stock += ws.quantity * units.conversion_to_top_level(ws.unit_id)
 
-        if stock < item.smallest_unit_quantity:
+        if stock < item.quantity * units.conversion_to_top_level(item.unit_id):
             raise ValidationError(
                 _('CustomerVisit status cannot be set to COMPLETED because this Sales Order Item is out of stock.')
             )
-        explode_stock_based_on_order_item(warehouse_stocks, item)
+    instance.stock_explosion_plan = explode_stock_based_on_order_items(
+        order_items, batches, units)
 
 
 def check_taking_order_requirements(instance):
@@ -572,4 +654,62 @@ def validate_payment_amount(sender, instance, **kwargs):
                 invoice_total=invoice_total
             )
         )
+
+
+@receiver(pre_save, sender=SalesOrder)
+def ensure_credit_limit_on_submit(sender, instance, **kwargs):
+    # 7. A credit customer's order cannot be submitted beyond its credit limit.
+    if instance.status != SalesOrder.SUBMITTED:
+        return
+    status_before = SalesOrder.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    if status_before != SalesOrder.SUBMITTED:
+        check_credit_limit(instance)
+
+
+# Sales facts ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Only saves that change a field get_fact_rows reads schedule a refresh.
+INVOICE_FACT_FIELDS = ('order_id', 'invoice_date', 'vat', 'deleted_at')
+SALES_ORDER_FACT_FIELDS = ('customer_id', 'status', 'is_paid', 'warehouse_id', 'visit_id', 'deleted_at')
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_sales_fact_on_order_item(sender, instance, signal, **kwargs):
+    if signal is post_save and not instance.has_changed('order_id', 'product_id', 'price', 'quantity', 'deleted_at'):
+        return
+    schedule_fact_refresh(order_ids={instance.order_id, instance.loaded_value('order_id')})
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_delete, sender=Invoice)
+def remember_sales_fact_key_of_invoice(sender, instance, signal, **kwargs):
+    instance.sales_fact_changed = signal is pre_delete or instance.has_changed(*INVOICE_FACT_FIELDS)
+    instance.sales_fact_key_before = Invoice.objects.filter(pk=instance.pk).values_list(
+        'invoice_date', 'order__customer_id').first() if instance.pk and instance.sales_fact_changed else None
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def refresh_sales_fact_on_invoice(sender, instance, **kwargs):
+    if not getattr(instance, 'sales_fact_changed', True):
+        return
+    previous_key = getattr(instance, 'sales_fact_key_before', None)
+    schedule_fact_refresh(order_ids=[instance.order_id], keys=[previous_key] if previous_key else [])
+
+
+@receiver(pre_save, sender=SalesOrder)
+@receiver(pre_delete, sender=SalesOrder)
+def remember_sales_fact_key_of_sales_order(sender, instance, signal, **kwargs):
+    changed = signal is pre_delete or instance.has_changed(*SALES_ORDER_FACT_FIELDS)
+    instance.sales_fact_key_before = Invoice.objects.filter(order_id=instance.pk).values_list(
+        'invoice_date', 'order__customer_id').first() if instance.pk and changed else None
+
+
+@receiver(post_save, sender=SalesOrder)
+@receiver(post_delete, sender=SalesOrder)
+def refresh_sales_fact_on_sales_order(sender, instance, **kwargs):
+    previous_key = getattr(instance, 'sales_fact_key_before', None)
+    if previous_key:
+        schedule_fact_refresh(order_ids=[instance.pk], keys=[previous_key])
+
 # ==================================================================================
@@ -1,10 +1,16 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
 from django.contrib.gis.db.models import Avg
-from django.db import connection
+from django.db import connections, router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets
+from libs.mixins import ReplicaReadMixin
 from libs.pagination import CustomPagination
+from ..helpers.receivable import get_credit_status, get_receivable_aging
 from ..serializers.customer import CustomerSerializer, CustomerListSerializer, CustomerMapSerializer, StoreTypeSerializer
 from ..models import Customer, StoreType
 
@@ -16,7 +22,7 @@ class StoreTypeViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination 
     serializer_class = StoreTypeSerializer
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     Customer API endpoints.
 
@@ -38,11 +44,20 @@ class CustomerViewSet(viewsets.ModelViewSet):
     partial_update:
     Update certain fields in an existing customer without affecting others.
 
+    credit:
+    Return the receivable of a customer against its credit limits. Pass `amount` to
+    check whether a new invoice of that amount stays within them.
+
+    aging:
+    Return the open invoices of customers bucketed by days past due. Accepts
+    `customer_id32` and `as_of` (YYYY-MM-DD, defaults to today).
+
     """
     lookup_field = 'id32'
     queryset = Customer.objects.all()
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
     pagination_class = CustomPagination 
+    replica_actions = ['map', 'aging']
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -68,7 +83,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         """
         
         # Execute the raw SQL
-        with connection.cursor() as cursor:
+        with connections[router.db_for_read(Customer)].cursor() as cursor:
             cursor.execute(raw_sql)
             avg_coords = cursor.fetchone()
 
@@ -82,4 +97,30 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 "longitude": avg_coords[1]
             },
             "markers": serializer.data
-        })
\ No newline at end of file
+        })
+
+    @action(detail=True, methods=['get'])
+    def credit(self, request, id32=None):
+        customer = self.get_object()
+        try:
+            amount = Decimal(request.query_params.get('amount', 0))
+        except InvalidOperation:
+            return Response({"error": _("amount must be a number.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_credit_status(customer, amount))
+
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        try:
+            as_of = date.fromisoformat(request.query_params['as_of']) if request.query_params.get('as_of') else None
+        except ValueError:
+            return Response({"error": _("as_of must be in 'YYYY-MM-DD' format.")}, status=status.HTTP_400_BAD_REQUEST)
+        customer_ids = None
+        if request.query_params.get('customer_id32'):
+            customer_ids = Customer.objects.filter(
+                id32=request.query_params['customer_id32']).values_list('id', flat=True)
+
+        rows = get_receivable_aging(customer_ids, as_of)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
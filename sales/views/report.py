@@ -1,17 +1,23 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
-from ..models import OrderItem
+from libs.mixins import ReplicaReadMixin
+from ..models import DailySalesFact
 from ..serializers.sales import SalesReportSerializer
 
-class SalesReportAPIView(APIView):
+class SalesReportAPIView(ReplicaReadMixin, APIView):
+    """
+    Sales totals for a date range, product and customer, read from the DailySalesFact
+    rollup. `total_sales` is the sum of price times quantity, excluding VAT, of
+    invoiced orders; dates are invoice dates.
+    """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    replica_actions = ['get']
 
     # DjangoModelPermissions requires a queryset attribute to determine the model it applies to.
-    # Since this view might not directly operate on a single model or you want to apply it
-    # to OrderItem model permissions, explicitly state the queryset as follows:
-    queryset = OrderItem.objects.all()
+    queryset = DailySalesFact.objects.all()
 
     def get(self, request, *args, **kwargs):
         start_date = request.query_params.get('start_date')
@@ -22,25 +28,18 @@ class SalesReportAPIView(APIView):
         queryset = self.queryset
 
         if start_date and end_date:
-            queryset = queryset.filter(order__order_date__range=[start_date, end_date])
+            queryset = queryset.filter(date__range=[start_date, end_date])
 
         if product_id32:
             queryset = queryset.filter(product__id32=product_id32)
 
         if customer_id32:
-            queryset = queryset.filter(order__customer__id32=customer_id32)
-
-
-        if queryset.exists():
-            aggregated_data = queryset.aggregate(
-                total_sales=Sum('price'),
-                total_quantity=Sum('quantity')
-            )
-        else:
-            aggregated_data = {
-                'total_sales':0,
-                'total_quantity':0
-            }
+            queryset = queryset.filter(customer__id32=customer_id32)
+
+        aggregated_data = queryset.aggregate(
+            total_sales=Coalesce(Sum('gross'), Value(0), output_field=DecimalField()),
+            total_quantity=Coalesce(Sum('quantity'), Value(0)),
+        )
 
         # Use the serializer to format the response data
         serializer = SalesReportSerializer(data=aggregated_data)
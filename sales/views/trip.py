@@ -1,4 +1,5 @@
 from django_filters import rest_framework as filters
+from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -6,6 +7,10 @@ from rest_framework.filters import SearchFilter
 from libs.pagination import CustomPagination
 from libs.filter import CreatedAtFilterMixin
 from libs.constants import COMPLETED
+from common.serializers import FileSerializer
+from logistics.helpers.route import optimise_trip_route
+from ..helpers.trip import get_trip_stock_movement, plan_trip_load
+from ..scripts import generate_load_sheet_pdf
 from ..models import TripTemplate, Trip, CustomerVisitReport, CustomerVisit
 from ..serializers.trip import (
     TripTemplateListSerializer,
@@ -111,6 +116,59 @@ class TripViewSet(viewsets.ModelViewSet):
 
         return Response(CustomerVisitReportSerializer(report).data)
 
+    @action(detail=True, methods=['post'])
+    def optimise_route(self, request, id32=None):
+        """
+        Reorders the customer visits of the trip, and the drops of its jobs, into the
+        shortest round trip from the vehicle's warehouse. With `update_template=true`
+        the trip template's customers are reordered as well.
+        """
+        trip = self.get_object()
+        update_template = str(request.data.get('update_template', '')).lower() in ['true', '1']
+        visits = optimise_trip_route(trip, update_template=update_template)
+        return Response(CustomerVisitSerializer(visits, many=True).data)
+
+    def get_load_plan(self):
+        trip = self.get_object()
+        stock_movement = get_trip_stock_movement(trip)
+        return trip, stock_movement, plan_trip_load(trip, stock_movement) if stock_movement else []
+
+    @action(detail=True, methods=['get'])
+    def load_sheet(self, request, id32=None):
+        """
+        Load sequence of the trip's stock movement: last in, first out by drop.
+        """
+        _trip, stock_movement, plan = self.get_load_plan()
+        if not stock_movement:
+            return Response({"error": _("The trip has no stock movement to load.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'stock_movement_id32': stock_movement.id32,
+            'items': [{
+                'sequence': row['sequence'],
+                'drop_order': row['drop_order'],
+                'customer_id32': row['customer'].id32 if row['customer'] else None,
+                'customer_name': row['customer'].name if row['customer'] else None,
+                'item_id32': row['item'].id32,
+                'product_id32': row['item'].product.id32 if row['item'].product else None,
+                'product_name': row['item'].product.name if row['item'].product else None,
+                'quantity': row['item'].quantity,
+                'unit_symbol': row['item'].unit.symbol if row['item'].unit else None,
+            } for row in plan],
+        })
+
+    @action(detail=True, methods=['get'])
+    def load_sheet_pdf(self, request, id32=None):
+        """
+        Printable load sheet of the trip, as a PDF file.
+        """
+        trip, stock_movement, plan = self.get_load_plan()
+        if not stock_movement:
+            return Response({"error": _("The trip has no stock movement to load.")}, status=status.HTTP_400_BAD_REQUEST)
+        file = generate_load_sheet_pdf(trip, stock_movement, plan)
+        if not file:
+            return Response({"error": _("The load sheet could not be generated.")}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(FileSerializer(instance=file).data)
+
 
 class CustomerVisitViewSet(viewsets.ModelViewSet):
     queryset = CustomerVisit.objects.all()